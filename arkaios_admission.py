@@ -0,0 +1,204 @@
+# arkaios_admission.py - Control de admisión para el executor de ARKAIOS
+"""
+Planificador por slots delante de CommandExecutor: límites globales y por
+usuario, colas ponderadas (comandos ligeros antes que los pesados) y rechazo
+con Retry-After cuando la cola está llena
+"""
+
+import math
+import logging
+import threading
+from collections import deque
+from typing import Dict, List
+
+logger = logging.getLogger("arkaios.admission")
+
+LIGHT = "light"
+HEAVY = "heavy"
+
+# (comando, primer argumento) considerados pesados; None = cualquier argumento
+HEAVY_COMMANDS = {
+    "npx": None,
+    "npm": {"install", "i", "ci", "run", "build", "test", "start"},
+    "pip": {"install"},
+    "git": {"clone", "push", "pull"},
+    "firebase": {"deploy", "init", "emulators:start"},
+    "python": {"-m", "manage.py"},
+}
+
+
+class AdmissionRejected(Exception):
+    """No hay capacidad para el comando; reintentar tras retry_after segundos"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    __slots__ = ("user", "kind", "granted")
+
+    def __init__(self, user: str, kind: str):
+        self.user = user
+        self.kind = kind
+        self.granted = False
+
+
+class AdmissionController:
+    """Slots de ejecución con límites globales, por usuario y por clase"""
+
+    def __init__(self, max_global: int = 8, max_per_user: int = 2, max_heavy: int = None,
+                 max_queue: int = 32, queue_timeout: float = 30.0):
+        """
+        Args:
+            max_global: Procesos simultáneos en total
+            max_per_user: Procesos simultáneos por usuario/sesión
+            max_heavy: Procesos pesados simultáneos (por defecto deja 2 slots a los ligeros)
+            max_queue: Peticiones en espera antes de rechazar con 429
+            queue_timeout: Segundos máximos de espera por un slot
+        """
+        self.max_global = max_global
+        self.max_per_user = max_per_user
+        self.max_heavy = max_heavy if max_heavy is not None else max(1, max_global - 2)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._cond = threading.Condition()
+        self._running = 0
+        self._running_heavy = 0
+        self._per_user: Dict[str, int] = {}
+        self._queues = {LIGHT: deque(), HEAVY: deque()}
+        # Duración media (EMA) por clase, para estimar Retry-After
+        self._avg_duration = {LIGHT: 1.0, HEAVY: 30.0}
+
+        logger.info(
+            f"AdmissionController iniciado. Global: {max_global}, por usuario: {max_per_user}, "
+            f"pesados: {self.max_heavy}, cola: {max_queue}"
+        )
+
+    @staticmethod
+    def classify(command: str, args: List[str]) -> str:
+        """Clasifica un comando como ligero o pesado"""
+        if command not in HEAVY_COMMANDS:
+            return LIGHT
+        heavy_args = HEAVY_COMMANDS[command]
+        if heavy_args is None:
+            return HEAVY
+        first_arg = args[0] if args else ""
+        return HEAVY if first_arg in heavy_args else LIGHT
+
+    def _has_capacity(self, ticket: _Ticket) -> bool:
+        if self._running >= self.max_global:
+            return False
+        if self._per_user.get(ticket.user, 0) >= self.max_per_user:
+            return False
+        if ticket.kind == HEAVY and self._running_heavy >= self.max_heavy:
+            return False
+        return True
+
+    def _eligible(self, ticket: _Ticket) -> bool:
+        """
+        Un ticket puede arrancar si hay capacidad y ningún ticket anterior de su
+        clase (ni ligero, si es pesado) podría arrancar en su lugar
+        """
+        if not self._has_capacity(ticket):
+            return False
+        for other in self._queues[ticket.kind]:
+            if other is ticket:
+                break
+            if self._has_capacity(other):
+                return False
+        if ticket.kind == HEAVY:
+            if any(self._has_capacity(other) for other in self._queues[LIGHT]):
+                return False
+        return True
+
+    def _retry_after(self, kind: str) -> int:
+        waiting = len(self._queues[LIGHT]) + len(self._queues[HEAVY])
+        estimate = self._avg_duration[kind] * (waiting + 1) / max(1, self.max_global)
+        return int(min(300, max(1, math.ceil(estimate))))
+
+    def acquire(self, user: str, command: str, args: List[str] = None,
+                timeout: float = None) -> _Ticket:
+        """
+        Espera un slot para ejecutar el comando
+
+        Raises:
+            AdmissionRejected: cola llena o tiempo de espera agotado
+        """
+        ticket = _Ticket(user or "anon", self.classify(command, args or []))
+        timeout = self.queue_timeout if timeout is None else timeout
+
+        with self._cond:
+            if self._has_capacity(ticket) and not self._queues[ticket.kind] and not (
+                ticket.kind == HEAVY and self._queues[LIGHT]
+            ):
+                self._grant(ticket)
+                return ticket
+
+            if len(self._queues[LIGHT]) + len(self._queues[HEAVY]) >= self.max_queue:
+                raise AdmissionRejected("Demasiados comandos en cola", self._retry_after(ticket.kind))
+
+            queue = self._queues[ticket.kind]
+            queue.append(ticket)
+            try:
+                granted = self._cond.wait_for(lambda: self._eligible(ticket), timeout)
+                if not granted:
+                    raise AdmissionRejected(
+                        f"Sin capacidad para ejecutar tras {timeout:.0f}s de espera",
+                        self._retry_after(ticket.kind),
+                    )
+                self._grant(ticket)
+                return ticket
+            finally:
+                queue.remove(ticket)
+                # Otros tickets pueden haberse vuelto elegibles
+                self._cond.notify_all()
+
+    def _grant(self, ticket: _Ticket):
+        ticket.granted = True
+        self._running += 1
+        if ticket.kind == HEAVY:
+            self._running_heavy += 1
+        self._per_user[ticket.user] = self._per_user.get(ticket.user, 0) + 1
+
+    def release(self, ticket: _Ticket, duration: float = None):
+        """Libera el slot y actualiza la duración media de su clase"""
+        if not ticket.granted:
+            return
+        with self._cond:
+            ticket.granted = False
+            self._running -= 1
+            if ticket.kind == HEAVY:
+                self._running_heavy -= 1
+            remaining = self._per_user.get(ticket.user, 1) - 1
+            if remaining > 0:
+                self._per_user[ticket.user] = remaining
+            else:
+                self._per_user.pop(ticket.user, None)
+            if duration is not None:
+                avg = self._avg_duration[ticket.kind]
+                self._avg_duration[ticket.kind] = 0.8 * avg + 0.2 * duration
+            self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "running": self._running,
+                "running_heavy": self._running_heavy,
+                "queued_light": len(self._queues[LIGHT]),
+                "queued_heavy": len(self._queues[HEAVY]),
+                "per_user": dict(self._per_user),
+            }
+
+
+# Singleton instance
+_admission_instance = None
+
+
+def get_admission_controller(**kwargs) -> AdmissionController:
+    """Obtiene la instancia singleton del control de admisión"""
+    global _admission_instance
+    if _admission_instance is None:
+        _admission_instance = AdmissionController(**kwargs)
+    return _admission_instance
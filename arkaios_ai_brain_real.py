@@ -10,10 +10,11 @@ import json
 import logging
 import os
 import re
-import requests
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
+from arkaios_metrics import count_calls
+
 logger = logging.getLogger("arkaios.ai_brain_real")
 
 
@@ -150,6 +151,8 @@ Siempre responde en español y sé amigable pero conciso."""
         
         return result
     
+    @count_calls("arkaios_ai_provider_calls_total", outcome=lambda r: "ok" if r else "error",
+                 skip=lambda self, message: not self.openai_key, provider="openai")
     def _query_openai(self, message: str) -> Optional[Dict]:
         """Query a OpenAI GPT-4"""
         if not self.openai_key:
@@ -171,7 +174,8 @@ Siempre responde en español y sé amigable pero conciso."""
             
             messages.append({"role": "user", "content": message})
             
-            # Llamar a OpenAI
+            # Llamar a OpenAI (requests se importa en el primer uso: arranque más rápido)
+            import requests
             response = requests.post(
                 "https://api.openai.com/v1/chat/completions",
                 headers={
@@ -218,8 +222,13 @@ Siempre responde en español y sé amigable pero conciso."""
         
         return None
     
+    @count_calls("arkaios_ai_provider_calls_total", outcome=lambda r: "ok" if r else "error",
+                 skip=lambda self, message: not self.aida_gateway, provider="aida")
     def _query_aida(self, message: str) -> Optional[Dict]:
         """Query al Gateway A.I.D.A."""
+        if not self.aida_gateway:
+            return None
+        
         try:
             # Detectar si es una tarea que necesita delegación
             keywords_heavy = [
@@ -250,6 +259,7 @@ Siempre responde en español y sé amigable pero conciso."""
             if self.aida_key and self.aida_key != "demo":
                 headers["Authorization"] = f"Bearer {self.aida_key}"
             
+            import requests
             response = requests.post(
                 self.aida_gateway,
                 headers=headers,
@@ -380,6 +390,7 @@ Siempre responde en español y sé amigable pero conciso."""
                 "needs_confirmation": False
             }
     
+    @count_calls("arkaios_ai_provider_calls_total", provider="local_fallback")
     def _local_fallback(self, message: str) -> Dict:
         """Fallback local usando pattern matching"""
         from arkaios_ai_brain import AIBrain
@@ -0,0 +1,397 @@
+# arkaios_async_exec.py - Motor asíncrono de ejecución de comandos para ARKAIOS
+"""
+Ejecuta comandos con asyncio.create_subprocess_exec en un único event loop
+dedicado: los hilos de Flask no quedan bloqueados mientras el proceso corre,
+las ejecuciones se cancelan por id y al expirar el timeout se termina todo
+el grupo de procesos. Donde hay wait4 el proceso se recoge desde un hilo
+propio (el watcher de asyncio lo recogería sin su consumo de recursos)
+"""
+
+import os
+import time
+import uuid
+import signal
+import asyncio
+import logging
+import threading
+import subprocess
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from arkaios_admission import AdmissionRejected
+from arkaios_metrics import get_metrics
+from arkaios_rlimits import SUPPORTED as RUSAGE_SUPPORTED, wait_with_usage
+
+logger = logging.getLogger("arkaios.async_exec")
+
+# Estados de una ejecución
+PENDING = "pending"
+RUNNING = "running"
+FINISHED = "finished"
+CANCELLED = "cancelled"
+
+# Bytes leídos por bloque al drenar los pipes
+READ_CHUNK = 64 * 1024
+
+
+class _Execution:
+    """Estado de una ejecución supervisada por el motor"""
+
+    def __init__(self, command_str: str, user: str):
+        self.id = uuid.uuid4().hex
+        self.command = command_str
+        self.user = user
+        self.status = PENDING
+        self.pid = None
+        self.result: Optional[Dict] = None
+        self.created_at = time.time()
+        self.future = None
+        self.process = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "command": self.command,
+            "user": self.user,
+            "status": self.status,
+            "pid": self.pid,
+            "created_at": self.created_at,
+            "result": self.result,
+        }
+
+
+class AsyncCommandEngine:
+    """Ejecuta comandos del CommandExecutor sobre un event loop propio"""
+
+    def __init__(self, executor, max_finished: int = 500):
+        """
+        Args:
+            executor: CommandExecutor (whitelist, workspace, historial, admisión)
+            max_finished: Ejecuciones terminadas que se conservan para consulta
+        """
+        self.executor = executor
+        self.max_finished = max_finished
+
+        self._executions: "OrderedDict[str, _Execution]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="arkaios-async-exec", daemon=True)
+        self._thread.start()
+
+        logger.info("AsyncCommandEngine iniciado")
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    # ===== API síncrona (llamable desde cualquier hilo) =====
+
+    def submit(self, command: str, args: List[str] = None, cwd: str = None,
+               timeout: int = None, env: Dict[str, str] = None, user: str = None) -> Dict:
+        """
+        Valida y lanza un comando sin esperar a que termine
+
+        Returns:
+            {"ok": bool, "execution": {...}, "error": str}
+        """
+        args = args or []
+        full_command, work_dir, exec_env, error = self.executor._prepare_command(command, args, cwd, env)
+        if error:
+            return error
+
+        execution = _Execution(' '.join(full_command), user or "anon")
+        with self._lock:
+            self._executions[execution.id] = execution
+            self._prune()
+
+        timeout = timeout or self.executor.default_timeout
+        execution.future = asyncio.run_coroutine_threadsafe(
+            self._run(execution, command, args, full_command, work_dir, exec_env, timeout),
+            self._loop,
+        )
+        execution.future.add_done_callback(lambda future: self._finish(execution, future))
+        return {"ok": True, "execution": execution.to_dict()}
+
+    def execute(self, command: str, args: List[str] = None, cwd: str = None,
+                timeout: int = None, env: Dict[str, str] = None, user: str = None) -> Dict:
+        """Ejecuta y espera el resultado (misma forma que execute_command)"""
+        submitted = self.submit(command, args, cwd=cwd, timeout=timeout, env=env, user=user)
+        if not submitted.get("ok"):
+            return submitted
+        execution = self._get(submitted["execution"]["id"])
+        execution.done.wait()
+        return execution.result
+
+    def get(self, execution_id: str, wait: float = 0) -> Optional[Dict]:
+        """Estado de una ejecución; wait > 0 espera hasta ese tiempo a que termine"""
+        execution = self._get(execution_id)
+        if execution is None:
+            return None
+        if wait > 0:
+            execution.done.wait(wait)
+        return execution.to_dict()
+
+    def list_executions(self, limit: int = 50) -> List[Dict]:
+        """Ejecuciones más recientes primero"""
+        with self._lock:
+            executions = list(self._executions.values())[-limit:]
+        return [execution.to_dict() for execution in reversed(executions)]
+
+    def cancel(self, execution_id: str) -> Dict:
+        """
+        Cancela una ejecución pendiente o en curso (termina su grupo de procesos)
+
+        Returns:
+            {"ok": bool, "execution": {...}, "error": str}
+        """
+        execution = self._get(execution_id)
+        if execution is None:
+            return {"ok": False, "error": "Ejecución no encontrada"}
+        if execution.done.is_set():
+            return {"ok": False, "error": f"La ejecución ya terminó ({execution.status})",
+                    "execution": execution.to_dict()}
+
+        # Cancela la tarea en el loop; _run mata el grupo de procesos
+        execution.future.cancel()
+        execution.done.wait(5)
+        logger.info(f"Cancelación solicitada para ejecución {execution.id}")
+        return {"ok": True, "execution": execution.to_dict()}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            running = sum(1 for e in self._executions.values() if e.status == RUNNING)
+            pending = sum(1 for e in self._executions.values() if e.status == PENDING)
+        return {"running": running, "pending": pending, "tracked": len(self._executions)}
+
+    def _get(self, execution_id: str) -> Optional[_Execution]:
+        with self._lock:
+            return self._executions.get(execution_id)
+
+    def _prune(self):
+        """Descarta las ejecuciones terminadas más antiguas (requiere lock)"""
+        finished = [eid for eid, e in self._executions.items() if e.done.is_set()]
+        for eid in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._executions[eid]
+
+    # ===== Event loop =====
+
+    def _finish(self, execution: _Execution, future):
+        """Callback al terminar la tarea (también si se canceló antes de empezar)"""
+        if future.cancelled():
+            execution.status = CANCELLED
+            execution.result = {
+                "ok": False,
+                "command": execution.command,
+                "error": "Ejecución cancelada",
+                "cancelled": True,
+            }
+        elif future.exception() is not None:
+            logger.error(f"Error ejecutando comando: {future.exception()}")
+            execution.status = FINISHED
+            execution.result = {"ok": False, "command": execution.command, "error": str(future.exception())}
+        else:
+            execution.status = FINISHED
+            execution.result = future.result()
+        execution.process = None
+        execution.done.set()
+
+    async def _admit(self, command: str, args: List[str], user: str):
+        """
+        Reserva un slot del control de admisión sin bloquear el loop
+        (la espera en cola ocurre en el pool por defecto del loop)
+        """
+        admission = self.executor.admission
+        if admission is None:
+            return None
+        waiting = self._loop.run_in_executor(None, admission.acquire, user, command, args)
+        try:
+            return await asyncio.shield(waiting)
+        except asyncio.CancelledError:
+            # Si el slot llega a concederse tras cancelar, liberarlo
+            def _release(f):
+                if not f.cancelled() and f.exception() is None:
+                    admission.release(f.result())
+            waiting.add_done_callback(_release)
+            raise
+
+    async def _run(self, execution: _Execution, command: str, args: List[str],
+                   full_command: List[str], work_dir, exec_env: Dict[str, str],
+                   timeout: int) -> Dict:
+        try:
+            ticket = await self._admit(command, args, execution.user)
+        except AdmissionRejected as e:
+            logger.warning(f"Comando rechazado por capacidad: {execution.command}. {e}")
+            return {
+                "ok": False,
+                "command": execution.command,
+                "error": str(e),
+                "rejected": True,
+                "retry_after": e.retry_after,
+            }
+
+        start_time = datetime.now()
+        started = time.monotonic()
+        try:
+            try:
+                process, stdout, stderr, reaped = await self._spawn(
+                    full_command, work_dir, exec_env, self.executor._preexec(command))
+            except FileNotFoundError:
+                return {
+                    "ok": False,
+                    "command": execution.command,
+                    "error": f"Comando '{command}' no encontrado. ¿Está instalado?",
+                }
+            get_metrics().inc("arkaios_executor_spawns_total", command=command, mode="async")
+
+            execution.process = process
+            execution.pid = process.pid
+            execution.status = RUNNING
+            logger.info(f"Ejecutando (async): {execution.command} en {work_dir}")
+
+            # Drenar stdout y stderr a la vez para que ningún pipe se llene
+            capture = self.executor.output_store.capture()
+            communicate = asyncio.gather(
+                _drain(stdout, capture.stdout),
+                _drain(stderr, capture.stderr),
+                asyncio.shield(reaped),
+            )
+            try:
+                _, _, (return_code, usage) = await asyncio.wait_for(communicate, timeout)
+            except asyncio.TimeoutError:
+                _kill_group(process)
+                await reaped
+                logger.warning(f"Comando excedió timeout de {timeout}s")
+                return {
+                    "ok": False,
+                    "command": execution.command,
+                    **capture.result(),
+                    "error": f"Timeout de {timeout} segundos excedido",
+                    "duration": timeout,
+                }
+            except asyncio.CancelledError:
+                _kill_group(process)
+                await asyncio.shield(reaped)
+                capture.result()  # Cierra los archivos volcados
+                raise
+
+            duration = time.monotonic() - started
+            output = capture.result()
+            if usage is not None:
+                usage["output_bytes"] = capture.stdout.size + capture.stderr.size
+            self.executor._record_execution(full_command, work_dir, return_code, duration, start_time, usage)
+            logger.info(f"Comando completado. Código: {return_code}, Duración: {duration:.2f}s")
+
+            result = {
+                "ok": return_code == 0,
+                "command": execution.command,
+                **output,
+                "return_code": return_code,
+                "duration": duration,
+            }
+            if usage is not None:
+                result["resources"] = usage
+            return result
+        finally:
+            if ticket is not None:
+                self.executor.admission.release(ticket, time.monotonic() - started)
+
+
+    async def _spawn(self, full_command: List[str], work_dir, exec_env: Dict[str, str], preexec_fn):
+        """
+        Lanza el proceso en su propio grupo
+
+        Returns:
+            (proceso, StreamReader de stdout, StreamReader de stderr, futuro
+            que se resuelve con (return_code, usage) al recoger el proceso)
+        """
+        if not RUSAGE_SUPPORTED:
+            process = await asyncio.create_subprocess_exec(
+                *full_command,
+                cwd=str(work_dir),
+                env=exec_env,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                preexec_fn=preexec_fn,
+                **_new_group_kwargs(),
+            )
+
+            async def wait():
+                return await process.wait(), None
+
+            return process, process.stdout, process.stderr, asyncio.ensure_future(wait())
+
+        process = subprocess.Popen(
+            full_command,
+            cwd=str(work_dir),
+            env=exec_env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            preexec_fn=preexec_fn,
+            **_new_group_kwargs(),
+        )
+        readers = []
+        for pipe in (process.stdout, process.stderr):
+            reader = asyncio.StreamReader(limit=READ_CHUNK)
+            await self._loop.connect_read_pipe(lambda reader=reader: asyncio.StreamReaderProtocol(reader), pipe)
+            readers.append(reader)
+
+        # Un hilo por proceso: el pool por defecto del loop lo ocupan las esperas de admisión
+        reaped = self._loop.create_future()
+
+        def reap():
+            return_code, usage, _ = wait_with_usage(process)
+            self._loop.call_soon_threadsafe(_resolve, reaped, (return_code, usage))
+
+        threading.Thread(target=reap, name="arkaios-async-reap", daemon=True).start()
+        return process, readers[0], readers[1], reaped
+
+
+def _resolve(future: asyncio.Future, value):
+    if not future.done():
+        future.set_result(value)
+
+
+async def _drain(stream: asyncio.StreamReader, capture):
+    while True:
+        chunk = await stream.read(READ_CHUNK)
+        if not chunk:
+            return
+        capture.write(chunk)
+
+
+def _new_group_kwargs() -> Dict:
+    """Argumentos para lanzar el proceso en su propio grupo"""
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def _kill_group(process):
+    """Termina el proceso y todos sus descendientes"""
+    try:
+        if os.name == "nt":
+            # taskkill /T recorre el árbol de procesos
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
+
+
+# Singleton instance
+_async_engine_instance = None
+
+
+def get_async_engine(executor=None, **kwargs) -> AsyncCommandEngine:
+    """Obtiene la instancia singleton del motor asíncrono"""
+    global _async_engine_instance
+    if _async_engine_instance is None:
+        _async_engine_instance = AsyncCommandEngine(executor, **kwargs)
+    return _async_engine_instance
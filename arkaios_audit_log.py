@@ -0,0 +1,321 @@
+# arkaios_audit_log.py - Escritor de log estructurado para ARKAIOS
+"""
+Escritor JSONL en segundo plano con cola acotada, escritura por lotes,
+política de fsync configurable y rotación/compresión de segmentos
+"""
+
+import os
+import gzip
+import json
+import time
+import queue
+import shutil
+import atexit
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List
+
+logger = logging.getLogger("arkaios.audit_log")
+
+# Políticas de fsync soportadas
+FSYNC_POLICIES = ("never", "batch", "interval")
+
+
+class AuditLogWriter:
+    """Escritor JSONL con hilo dedicado, lotes y rotación por tamaño"""
+
+    def __init__(self, path: str, max_queue: int = 10000, batch_size: int = 256,
+                 flush_interval: float = 0.5, fsync: str = "never",
+                 fsync_interval: float = 1.0, max_bytes: int = 50 * 1024 * 1024,
+                 backup_count: int = 10, compress: bool = True):
+        """
+        Args:
+            path: Ruta del archivo JSONL activo
+            max_queue: Tamaño máximo de la cola de eventos pendientes
+            batch_size: Eventos por lote antes de forzar escritura
+            flush_interval: Segundos máximos que un evento espera en la cola
+            fsync: Política de fsync ("never", "batch", "interval")
+            fsync_interval: Segundos entre fsync con la política "interval"
+            max_bytes: Tamaño del segmento activo que dispara la rotación (0 = sin rotación)
+            backup_count: Segmentos rotados que se conservan
+            compress: Si True, comprime con gzip los segmentos rotados
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Política de fsync no válida: {fsync}")
+
+        self.path = Path(path)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._size = 0
+        self._last_fsync = time.monotonic()
+        self._closed = False
+        self._listeners: List[Callable] = []
+
+        # Estadísticas
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+
+        self._thread = threading.Thread(target=self._run, name="arkaios-audit-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+        logger.info(f"AuditLogWriter iniciado. Archivo: {self.path}")
+
+    def write(self, event: Dict) -> bool:
+        """
+        Encola un evento sin bloquear al hilo llamante
+
+        Returns:
+            True si se encoló, False si la cola está llena o el escritor cerrado
+        """
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"Cola de log llena, eventos descartados: {self.dropped}")
+            return False
+
+    def add_listener(self, callback: Callable):
+        """
+        Registra un callback invocado desde el hilo escritor
+
+        El callback recibe ("append", [(ts, offset, end), ...]) tras cada lote
+        escrito, con los offsets en bytes dentro del segmento activo, y
+        ("rotate", []) cuando el segmento activo se rota.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, kind: str, entries: List[tuple]):
+        for callback in self._listeners:
+            try:
+                callback(kind, entries)
+            except Exception as e:
+                logger.warning(f"Error en listener del log: {e}")
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Espera a que los eventos encolados hasta ahora estén escritos"""
+        if self._closed or not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Vacía la cola, cierra el archivo y detiene el hilo"""
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict:
+        """Estadísticas del escritor"""
+        return {
+            "path": str(self.path),
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+            "segment_size": self._size,
+            "fsync": self.fsync,
+        }
+
+    # ===== Hilo escritor =====
+
+    def _run(self):
+        """Bucle principal: agrupa eventos y los escribe por lotes"""
+        while True:
+            batch: List[Dict] = []
+            waiters: List[threading.Event] = []
+            stop = False
+
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    # Un flush explícito cierra el lote actual
+                    waiters.append(item)
+                    break
+                else:
+                    batch.append(item)
+
+                if stop or len(batch) >= self.batch_size:
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write_batch(batch)
+
+            for waiter in waiters:
+                waiter.set()
+
+            if stop:
+                self._close_file()
+                return
+
+    def _open_file(self):
+        """Abre el segmento activo en modo append"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("ab")
+        self._size = self._file.tell()
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.flush()
+                if self.fsync != "never":
+                    os.fsync(self._file.fileno())
+            except Exception as e:
+                logger.warning(f"Error cerrando log JSONL: {e}")
+            finally:
+                # Aunque falle el flush (ENOSPC, EIO) el descriptor se libera
+                try:
+                    self._file.close()
+                except Exception:
+                    pass
+                self._file = None
+
+    def _write_batch(self, batch: List[Dict]):
+        """Serializa y escribe un lote, rotando el segmento si es necesario"""
+        try:
+            lines = [
+                (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+                for event in batch
+            ]
+            data = b"".join(lines)
+
+            if self._file is None:
+                self._open_file()
+
+            if self.max_bytes and self._size > 0 and self._size + len(data) > self.max_bytes:
+                self._rotate()
+
+            start = self._size
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            self.written += len(batch)
+
+            self._maybe_fsync()
+
+            if self._listeners:
+                entries = []
+                offset = start
+                for event, line in zip(batch, lines):
+                    entries.append((event.get("ts", 0), offset, offset + len(line)))
+                    offset += len(line)
+                self._notify("append", entries)
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.warning(f"No se pudo escribir log JSONL ({len(batch)} eventos descartados, "
+                           f"total {self.dropped}): {e}")
+            self._close_file()
+
+    def _maybe_fsync(self):
+        """Aplica la política de fsync configurada"""
+        if self.fsync == "batch":
+            os.fsync(self._file.fileno())
+        elif self.fsync == "interval":
+            now = time.monotonic()
+            if now - self._last_fsync >= self.fsync_interval:
+                os.fsync(self._file.fileno())
+                self._last_fsync = now
+
+    def _rotate(self):
+        """Cierra el segmento activo, lo renombra y lo comprime en segundo plano"""
+        self._close_file()
+
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        rotated = self.path.with_name(f"{self.path.stem}.{stamp}{self.path.suffix}")
+        counter = 1
+        while rotated.exists() or Path(str(rotated) + ".gz").exists():
+            rotated = self.path.with_name(f"{self.path.stem}.{stamp}_{counter}{self.path.suffix}")
+            counter += 1
+
+        os.replace(self.path, rotated)
+        self.rotations += 1
+        self._notify("rotate", [])
+        logger.info(f"Log JSONL rotado: {rotated.name}")
+
+        if self.compress:
+            threading.Thread(
+                target=self._compress_segment, args=(rotated,),
+                name="arkaios-audit-log-gzip", daemon=True,
+            ).start()
+        else:
+            self._prune_segments()
+
+        self._open_file()
+
+    def _compress_segment(self, segment: Path):
+        """Comprime un segmento rotado con gzip"""
+        target = Path(str(segment) + ".gz")
+        try:
+            with segment.open("rb") as src, gzip.open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            segment.unlink()
+        except Exception as e:
+            logger.warning(f"Error comprimiendo {segment.name}: {e}")
+        self._prune_segments()
+
+    def list_segments(self) -> List[Path]:
+        """Segmentos rotados, del más antiguo al más reciente"""
+        pattern = f"{self.path.stem}.*{self.path.suffix}*"
+        return sorted(
+            p for p in self.path.parent.glob(pattern)
+            if p != self.path
+        )
+
+    def _prune_segments(self):
+        """Elimina los segmentos rotados que exceden backup_count"""
+        if self.backup_count <= 0:
+            return
+        segments = self.list_segments()
+        for old in segments[:-self.backup_count]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+
+# Singleton instance
+_audit_log_instance = None
+
+
+def get_audit_log(path: str = None, **kwargs) -> AuditLogWriter:
+    """Obtiene la instancia singleton del escritor de log"""
+    global _audit_log_instance
+    if _audit_log_instance is None:
+        _audit_log_instance = AuditLogWriter(path, **kwargs)
+    return _audit_log_instance
@@ -0,0 +1,179 @@
+# arkaios_batch.py - Ejecución por lotes de acciones para ARKAIOS
+"""
+Ejecuta una lista de acciones con dependencias opcionales (depends_on):
+las independientes corren en paralelo y las dependientes en orden
+"""
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List
+
+logger = logging.getLogger("arkaios.batch")
+
+
+class BatchRunner:
+    """Planificador de grafos de acciones sobre un pool compartido"""
+
+    def __init__(self, max_workers: int = 8, max_actions: int = 200):
+        """
+        Args:
+            max_workers: Acciones ejecutándose a la vez (entre todos los lotes)
+            max_actions: Acciones máximas por lote
+        """
+        self.max_workers = max_workers
+        self.max_actions = max_actions
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="arkaios-batch")
+
+        logger.info(f"BatchRunner iniciado. Workers: {max_workers}")
+
+    def _validate(self, actions: List[Dict]) -> tuple:
+        """
+        Normaliza ids y dependencias y detecta ciclos
+
+        Returns:
+            (ids, deps, error)
+        """
+        if not isinstance(actions, list) or not actions:
+            return None, None, "Lista de acciones vacía"
+        if len(actions) > self.max_actions:
+            return None, None, f"Demasiadas acciones (máximo {self.max_actions})"
+
+        ids = []
+        for index, item in enumerate(actions):
+            if not isinstance(item, dict) or not item.get("action"):
+                return None, None, f"Acción #{index} inválida (falta 'action')"
+            ids.append(str(item.get("id", index)))
+
+        if len(set(ids)) != len(ids):
+            return None, None, "Ids de acción duplicados"
+
+        known = set(ids)
+        deps = {}
+        for action_id, item in zip(ids, actions):
+            depends_on = item.get("depends_on") or []
+            if isinstance(depends_on, (str, int)):
+                depends_on = [depends_on]
+            depends_on = [str(d) for d in depends_on]
+            missing = [d for d in depends_on if d not in known]
+            if missing:
+                return None, None, f"Acción '{action_id}' depende de ids inexistentes: {', '.join(missing)}"
+            deps[action_id] = set(depends_on)
+
+        # Kahn: si no se pueden ordenar todas, hay un ciclo
+        pending = {a: set(d) for a, d in deps.items()}
+        ready = [a for a, d in pending.items() if not d]
+        ordered = 0
+        while ready:
+            current = ready.pop()
+            ordered += 1
+            for other, d in pending.items():
+                if current in d:
+                    d.discard(current)
+                    if not d:
+                        ready.append(other)
+        if ordered != len(ids):
+            return None, None, "Las dependencias contienen un ciclo"
+
+        return ids, deps, None
+
+    def run(self, actions: List[Dict], handler: Callable[[str, Dict], Dict]) -> Dict:
+        """
+        Ejecuta un lote de acciones
+
+        Args:
+            actions: [{"id": str, "action": str, "params": {...}, "depends_on": [ids]}]
+            handler: Función (action, params) -> dict con "ok"
+
+        Returns:
+            {
+                "ok": bool,
+                "results": [{"id", "action", "ok", "result", "error", "skipped", "duration"}],
+                "duration": float,
+                "error": str
+            }
+        """
+        ids, deps, error = self._validate(actions)
+        if error:
+            return {"ok": False, "error": error}
+
+        started = time.monotonic()
+        by_id = dict(zip(ids, actions))
+        dependents = {action_id: [] for action_id in ids}
+        for action_id, depends_on in deps.items():
+            for dep in depends_on:
+                dependents[dep].append(action_id)
+
+        remaining = {action_id: len(d) for action_id, d in deps.items()}
+        results: Dict[str, Dict] = {}
+        running = {}
+
+        def execute(action_id: str) -> Dict:
+            item = by_id[action_id]
+            t0 = time.monotonic()
+            try:
+                result = handler(item["action"], item.get("params") or {})
+                ok = bool(result.get("ok", False)) if isinstance(result, dict) else True
+                entry = {"ok": ok, "result": result}
+                if not ok and isinstance(result, dict):
+                    entry["error"] = result.get("error")
+            except Exception as e:
+                logger.error(f"Error ejecutando acción '{action_id}': {e}")
+                entry = {"ok": False, "error": str(e)}
+            entry["duration"] = time.monotonic() - t0
+            return entry
+
+        def submit(action_id: str):
+            running[self._pool.submit(execute, action_id)] = action_id
+
+        def skip(action_id: str, reason: str):
+            results[action_id] = {"ok": False, "skipped": True, "error": reason}
+            for child in dependents[action_id]:
+                if child not in results:
+                    skip(child, f"Dependencia '{action_id}' no se completó")
+
+        for action_id in ids:
+            if remaining[action_id] == 0:
+                submit(action_id)
+
+        while running:
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                action_id = running.pop(future)
+                entry = future.result()
+                results[action_id] = entry
+
+                for child in dependents[action_id]:
+                    if child in results:
+                        continue
+                    if not entry["ok"]:
+                        skip(child, f"Dependencia '{action_id}' falló")
+                        continue
+                    remaining[child] -= 1
+                    if remaining[child] == 0:
+                        submit(child)
+
+        ordered_results = []
+        for action_id in ids:
+            entry = {"id": action_id, "action": by_id[action_id]["action"]}
+            entry.update(results[action_id])
+            ordered_results.append(entry)
+
+        return {
+            "ok": all(r["ok"] for r in ordered_results),
+            "results": ordered_results,
+            "count": len(ordered_results),
+            "duration": time.monotonic() - started,
+        }
+
+
+# Singleton instance
+_batch_runner_instance = None
+
+
+def get_batch_runner(**kwargs) -> BatchRunner:
+    """Obtiene la instancia singleton del ejecutor por lotes"""
+    global _batch_runner_instance
+    if _batch_runner_instance is None:
+        _batch_runner_instance = BatchRunner(**kwargs)
+    return _batch_runner_instance
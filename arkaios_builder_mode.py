@@ -7,7 +7,8 @@ Tipo Puter/Firebase - Scaffolding y deploy automatizado
 import os
 import json
 import logging
-from typing import Dict, List, Optional
+import threading
+from typing import Callable, Dict, List, Optional
 from pathlib import Path
 from datetime import datetime
 
@@ -17,6 +18,22 @@ from arkaios_file_manager import get_file_manager
 logger = logging.getLogger("arkaios.builder")
 
 
+class ProgressSteps(list):
+    """Lista de pasos que notifica cada paso añadido a un callback de progreso"""
+    
+    def __init__(self, callback: Callable[[str], None] = None):
+        super().__init__()
+        self._callback = callback
+    
+    def append(self, step: str):
+        super().append(step)
+        if self._callback:
+            try:
+                self._callback(step)
+            except Exception as e:
+                logger.warning(f"Error notificando progreso: {e}")
+
+
 class BuilderMode:
     """Constructor automático de proyectos"""
     
@@ -35,10 +52,18 @@ class BuilderMode:
             "html-static": self._create_html_static,
         }
         
+        # Callback de progreso por hilo (create_project puede correr en varios workers)
+        self._local = threading.local()
+        
         logger.info("BuilderMode iniciado")
     
+    def _new_steps(self) -> ProgressSteps:
+        """Lista de pasos conectada al callback de progreso del hilo actual"""
+        return ProgressSteps(getattr(self._local, "progress", None))
+    
     def create_project(self, project_type: str, name: str, 
-                      options: Dict = None) -> Dict:
+                      options: Dict = None,
+                      progress: Callable[[str], None] = None) -> Dict:
         """
         Crea un nuevo proyecto
         
@@ -46,6 +71,7 @@ class BuilderMode:
             project_type: Tipo de proyecto (react, nextjs, vue, etc)
             name: Nombre del proyecto
             options: Opciones adicionales
+            progress: Callback invocado con cada paso completado
         
         Returns:
             {
@@ -68,6 +94,7 @@ class BuilderMode:
         
         logger.info(f"Creando proyecto {project_type}: {name}")
         
+        self._local.progress = progress
         try:
             # Ejecutar template correspondiente
             template_func = self.project_templates[project_type]
@@ -86,10 +113,12 @@ class BuilderMode:
                 "ok": False,
                 "error": str(e)
             }
+        finally:
+            self._local.progress = None
     
     def _create_react_app(self, name: str, options: Dict) -> Dict:
         """Crea una aplicación React"""
-        steps = []
+        steps = self._new_steps()
         
         # Verificar npm
         npm_check = self.executor.check_tool_installed("npm")
@@ -153,7 +182,7 @@ class BuilderMode:
     
     def _create_nextjs_app(self, name: str, options: Dict) -> Dict:
         """Crea una aplicación Next.js"""
-        steps = []
+        steps = self._new_steps()
         
         npm_check = self.executor.check_tool_installed("npm")
         if not npm_check["installed"]:
@@ -204,7 +233,7 @@ class BuilderMode:
     
     def _create_vue_app(self, name: str, options: Dict) -> Dict:
         """Crea una aplicación Vue"""
-        steps = []
+        steps = self._new_steps()
         
         npm_check = self.executor.check_tool_installed("npm")
         if not npm_check["installed"]:
@@ -241,7 +270,7 @@ class BuilderMode:
     
     def _create_python_api(self, name: str, options: Dict) -> Dict:
         """Crea una API Python con Flask o FastAPI"""
-        steps = []
+        steps = self._new_steps()
         
         # Verificar Python
         python_check = self.executor.check_tool_installed("python")
@@ -316,7 +345,7 @@ def health():
     
     def _create_express_app(self, name: str, options: Dict) -> Dict:
         """Crea una API Express (Node.js)"""
-        steps = []
+        steps = self._new_steps()
         
         npm_check = self.executor.check_tool_installed("npm")
         if not npm_check["installed"]:
@@ -386,7 +415,7 @@ app.listen(PORT, () => {
     
     def _create_html_static(self, name: str, options: Dict) -> Dict:
         """Crea un sitio HTML estático"""
-        steps = []
+        steps = self._new_steps()
         
         # Crear directorio
         project_path = self.workspace_root / name
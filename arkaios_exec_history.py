@@ -0,0 +1,332 @@
+# arkaios_exec_history.py - Historial de ejecuciones para ARKAIOS
+"""
+Historial acotado de comandos ejecutados: buffer circular en memoria con
+registros compactos y persistencia opcional en SQLite (modo WAL) para
+consultas por comando, directorio, resultado y ventana de tiempo
+"""
+
+import math
+import time
+import sqlite3
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+logger = logging.getLogger("arkaios.exec_history")
+
+# Columnas en el orden de ExecutionRecord.__init__
+_COLUMNS = ("command", "program", "cwd", "return_code", "duration", "ts",
+            "cpu_user", "cpu_sys", "max_rss_kb", "output_bytes")
+_SELECT = "SELECT " + ", ".join(_COLUMNS) + " FROM executions"
+
+# Columnas añadidas después de la primera versión del esquema
+_MIGRATIONS = {
+    "cpu_user": "REAL",
+    "cpu_sys": "REAL",
+    "max_rss_kb": "INTEGER",
+    "output_bytes": "INTEGER",
+}
+
+
+class ExecutionRecord:
+    """Registro compacto de una ejecución"""
+
+    __slots__ = ("command", "program", "cwd", "return_code", "duration", "ts",
+                 "cpu_user", "cpu_sys", "max_rss_kb", "output_bytes")
+
+    def __init__(self, command: str, program: str, cwd: str, return_code: int,
+                 duration: float, ts: int, cpu_user: float = None, cpu_sys: float = None,
+                 max_rss_kb: int = None, output_bytes: int = None):
+        self.command = command
+        self.program = program
+        self.cwd = cwd
+        self.return_code = return_code
+        self.duration = duration
+        self.ts = ts  # epoch en ms
+        # Consumo del hijo (wait4); None si no se midió
+        self.cpu_user = cpu_user
+        self.cpu_sys = cpu_sys
+        self.max_rss_kb = max_rss_kb
+        self.output_bytes = output_bytes
+
+    @property
+    def success(self) -> bool:
+        return self.return_code == 0
+
+    def matches(self, command: str = None, cwd: str = None, success: bool = None,
+                since: int = None, until: int = None) -> bool:
+        if command and self.program != command and not self.command.startswith(command):
+            return False
+        if cwd is not None and self.cwd != cwd:
+            return False
+        if success is not None and self.success != success:
+            return False
+        if since is not None and self.ts < since:
+            return False
+        if until is not None and self.ts > until:
+            return False
+        return True
+
+    def to_dict(self) -> Dict:
+        return {
+            "command": self.command,
+            "cwd": self.cwd,
+            "return_code": self.return_code,
+            "duration": self.duration,
+            "timestamp": datetime.fromtimestamp(self.ts / 1000).isoformat(),
+            "ts": self.ts,
+            "success": self.success,
+            "cpu_user": self.cpu_user,
+            "cpu_sys": self.cpu_sys,
+            "max_rss_kb": self.max_rss_kb,
+            "output_bytes": self.output_bytes,
+        }
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(len(sorted_values), rank) - 1]
+
+
+class ExecutionHistory:
+    """Buffer circular de ejecuciones con persistencia SQLite opcional"""
+
+    def __init__(self, path: str = None, max_entries: int = 1000,
+                 max_rows: int = 100000, prune_every: int = 1000):
+        """
+        Args:
+            path: Ruta de la base SQLite (None = solo memoria)
+            max_entries: Registros que se conservan en memoria
+            max_rows: Registros máximos en SQLite (los más antiguos se purgan)
+            prune_every: Cada cuántas altas se purga SQLite
+        """
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+
+        self._ring: "deque[ExecutionRecord]" = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._adds = 0
+
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = self._conn()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS executions ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " command TEXT NOT NULL,"
+                " program TEXT NOT NULL,"
+                " cwd TEXT NOT NULL,"
+                " return_code INTEGER,"
+                " duration REAL NOT NULL,"
+                " ts INTEGER NOT NULL)"
+            )
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(executions)")}
+            for column, kind in _MIGRATIONS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE executions ADD COLUMN {column} {kind}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_executions_ts ON executions(ts)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_executions_program ON executions(program, ts)")
+            conn.commit()
+            self._load()
+
+        logger.info(
+            f"ExecutionHistory iniciado. Memoria: {max_entries} registros, "
+            f"SQLite: {self.path or 'desactivado'}"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        """Una conexión por hilo"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def _load(self):
+        """Recupera los registros más recientes tras un reinicio"""
+        rows = self._conn().execute(
+            f"{_SELECT} ORDER BY id DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        with self._lock:
+            for row in reversed(rows):
+                self._ring.append(ExecutionRecord(*row))
+
+    def add(self, command: str, cwd: str, return_code: int, duration: float,
+            ts: int = None, usage: Dict = None) -> ExecutionRecord:
+        """
+        Registra una ejecución terminada
+
+        Args:
+            usage: Consumo del hijo {"cpu_user", "cpu_sys", "max_rss_kb", "output_bytes"}
+        """
+        program = command.split(" ", 1)[0]
+        usage = usage or {}
+        record = ExecutionRecord(
+            command, program, cwd, return_code, duration,
+            ts if ts is not None else int(time.time() * 1000),
+            usage.get("cpu_user"), usage.get("cpu_sys"),
+            usage.get("max_rss_kb"), usage.get("output_bytes"),
+        )
+        with self._lock:
+            self._ring.append(record)
+            self._adds += 1
+            prune = self._adds % self.prune_every == 0
+
+        if self.path is not None:
+            try:
+                conn = self._conn()
+                conn.execute(
+                    f"INSERT INTO executions ({', '.join(_COLUMNS)})"
+                    f" VALUES ({', '.join('?' * len(_COLUMNS))})",
+                    tuple(getattr(record, column) for column in _COLUMNS),
+                )
+                if prune:
+                    conn.execute(
+                        "DELETE FROM executions WHERE id <= (SELECT MAX(id) FROM executions) - ?",
+                        (self.max_rows,),
+                    )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo persistir la ejecución: {e}")
+        return record
+
+    def recent(self, limit: int = 10) -> List[Dict]:
+        """Últimas ejecuciones (más antigua primero), desde memoria"""
+        with self._lock:
+            records = list(self._ring)[-limit:] if limit > 0 else []
+        return [record.to_dict() for record in records]
+
+    @staticmethod
+    def _where(command: str = None, cwd: str = None, success: bool = None,
+               since: int = None, until: int = None) -> tuple:
+        clauses, params = [], []
+        if command:
+            clauses.append("(program = ? OR command LIKE ? ESCAPE '\\')")
+            escaped = command.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params += [command, escaped + "%"]
+        if cwd is not None:
+            clauses.append("cwd = ?")
+            params.append(cwd)
+        if success is not None:
+            clauses.append("return_code = 0" if success else "(return_code IS NULL OR return_code != 0)")
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts <= ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, command: str = None, cwd: str = None, success: bool = None,
+              since: int = None, until: int = None, limit: int = 50) -> Dict:
+        """
+        Consulta ejecuciones (más recientes primero)
+
+        Args:
+            command: Programa ("npm") o prefijo del comando completo ("npm install")
+            cwd: Directorio relativo al workspace
+            success: Filtra por éxito/fallo
+            since: Timestamp mínimo (ms, inclusivo)
+            until: Timestamp máximo (ms, inclusivo)
+            limit: Máximo de registros
+
+        Returns:
+            {"ok": bool, "executions": [...], "count": int}
+        """
+        filters = dict(command=command, cwd=cwd, success=success, since=since, until=until)
+        if self.path is None:
+            with self._lock:
+                records = [r for r in reversed(self._ring) if r.matches(**filters)][:limit]
+        else:
+            where, params = self._where(**filters)
+            rows = self._conn().execute(
+                f"{_SELECT}{where} ORDER BY id DESC LIMIT ?",
+                params + [limit],
+            ).fetchall()
+            records = [ExecutionRecord(*row) for row in rows]
+
+        executions = [record.to_dict() for record in records]
+        return {"ok": True, "executions": executions, "count": len(executions)}
+
+    def duration_stats(self, command: str = None, since: int = None,
+                       until: int = None) -> Dict:
+        """
+        Estadísticas de duración y consumo por programa
+
+        Returns:
+            {"ok": bool, "stats": {programa: {"count", "failures", "mean", "p50", "p95", "max",
+                                              "cpu_total", "max_rss_kb", "output_bytes"}}}
+        """
+        filters = dict(command=command, since=since, until=until)
+        if self.path is None:
+            with self._lock:
+                rows = [
+                    (r.program, r.duration, r.return_code, r.cpu_user, r.cpu_sys, r.max_rss_kb, r.output_bytes)
+                    for r in self._ring if r.matches(**filters)
+                ]
+        else:
+            where, params = self._where(**filters)
+            rows = self._conn().execute(
+                "SELECT program, duration, return_code, cpu_user, cpu_sys, max_rss_kb, output_bytes"
+                f" FROM executions{where}", params
+            ).fetchall()
+
+        by_program: Dict[str, list] = {}
+        failures: Dict[str, int] = {}
+        usage: Dict[str, Dict] = {}
+        for program, duration, return_code, cpu_user, cpu_sys, max_rss_kb, output_bytes in rows:
+            by_program.setdefault(program, []).append(duration)
+            if return_code != 0:
+                failures[program] = failures.get(program, 0) + 1
+            totals = usage.setdefault(program, {"cpu_total": 0.0, "max_rss_kb": 0, "output_bytes": 0})
+            totals["cpu_total"] += (cpu_user or 0) + (cpu_sys or 0)
+            totals["max_rss_kb"] = max(totals["max_rss_kb"], max_rss_kb or 0)
+            totals["output_bytes"] += output_bytes or 0
+
+        stats = {}
+        for program, durations in by_program.items():
+            durations.sort()
+            stats[program] = {
+                "count": len(durations),
+                "failures": failures.get(program, 0),
+                "mean": sum(durations) / len(durations),
+                "p50": _percentile(durations, 50),
+                "p95": _percentile(durations, 95),
+                "max": durations[-1],
+                **usage[program],
+            }
+        return {"ok": True, "stats": stats}
+
+    def clear(self):
+        """Vacía el historial (memoria y SQLite)"""
+        with self._lock:
+            self._ring.clear()
+        if self.path is not None:
+            conn = self._conn()
+            conn.execute("DELETE FROM executions")
+            conn.commit()
+
+
+# Singleton instance
+_history_instance = None
+
+
+def get_execution_history(path: str = None, **kwargs) -> ExecutionHistory:
+    """Obtiene la instancia singleton del historial de ejecuciones"""
+    global _history_instance
+    if _history_instance is None:
+        _history_instance = ExecutionHistory(path, **kwargs)
+    return _history_instance
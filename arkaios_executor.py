@@ -4,15 +4,28 @@ Sistema seguro de ejecución de comandos con sandboxing y timeout
 """
 
 import os
+import time
+import queue
 import subprocess
 import logging
 import threading
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 from pathlib import Path
 from datetime import datetime
 
+from arkaios_jobs import current_job
+from arkaios_admission import AdmissionRejected
+from arkaios_metrics import get_metrics
+from arkaios_exec_history import ExecutionHistory
+from arkaios_output_store import OutputStore
+from arkaios_result_cache import ResultCache
+from arkaios_rlimits import DEFAULT_LIMIT_PROFILES, make_preexec, profile_for, wait_with_usage
+
 logger = logging.getLogger("arkaios.executor")
 
+# Usuario de las sondas internas (versiones de herramientas): no pasan por admisión
+SYSTEM_USER = "system"
+
 
 class CommandExecutor:
     """Ejecutor de comandos con seguridad y control"""
@@ -25,7 +38,6 @@ class CommandExecutor:
         """
         self.workspace_root = Path(workspace_root or os.getcwd()).resolve()
         self.default_timeout = timeout
-        self.execution_history = []
         
         # Comandos permitidos (whitelist)
         self.allowed_commands = {
@@ -64,8 +76,34 @@ class CommandExecutor:
             "dd", "mkfs", "fdisk", "kill", "killall",
         ]
         
-        # Máximo historial
+        # Máximo historial (en memoria; se puede sustituir por uno persistente)
         self.max_history = 50
+        self.history = ExecutionHistory(max_entries=self.max_history)
+        
+        # Control de admisión opcional (AdmissionController)
+        self.admission = None
+        
+        # Captura de salida acotada (lo que supera el umbral se vuelca a disco)
+        self.output_store = OutputStore()
+        
+        # Caché de comandos idempotentes (solo con cache=True)
+        self.result_cache = ResultCache()
+        
+        # Pools de intérpretes precalentados {"python": InterpreterPool, "node": ...}
+        # (vacío = cada fragmento lanza un proceso nuevo)
+        self.interpreter_pools = {}
+        
+        # Límites de recursos por comando (RLIMIT_CPU/AS/NOFILE, solo POSIX)
+        self.enforce_limits = True
+        self.limit_profiles = {name: dict(p) for name, p in DEFAULT_LIMIT_PROFILES.items()}
+        
+        # npm: caché compartida (npm_config_cache) y modo prefer-offline
+        self.npm_cache_dir = None
+        self.npm_prefer_offline = True
+        # Instalaciones en curso (para unir peticiones idénticas) y un lock por directorio
+        self._npm_lock = threading.Lock()
+        self._npm_inflight: Dict[tuple, Dict] = {}
+        self._npm_dir_locks: Dict[str, threading.Lock] = {}
         
         logger.info(f"CommandExecutor iniciado. Workspace: {self.workspace_root}")
     
@@ -97,38 +135,20 @@ class CommandExecutor:
         
         return True, "OK"
     
-    def execute_command(self, command: str, args: List[str] = None,
-                       cwd: str = None, timeout: int = None,
-                       env: Dict[str, str] = None) -> Dict:
+    def _prepare_command(self, command: str, args: List[str], cwd: str = None,
+                         env: Dict[str, str] = None) -> tuple:
         """
-        Ejecuta un comando de forma segura
-        
-        Args:
-            command: Comando a ejecutar
-            args: Lista de argumentos
-            cwd: Directorio de trabajo (relativo al workspace)
-            timeout: Timeout en segundos
-            env: Variables de entorno adicionales
+        Valida el comando y prepara directorio y ambiente
         
         Returns:
-            {
-                "ok": bool,
-                "command": str,
-                "stdout": str,
-                "stderr": str,
-                "return_code": int,
-                "duration": float,
-                "error": str
-            }
+            (full_command, work_dir, exec_env, error) donde error es None o
+            el dict de respuesta a devolver
         """
-        args = args or []
-        timeout = timeout or self.default_timeout
-        
         # Validar comando
         allowed, reason = self._is_command_allowed(command, args)
         if not allowed:
             logger.warning(f"Comando rechazado: {command} {args}. Razón: {reason}")
-            return {
+            return None, None, None, {
                 "ok": False,
                 "command": f"{command} {' '.join(args)}",
                 "error": reason,
@@ -141,7 +161,7 @@ class CommandExecutor:
             work_dir = self.workspace_root
         
         if not work_dir.exists():
-            return {
+            return None, None, None, {
                 "ok": False,
                 "command": f"{command} {' '.join(args)}",
                 "error": f"Directorio no existe: {cwd}",
@@ -155,8 +175,135 @@ class CommandExecutor:
         # Construir comando completo
         full_command = [command] + args
         
+        return full_command, work_dir, exec_env, None
+    
+    def _record_execution(self, full_command: List[str], work_dir: Path,
+                          return_code: int, duration: float, start_time: datetime,
+                          usage: Dict = None):
+        """Registra una ejecución en el historial"""
+        self.history.add(
+            ' '.join(full_command),
+            str(work_dir.relative_to(self.workspace_root)),
+            return_code,
+            duration,
+            ts=int(start_time.timestamp() * 1000),
+            usage=usage,
+        )
+    
+    def _preexec(self, command: str):
+        """preexec_fn con los límites del perfil del comando (o None)"""
+        if not self.enforce_limits:
+            return None
+        return make_preexec(profile_for(self.limit_profiles, command))
+    
+    def _admit(self, command: str, args: List[str], user: str = None) -> tuple:
+        """
+        Reserva un slot de ejecución si hay control de admisión
+        
+        Returns:
+            (ticket, error) donde error es el dict de respuesta si se rechazó
+        """
+        if self.admission is None or user == SYSTEM_USER:
+            # Las sondas internas son cortas (timeout 5s) y no deben competir
+            # con el cupo por usuario: un barrido rechazado se cachearía como
+            # "no instalado"
+            return None, None
+        
+        if user is None:
+            job = current_job()
+            user = job.user if job is not None and job.user else "anon"
+        
+        try:
+            return self.admission.acquire(user, command, args), None
+        except AdmissionRejected as e:
+            logger.warning(f"Comando rechazado por capacidad: {command} {args}. {e}")
+            return None, {
+                "ok": False,
+                "command": f"{command} {' '.join(args)}",
+                "error": str(e),
+                "rejected": True,
+                "retry_after": e.retry_after,
+            }
+    
+    def _release(self, ticket, started: float):
+        if ticket is not None:
+            self.admission.release(ticket, time.monotonic() - started)
+    
+    def execute_command(self, command: str, args: List[str] = None,
+                       cwd: str = None, timeout: int = None,
+                       env: Dict[str, str] = None, user: str = None,
+                       cache: bool = False) -> Dict:
+        """
+        Ejecuta un comando de forma segura
+        
+        Args:
+            command: Comando a ejecutar
+            args: Lista de argumentos
+            cwd: Directorio de trabajo (relativo al workspace)
+            timeout: Timeout en segundos
+            env: Variables de entorno adicionales
+            user: Usuario/sesión para los límites de concurrencia
+            cache: Reutilizar el resultado si el comando es idempotente (versiones,
+                   git de solo lectura) y el estado del que depende no cambió
+        
+        Returns:
+            {
+                "ok": bool,
+                "command": str,
+                "stdout": str,
+                "stderr": str,
+                "truncated": bool (si True, stdout/stderr son principio + final),
+                "cached": bool (si el resultado viene de la caché),
+                "output_id": str (si truncated; ver OutputStore.read),
+                "return_code": int,
+                "duration": float,
+                "resources": {"cpu_user", "cpu_sys", "max_rss_kb", "output_bytes"} (POSIX),
+                "error": str,
+                "retry_after": int (si se rechazó por capacidad)
+            }
+        """
+        args = args or []
+        timeout = timeout or self.default_timeout
+        
+        full_command, work_dir, exec_env, error = self._prepare_command(command, args, cwd, env)
+        if error:
+            return error
+        
+        cache_key = None
+        if cache and self.result_cache is not None:
+            cache_key = self.result_cache.key_for(command, args, work_dir, exec_env)
+            if cache_key is not None:
+                cached = self.result_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+        
+        result = self._execute(command, args, full_command, work_dir, exec_env, timeout, user)
+        
+        if cache_key is not None:
+            self.result_cache.put(cache_key, result)
+        return result
+    
+    def _execute(self, command: str, args: List[str], full_command: List[str],
+                 work_dir: Path, exec_env: Dict[str, str], timeout: int,
+                 user: str = None) -> Dict:
+        """Lanza el proceso ya validado (ver execute_command)"""
         start_time = datetime.now()
         
+        # Si corre dentro de un trabajo asíncrono, permitir cancelarlo
+        job = current_job()
+        if job is not None and job.cancel_event.is_set():
+            return {
+                "ok": False,
+                "command": ' '.join(full_command),
+                "error": "Trabajo cancelado",
+            }
+        
+        ticket, rejection = self._admit(command, args, user)
+        if rejection:
+            return rejection
+        
+        admitted_at = time.monotonic()
+        process = None
         try:
             logger.info(f"Ejecutando: {' '.join(full_command)} en {work_dir}")
             
@@ -167,50 +314,60 @@ class CommandExecutor:
                 env=exec_env,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
                 shell=False,  # Importante: no usar shell para seguridad
+                preexec_fn=self._preexec(command),
             )
+            get_metrics().inc("arkaios_executor_spawns_total", command=command, mode="blocking")
+            if job is not None:
+                job.attach_process(process)
             
-            # Esperar con timeout
-            try:
-                stdout, stderr = process.communicate(timeout=timeout)
-                return_code = process.returncode
-            except subprocess.TimeoutExpired:
-                process.kill()
-                stdout, stderr = process.communicate()
+            capture = self.output_store.capture()
+            readers = [
+                threading.Thread(target=_pump_bytes, args=(process.stdout, capture.stdout), daemon=True),
+                threading.Thread(target=_pump_bytes, args=(process.stderr, capture.stderr), daemon=True),
+            ]
+            for reader in readers:
+                reader.start()
+            
+            # Esperar con timeout (wait4 devuelve también el consumo del hijo)
+            return_code, usage, timed_out = wait_with_usage(process, timeout)
+            if timed_out:
+                # Un nieto puede mantener el pipe abierto: no esperar indefinidamente.
+                # Si un lector sigue vivo, la captura ya cerrada descarta lo que lea
+                join_deadline = time.monotonic() + 5
+                for reader in readers:
+                    reader.join(timeout=max(0.0, join_deadline - time.monotonic()))
                 logger.warning(f"Comando excedió timeout de {timeout}s")
                 return {
                     "ok": False,
                     "command": ' '.join(full_command),
-                    "stdout": stdout,
-                    "stderr": stderr,
+                    **capture.result(),
                     "error": f"Timeout de {timeout} segundos excedido",
                     "duration": timeout,
                 }
+            for reader in readers:
+                reader.join()
+            output = capture.result()
             
             duration = (datetime.now() - start_time).total_seconds()
+            if usage is not None:
+                usage["output_bytes"] = capture.stdout.size + capture.stderr.size
             
             # Registrar en historial
-            execution_record = {
-                "command": ' '.join(full_command),
-                "cwd": str(work_dir.relative_to(self.workspace_root)),
-                "return_code": return_code,
-                "duration": duration,
-                "timestamp": start_time.isoformat(),
-                "success": return_code == 0,
-            }
-            self.execution_history.append(execution_record)
+            self._record_execution(full_command, work_dir, return_code, duration, start_time, usage)
             
             logger.info(f"Comando completado. Código: {return_code}, Duración: {duration:.2f}s")
             
-            return {
+            result = {
                 "ok": return_code == 0,
                 "command": ' '.join(full_command),
-                "stdout": stdout,
-                "stderr": stderr,
+                **output,
                 "return_code": return_code,
                 "duration": duration,
             }
+            if usage is not None:
+                result["resources"] = usage
+            return result
         
         except FileNotFoundError:
             return {
@@ -225,6 +382,163 @@ class CommandExecutor:
                 "command": ' '.join(full_command),
                 "error": str(e),
             }
+        finally:
+            self._release(ticket, admitted_at)
+            if job is not None and process is not None:
+                job.detach_process(process)
+    
+    def stream_command(self, command: str, args: List[str] = None,
+                       cwd: str = None, timeout: int = None,
+                       env: Dict[str, str] = None, user: str = None) -> Iterator[Dict]:
+        """
+        Ejecuta un comando emitiendo su salida línea a línea
+        
+        stdout y stderr se leen en hilos separados para no bloquear el
+        proceso cuando uno de los pipes se llena.
+        
+        Yields:
+            {"event": "start", "command": str, "pid": int}
+            {"event": "stdout" | "stderr", "data": str}
+            {"event": "exit", "ok": bool, "return_code": int, "duration": float,
+             "resources": {...} (si hay wait4)}
+            {"event": "error", "ok": False, "error": str, ...}
+        """
+        args = args or []
+        timeout = timeout or self.default_timeout
+        
+        full_command, work_dir, exec_env, error = self._prepare_command(command, args, cwd, env)
+        if error:
+            yield dict(error, event="error")
+            return
+        
+        ticket, rejection = self._admit(command, args, user)
+        if rejection:
+            yield dict(rejection, event="error")
+            return
+        
+        admitted_at = time.monotonic()
+        try:
+            yield from self._stream_process(command, full_command, work_dir, exec_env, timeout)
+        finally:
+            self._release(ticket, admitted_at)
+    
+    def _stream_process(self, command: str, full_command: List[str], work_dir: Path,
+                        exec_env: Dict[str, str], timeout: int) -> Iterator[Dict]:
+        """Lanza el proceso y emite sus eventos (ver stream_command)"""
+        command_str = ' '.join(full_command)
+        start_time = datetime.now()
+        started = time.monotonic()
+        
+        try:
+            logger.info(f"Ejecutando (stream): {command_str} en {work_dir}")
+            process = subprocess.Popen(
+                full_command,
+                cwd=str(work_dir),
+                env=exec_env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                errors="replace",
+                bufsize=1,
+                shell=False,  # Importante: no usar shell para seguridad
+                preexec_fn=self._preexec(command),
+            )
+            get_metrics().inc("arkaios_executor_spawns_total", command=command, mode="stream")
+        except FileNotFoundError:
+            yield {
+                "event": "error",
+                "ok": False,
+                "command": command_str,
+                "error": f"Comando '{command}' no encontrado. ¿Está instalado?",
+            }
+            return
+        except Exception as e:
+            logger.error(f"Error ejecutando comando: {e}")
+            yield {"event": "error", "ok": False, "command": command_str, "error": str(e)}
+            return
+        
+        events = queue.Queue(maxsize=1024)
+        
+        def pump(pipe, name):
+            try:
+                for line in iter(pipe.readline, ""):
+                    events.put((name, line))
+            finally:
+                pipe.close()
+                events.put((name, None))
+        
+        readers = [
+            threading.Thread(target=pump, args=(process.stdout, "stdout"), daemon=True),
+            threading.Thread(target=pump, args=(process.stderr, "stderr"), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        
+        yield {"event": "start", "command": command_str, "pid": process.pid}
+        
+        deadline = started + timeout
+        open_pipes = 2
+        output_bytes = 0
+        timed_out = False
+        try:
+            while open_pipes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    process.kill()
+                    break
+                try:
+                    name, line = events.get(timeout=min(remaining, 1.0))
+                except queue.Empty:
+                    continue
+                if line is None:
+                    open_pipes -= 1
+                    continue
+                output_bytes += len(line.encode(errors="replace"))
+                yield {"event": name, "data": line}
+            
+            # wait4: el mismo consumo de recursos que execute_command
+            return_code, usage, _ = wait_with_usage(process)
+            duration = time.monotonic() - started
+            
+            if timed_out:
+                logger.warning(f"Comando excedió timeout de {timeout}s")
+                yield {
+                    "event": "error",
+                    "ok": False,
+                    "command": command_str,
+                    "error": f"Timeout de {timeout} segundos excedido",
+                    "duration": duration,
+                }
+                return
+            
+            if usage is not None:
+                usage["output_bytes"] = output_bytes
+            self._record_execution(full_command, work_dir, return_code, duration, start_time, usage)
+            logger.info(f"Comando completado. Código: {return_code}, Duración: {duration:.2f}s")
+            
+            event = {
+                "event": "exit",
+                "ok": return_code == 0,
+                "command": command_str,
+                "return_code": return_code,
+                "duration": duration,
+            }
+            if usage is not None:
+                event["resources"] = usage
+            yield event
+        finally:
+            # Cliente desconectado o generador cerrado: no dejar procesos huérfanos
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            # Vaciar la cola para que los hilos lectores no queden bloqueados
+            while open_pipes:
+                try:
+                    if events.get(timeout=1.0)[1] is None:
+                        open_pipes -= 1
+                except queue.Empty:
+                    break
     
     def execute_shell_script(self, script: str, cwd: str = None, 
                             timeout: int = None) -> Dict:
@@ -246,7 +560,7 @@ class CommandExecutor:
         }
     
     def execute_python_code(self, code: str, cwd: str = None, 
-                           timeout: int = None) -> Dict:
+                           timeout: int = None, user: str = None) -> Dict:
         """
         Ejecuta código Python
         
@@ -254,19 +568,24 @@ class CommandExecutor:
             code: Código Python a ejecutar
             cwd: Directorio de trabajo
             timeout: Timeout en segundos
+            user: Usuario/sesión para los límites de concurrencia
         
         Returns:
             Similar a execute_command
         """
+        pooled = self._run_pooled("python", ["-c", code], cwd, timeout, user)
+        if pooled is not None:
+            return pooled
         return self.execute_command(
             "python",
             ["-c", code],
             cwd=cwd,
-            timeout=timeout
+            timeout=timeout,
+            user=user
         )
     
     def execute_node_script(self, script: str, cwd: str = None,
-                           timeout: int = None) -> Dict:
+                           timeout: int = None, user: str = None) -> Dict:
         """
         Ejecuta código Node.js
         
@@ -274,19 +593,76 @@ class CommandExecutor:
             script: Código JavaScript a ejecutar
             cwd: Directorio de trabajo
             timeout: Timeout en segundos
+            user: Usuario/sesión para los límites de concurrencia
         
         Returns:
             Similar a execute_command
         """
+        pooled = self._run_pooled("node", ["-e", script], cwd, timeout, user)
+        if pooled is not None:
+            return pooled
         return self.execute_command(
             "node",
             ["-e", script],
             cwd=cwd,
-            timeout=timeout
+            timeout=timeout,
+            user=user
         )
     
+    def _run_pooled(self, kind: str, args: List[str], cwd: str = None,
+                    timeout: int = None, user: str = None) -> Optional[Dict]:
+        """
+        Ejecuta un fragmento en un intérprete precalentado
+        
+        Pasa por el mismo control de admisión que execute_command y los
+        workers arrancan con el perfil de límites del intérprete.
+        
+        Returns:
+            Resultado como execute_command, o None si no hay pool disponible
+            (en ese caso se lanza un proceso nuevo)
+        """
+        pool = self.interpreter_pools.get(kind)
+        if pool is None or not pool.available:
+            return None
+        
+        full_command, work_dir, _, error = self._prepare_command(kind, args, cwd)
+        if error:
+            return error
+        
+        if pool.preexec_fn is None:
+            pool.preexec_fn = self._preexec(kind)
+        
+        ticket, rejection = self._admit(kind, args, user)
+        if rejection:
+            return rejection
+        
+        timeout = timeout or self.default_timeout
+        start_time = datetime.now()
+        started = time.monotonic()
+        # La salida pasa por la misma captura acotada que execute_command
+        capture = self.output_store.capture()
+        try:
+            result = pool.run(args[1], str(work_dir), timeout, capture)
+        except OSError:
+            logger.warning(f"No se pudo arrancar el pool de {kind}; se usará un proceso por fragmento")
+            return None
+        finally:
+            self._release(ticket, started)
+        duration = time.monotonic() - started
+        get_metrics().inc("arkaios_executor_spawns_total", command=kind, mode="pooled")
+        result.update(capture.result())
+        
+        usage = result.get("resources")
+        if usage is not None:
+            usage["output_bytes"] = capture.stdout.size + capture.stderr.size
+        if "return_code" in result:
+            self._record_execution(full_command, work_dir, result["return_code"], duration, start_time, usage)
+        
+        result.update({"command": ' '.join(full_command), "duration": duration, "pooled": True})
+        return result
+    
     def npm_install(self, packages: List[str] = None, cwd: str = None,
-                   dev: bool = False, timeout: int = None) -> Dict:
+                   dev: bool = False, timeout: int = None, user: str = None) -> Dict:
         """
         Instala paquetes npm
         
@@ -295,9 +671,15 @@ class CommandExecutor:
             cwd: Directorio del proyecto
             dev: Si True, instala como devDependencies
             timeout: Timeout en segundos
+            user: Usuario/sesión para los límites de concurrencia
+        
+        Instalaciones idénticas simultáneas (mismo directorio, paquetes y tipo)
+        comparten un único proceso y resultado; instalaciones distintas en el
+        mismo directorio se serializan para no pisarse en node_modules.
         
         Returns:
-            Similar a execute_command
+            Similar a execute_command ("coalesced": True si se reutilizó
+            el resultado de otra petición en curso)
         """
         args = ["install"]
         
@@ -307,10 +689,48 @@ class CommandExecutor:
         if packages:
             args.extend(packages)
         
-        return self.execute_command("npm", args, cwd=cwd, timeout=timeout or 600)
+        dir_key = str((self.workspace_root / cwd).resolve() if cwd else self.workspace_root)
+        key = (dir_key, dev, tuple(sorted(packages or [])))
+        
+        with self._npm_lock:
+            flight = self._npm_inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._npm_inflight[key] = {"done": threading.Event(), "result": None}
+            dir_lock = self._npm_dir_locks.setdefault(dir_key, threading.Lock())
+        
+        if not leader:
+            logger.info(f"npm install en curso para {dir_key}; esperando su resultado")
+            flight["done"].wait()
+            return dict(flight["result"], coalesced=True)
+        
+        try:
+            with dir_lock:
+                flight["result"] = self.execute_command(
+                    "npm", args, cwd=cwd, timeout=timeout or 600,
+                    env=self._npm_env(), user=user,
+                )
+        except Exception as e:
+            flight["result"] = {"ok": False, "command": f"npm {' '.join(args)}", "error": str(e)}
+            raise
+        finally:
+            with self._npm_lock:
+                del self._npm_inflight[key]
+            flight["done"].set()
+        
+        return flight["result"]
+    
+    def _npm_env(self) -> Dict[str, str]:
+        """Variables para que npm use la caché compartida y evite la red si puede"""
+        env = {}
+        if self.npm_cache_dir:
+            env["npm_config_cache"] = str(self.npm_cache_dir)
+        if self.npm_prefer_offline:
+            env["npm_config_prefer_offline"] = "true"
+        return env
     
     def git_command(self, git_args: List[str], cwd: str = None,
-                   timeout: int = None) -> Dict:
+                   timeout: int = None, user: str = None, cache: bool = False) -> Dict:
         """
         Ejecuta comando Git
         
@@ -318,11 +738,13 @@ class CommandExecutor:
             git_args: Argumentos para git
             cwd: Directorio del repositorio
             timeout: Timeout en segundos
+            user: Usuario/sesión para los límites de concurrencia
+            cache: Reutilizar resultados de comandos de solo lectura
         
         Returns:
             Similar a execute_command
         """
-        return self.execute_command("git", git_args, cwd=cwd, timeout=timeout)
+        return self.execute_command("git", git_args, cwd=cwd, timeout=timeout, user=user, cache=cache)
     
     def git_init(self, cwd: str = None) -> Dict:
         """Inicializa un repositorio Git"""
@@ -341,10 +763,14 @@ class CommandExecutor:
         """Push de cambios al remote"""
         return self.git_command(["push"], cwd=cwd)
     
-    def check_tool_installed(self, tool: str) -> Dict:
+    def check_tool_installed(self, tool: str, cache: bool = True) -> Dict:
         """
         Verifica si una herramienta está instalada
         
+        Args:
+            tool: Herramienta a verificar
+            cache: Reutilizar la última sonda mientras PATH no cambie
+        
         Returns:
             {
                 "ok": bool,
@@ -364,7 +790,7 @@ class CommandExecutor:
         
         args = version_args.get(tool, ["--version"])
         
-        result = self.execute_command(tool, args, timeout=5)
+        result = self.execute_command(tool, args, timeout=5, user=SYSTEM_USER, cache=cache)
         
         if result["ok"]:
             version = result["stdout"].strip()
@@ -384,11 +810,20 @@ class CommandExecutor:
     
     def get_history(self, limit: int = 10) -> List[Dict]:
         """Obtiene el historial de ejecuciones"""
-        return self.execution_history[-limit:]
+        return self.history.recent(limit)
     
     def clear_history(self):
         """Limpia el historial"""
-        self.execution_history = []
+        self.history.clear()
+
+
+def _pump_bytes(pipe, capture):
+    """Copia un pipe a su captura por bloques hasta EOF"""
+    try:
+        for chunk in iter(lambda: pipe.read1(64 * 1024), b""):
+            capture.write(chunk)
+    finally:
+        pipe.close()
 
 
 # Singleton instance
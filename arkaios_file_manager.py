@@ -4,13 +4,22 @@ Sistema de gestión de archivos seguro con sandboxing
 """
 
 import os
+import re
 import json
 import shutil
+import hashlib
 import logging
-from pathlib import Path
-from typing import List, Dict, Optional, Union
+import threading
+from itertools import islice
+from pathlib import Path, PurePath
+from typing import Dict, Iterator, List, Optional, Union
 from datetime import datetime
 
+from arkaios_metrics import count_calls
+from arkaios_file_reader import FileReader
+from arkaios_search_engine import ContentSearchEngine, SearchRun
+from arkaios_walker import Walker, sort_key
+
 logger = logging.getLogger("arkaios.file_manager")
 
 
@@ -57,6 +66,26 @@ class FileManager:
         # Favoritos
         self.favorites = []
         
+        # Generación del workspace: se incrementa con cada escritura hecha
+        # por el file manager e invalida los ETags de árboles cacheados
+        self._generation = 0
+        # (directorio, max_depth) -> (generación, [(dir, mtime_ns)], etag)
+        self._tree_signatures = {}
+        self._signature_lock = threading.Lock()
+        
+        # Índice vivo de metadatos (WorkspaceIndex); None = recorrer el disco
+        self.index = None
+        # Índice de trigramas (TrigramIndex) que acota la búsqueda en contenido
+        self.content_index = None
+        # Búsqueda en contenido en paralelo (el pool se crea en la primera búsqueda)
+        self.search_engine = ContentSearchEngine()
+        # Recorrido del disco: poda SKIP_DIRS y lo ignorado por .gitignore/.arkaiosignore
+        self.walker = Walker(str(self.workspace_root))
+        # Lecturas por rangos (mmap + índice de líneas); max_read_bytes limita
+        # lo que se devuelve de una vez como JSON, no el tamaño del archivo
+        self.reader = FileReader()
+        self.max_read_bytes = 10 * 1024 * 1024
+        
         logger.info(f"FileManager iniciado. Workspace: {self.workspace_root}")
     
     def _is_path_safe(self, path: Union[str, Path]) -> bool:
@@ -80,19 +109,114 @@ class FileManager:
             logger.error(f"Error validando ruta: {e}")
             return False
     
+    def _bump_generation(self, *paths: Path):
+        """Marca el workspace como modificado y actualiza el índice con las rutas tocadas"""
+        self._generation += 1
+        if self.index is not None:
+            for path in paths:
+                self.index.refresh(self.index.relative(path))
+    
+    def _index_rel(self, dir_path: Path) -> Optional[str]:
+        """Ruta del directorio en el índice si se puede servir desde él (o None)"""
+        index = self.index
+        if index is None or not index.is_ready() or index.root != self.workspace_root:
+            return None
+        rel = index.relative(dir_path)
+        if rel is None or not index.has_dir(rel):
+            return None
+        return rel
+    
+    @staticmethod
+    def _record_info(rel: str, name: str, record: tuple) -> Dict:
+        """Entrada de listado a partir de un registro del índice"""
+        is_dir, _, size, mtime_ns = record
+        # Mismo redondeo que os.stat_result.st_mtime
+        mtime = mtime_ns // 10**9 + (mtime_ns % 10**9) * 1e-9
+        return {
+            "name": name,
+            "path": str(PurePath(rel)),
+            "type": "directory" if is_dir else "file",
+            "size": 0 if is_dir else size,
+            "modified": datetime.fromtimestamp(mtime).isoformat(),
+        }
+    
+    @staticmethod
+    def _stat_etag(stat: os.stat_result) -> str:
+        """ETag a partir de (tamaño, mtime_ns, inodo)"""
+        return f"{stat.st_size:x}-{stat.st_mtime_ns:x}-{stat.st_ino:x}"
+    
+    def get_file_etag(self, filepath: str) -> Optional[str]:
+        """ETag de un archivo sin leer su contenido (None si no es válido)"""
+        try:
+            file_path = self.workspace_root / filepath
+            if not self._is_path_safe(file_path):
+                return None
+            stat = file_path.stat()
+            return self._stat_etag(stat)
+        except OSError:
+            return None
+    
+    def get_tree_etag(self, directory: str = ".", max_depth: int = 3) -> Optional[str]:
+        """
+        ETag del último árbol generado para (directory, max_depth) si sigue vigente
+        
+        Es vigente si la generación no cambió y ningún directorio visitado
+        cambió de mtime (se añadieron, borraron o renombraron entradas).
+        Solo hace stat de directorios, sin listarlos.
+        """
+        with self._signature_lock:
+            entry = self._tree_signatures.get((directory, max_depth))
+        if entry is None:
+            return None
+        
+        generation, index_version, dirs, etag = entry
+        if generation != self._generation:
+            return None
+        if index_version is not None:
+            # Árbol servido desde el índice: basta con que no haya cambiado
+            index = self.index
+            return etag if index is not None and index.version == index_version else None
+        try:
+            for dir_path, mtime_ns in dirs:
+                if os.stat(dir_path).st_mtime_ns != mtime_ns:
+                    return None
+        except OSError:
+            return None
+        return etag
+    
+    @count_calls("arkaios_file_operations_total", op="list_files")
     def list_files(self, directory: str = ".", recursive: bool = False, 
-                   include_hidden: bool = False) -> Dict:
+                   include_hidden: bool = False, cursor: str = None,
+                   limit: int = None) -> Dict:
         """
         Lista archivos en un directorio
         
+        Si se indica cursor o limit, devuelve una página en orden de recorrido
+        (ruta, alfabético) sin cargar el listado completo en memoria.
+        
         Returns:
             {
                 "ok": bool,
                 "path": str,
                 "files": [{"name": str, "type": str, "size": int, "modified": str}],
+                "next_cursor": str (solo paginado),
                 "error": str (opcional)
             }
         """
+        if cursor is not None or limit is not None:
+            listing = self.iter_list_files(directory, recursive=recursive,
+                                           include_hidden=include_hidden, cursor=cursor)
+            if not listing["ok"]:
+                return listing
+            files, next_cursor = self._take_page(listing["files"], limit)
+            return {
+                "ok": True,
+                "path": listing["path"],
+                "files": files,
+                "count": len(files),
+                "next_cursor": next_cursor,
+            }
+        
         try:
             dir_path = self.workspace_root / directory
             
@@ -105,33 +229,25 @@ class FileManager:
             if not dir_path.is_dir():
                 return {"ok": False, "error": "No es un directorio"}
             
-            files = []
+            rel = self._index_rel(dir_path)
+            if rel is not None:
+                files = [self._record_info(path, name, record)
+                         for path, name, record in self.index.walk(rel, recursive, include_hidden)]
+                files.sort(key=lambda x: (x["type"] == "file", x["name"].lower()))
+                return {
+                    "ok": True,
+                    "path": str(dir_path.relative_to(self.workspace_root)),
+                    "files": files,
+                    "count": len(files),
+                }
             
-            if recursive:
-                pattern = "**/*"
-            else:
-                pattern = "*"
+            files = []
             
-            for item in dir_path.glob(pattern):
-                # Omitir archivos ocultos si no se solicitan
-                if not include_hidden and item.name.startswith("."):
-                    continue
-                
-                # Omitir directorios node_modules, venv, etc
-                if any(p in item.parts for p in ["node_modules", ".venv", "venv", "__pycache__"]):
-                    continue
-                
+            for entry, is_dir in self.walker.walk(str(dir_path), recursive, include_hidden):
                 try:
-                    stat = item.stat()
-                    files.append({
-                        "name": item.name,
-                        "path": str(item.relative_to(self.workspace_root)),
-                        "type": "directory" if item.is_dir() else "file",
-                        "size": stat.st_size if item.is_file() else 0,
-                        "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                    })
-                except Exception as e:
-                    logger.warning(f"Error obteniendo info de {item}: {e}")
+                    files.append(self._entry_info(entry, is_dir))
+                except OSError as e:
+                    logger.warning(f"Error obteniendo info de {entry.path}: {e}")
             
             # Ordenar: directorios primero, luego alfabético
             files.sort(key=lambda x: (x["type"] == "file", x["name"].lower()))
@@ -147,12 +263,95 @@ class FileManager:
             logger.error(f"Error listando archivos: {e}")
             return {"ok": False, "error": str(e)}
     
-    def read_file(self, filepath: str, encoding: str = "utf-8") -> Dict:
+    @staticmethod
+    def _take_page(entries: Iterator[Dict], limit: Optional[int]) -> tuple:
+        """Consume hasta limit entradas; devuelve (página, cursor siguiente)"""
+        limit = max(1, limit or 1000)
+        page = list(islice(entries, limit + 1))
+        if len(page) > limit:
+            page = page[:limit]
+            return page, page[-1]["path"]
+        return page, None
+    
+    _sort_key = staticmethod(sort_key)
+    
+    def _entry_info(self, entry: os.DirEntry, is_dir: bool) -> Dict:
+        stat = entry.stat()
+        return {
+            "name": entry.name,
+            "path": str(Path(entry.path).relative_to(self.workspace_root)),
+            "type": "directory" if is_dir else "file",
+            "size": 0 if is_dir else stat.st_size,
+            "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+        }
+    
+    def _cursor_parts(self, dir_path: Path, cursor: Optional[str]) -> tuple:
+        """Convierte un cursor (ruta relativa al workspace) en partes relativas a dir_path"""
+        if not cursor:
+            return ()
+        cursor_path = (self.workspace_root / cursor).resolve()
+        return cursor_path.relative_to(dir_path.resolve()).parts
+    
+    def _resolve_dir(self, directory: str) -> tuple:
+        """Valida un directorio del workspace; devuelve (dir_path, error)"""
+        dir_path = self.workspace_root / directory
+        if not self._is_path_safe(dir_path):
+            return None, {"ok": False, "error": "Ruta no permitida"}
+        if not dir_path.exists():
+            return None, {"ok": False, "error": "Directorio no existe"}
+        if not dir_path.is_dir():
+            return None, {"ok": False, "error": "No es un directorio"}
+        return dir_path, None
+    
+    def iter_list_files(self, directory: str = ".", recursive: bool = False,
+                        include_hidden: bool = False, cursor: str = None) -> Dict:
+        """
+        Listado perezoso: las entradas se generan según avanza el recorrido
+        
+        Returns:
+            {"ok": bool, "path": str, "files": Iterator[Dict], "error": str}
+        """
+        dir_path, error = self._resolve_dir(directory)
+        if error:
+            return error
+        try:
+            cursor_parts = self._cursor_parts(dir_path, cursor)
+        except ValueError:
+            return {"ok": False, "error": "Cursor inválido"}
+        
+        rel = self._index_rel(dir_path)
+        
+        def generate():
+            if rel is not None:
+                for path, name, record in self.index.walk(rel, recursive, include_hidden, cursor_parts):
+                    yield self._record_info(path, name, record)
+                return
+            for entry, is_dir in self.walker.walk(str(dir_path), recursive, include_hidden, cursor_parts):
+                try:
+                    yield self._entry_info(entry, is_dir)
+                except OSError as e:
+                    logger.warning(f"Error obteniendo info de {entry.path}: {e}")
+        
+        return {
+            "ok": True,
+            "path": str(dir_path.relative_to(self.workspace_root)),
+            "files": generate(),
+        }
+    
+    @count_calls("arkaios_file_operations_total", op="read_file")
+    def read_file(self, filepath: str, encoding: str = "utf-8", line: int = None,
+                  lines: int = None, offset: int = None, length: int = None) -> Dict:
         """
-        Lee el contenido de un archivo
+        Lee el contenido de un archivo, completo o una ventana
+        
+        Args:
+            line, lines: Ventana de líneas (line empieza en 1); sin límite de
+                tamaño de archivo, servida desde el índice de líneas
+            offset, length: Ventana de bytes (offset negativo = últimos bytes)
         
         Returns:
-            {"ok": bool, "content": str, "size": int, "error": str}
+            {"ok": bool, "content": str, "size": int, "lines": int, "error": str}
+            (con ventana además "range": {...} con la posición dentro del archivo)
         """
         try:
             file_path = self.workspace_root / filepath
@@ -166,10 +365,15 @@ class FileManager:
             if not file_path.is_file():
                 return {"ok": False, "error": "No es un archivo"}
             
-            # Verificar tamaño (limitar a 10MB)
-            size = file_path.stat().st_size
-            if size > 10 * 1024 * 1024:
-                return {"ok": False, "error": "Archivo demasiado grande (>10MB)"}
+            if line is not None or offset is not None:
+                return self._read_window(file_path, encoding, line, lines, offset, length)
+            
+            # Verificar tamaño (limitar a 10MB; los archivos mayores se leen por ventanas)
+            stat = file_path.stat()
+            size = stat.st_size
+            if size > self.max_read_bytes:
+                return {"ok": False, "error": "Archivo demasiado grande (>10MB): usa una ventana de líneas o bytes",
+                        "size": size}
             
             # Leer archivo
             with open(file_path, "r", encoding=encoding) as f:
@@ -180,7 +384,8 @@ class FileManager:
                 "content": content,
                 "path": str(file_path.relative_to(self.workspace_root)),
                 "size": size,
-                "lines": len(content.splitlines()),
+                "lines": content.count("\n") + (0 if not content or content.endswith("\n") else 1),
+                "etag": self._stat_etag(stat),
             }
         
         except UnicodeDecodeError:
@@ -189,6 +394,71 @@ class FileManager:
             logger.error(f"Error leyendo archivo: {e}")
             return {"ok": False, "error": str(e)}
     
+    def _read_window(self, file_path: Path, encoding: str, line: Optional[int], lines: Optional[int],
+                     offset: Optional[int], length: Optional[int]) -> Dict:
+        """Ventana de líneas o bytes de read_file, como mucho max_read_bytes"""
+        if line is not None:
+            if line < 1 or (lines is not None and lines < 1):
+                return {"ok": False, "error": "Ventana de líneas inválida"}
+            result = self.reader.read_lines(str(file_path), line - 1, lines or 1000, self.max_read_bytes)
+            if not result["ok"]:
+                return result
+            content = result["data"].decode(encoding)
+            window = {
+                "line": line,
+                "line_end": result["last"],  # Última línea incluida (base 1)
+                "total_lines": result["total_lines"],
+                "start": result["start"],
+                "end": result["end"] - 1,
+                "eof": result["eof"],
+            }
+        else:
+            if length is not None and length < 1:
+                return {"ok": False, "error": "Ventana de bytes inválida"}
+            length = min(length or self.max_read_bytes, self.max_read_bytes)
+            offset = max(offset, -self.max_read_bytes)
+            end = None if offset < 0 else offset + length - 1
+            result = self.reader.read_bytes(str(file_path), offset, end)
+            if not result["ok"]:
+                return result
+            # Un rango de bytes puede partir un carácter multibyte en los bordes
+            content = result["data"].decode(encoding, errors="replace")
+            window = {"start": result["start"], "end": result["end"],
+                      "eof": result["end"] >= result["size"] - 1}
+        
+        return {
+            "ok": True,
+            "content": content,
+            "path": str(file_path.relative_to(self.workspace_root)),
+            "size": result["size"],
+            "range": window,
+            "etag": self._stat_etag(result["stat"]),
+        }
+    
+    def open_file_stream(self, filepath: str, start: int = None, end: int = None) -> Dict:
+        """
+        Abre un archivo (o un rango de bytes, inclusivo) para transmitirlo en bloques
+        
+        Returns:
+            {"ok": bool, "chunks": Iterator[bytes], "start": int, "end": int,
+             "size": int, "etag": str, "error": str}
+        """
+        file_path = self.workspace_root / filepath
+        if not self._is_path_safe(file_path):
+            return {"ok": False, "error": "Ruta no permitida"}
+        if not file_path.is_file():
+            return {"ok": False, "error": "Archivo no existe" if not file_path.exists() else "No es un archivo"}
+        try:
+            result = self.reader.stream(str(file_path), start, end)
+        except OSError as e:
+            logger.error(f"Error leyendo archivo: {e}")
+            return {"ok": False, "error": str(e)}
+        if result["ok"]:
+            result["path"] = str(file_path.relative_to(self.workspace_root))
+            result["etag"] = self._stat_etag(result.pop("stat"))
+        return result
+    
+    @count_calls("arkaios_file_operations_total", op="create_file")
     def create_file(self, filepath: str, content: str = "", 
                    overwrite: bool = False) -> Dict:
         """
@@ -218,6 +488,7 @@ class FileManager:
             with open(file_path, "w", encoding="utf-8") as f:
                 f.write(content)
             
+            self._bump_generation(file_path)
             logger.info(f"Archivo creado: {file_path}")
             
             return {
@@ -230,6 +501,7 @@ class FileManager:
             logger.error(f"Error creando archivo: {e}")
             return {"ok": False, "error": str(e)}
     
+    @count_calls("arkaios_file_operations_total", op="update_file")
     def update_file(self, filepath: str, content: str) -> Dict:
         """
         Actualiza el contenido de un archivo existente
@@ -257,6 +529,7 @@ class FileManager:
             with open(file_path, "w", encoding="utf-8") as f:
                 f.write(content)
             
+            self._bump_generation(file_path, backup_path)
             logger.info(f"Archivo actualizado: {file_path}")
             
             return {
@@ -270,6 +543,7 @@ class FileManager:
             logger.error(f"Error actualizando archivo: {e}")
             return {"ok": False, "error": str(e)}
     
+    @count_calls("arkaios_file_operations_total", op="delete_file")
     def delete_file(self, filepath: str, confirm: bool = False) -> Dict:
         """
         Elimina un archivo
@@ -302,6 +576,7 @@ class FileManager:
             
             shutil.move(str(file_path), str(backup_path))
             
+            self._bump_generation(file_path, backup_path)
             logger.info(f"Archivo eliminado: {file_path} -> {backup_path}")
             
             return {
@@ -314,6 +589,7 @@ class FileManager:
             logger.error(f"Error eliminando archivo: {e}")
             return {"ok": False, "error": str(e)}
     
+    @count_calls("arkaios_file_operations_total", op="create_directory")
     def create_directory(self, dirpath: str) -> Dict:
         """
         Crea un directorio
@@ -329,6 +605,7 @@ class FileManager:
             
             dir_path.mkdir(parents=True, exist_ok=True)
             
+            self._bump_generation(dir_path)
             logger.info(f"Directorio creado: {dir_path}")
             
             return {
@@ -340,8 +617,11 @@ class FileManager:
             logger.error(f"Error creando directorio: {e}")
             return {"ok": False, "error": str(e)}
     
+    @count_calls("arkaios_file_operations_total", op="search_files")
     def search_files(self, pattern: str, directory: str = ".", 
-                    content_search: bool = False) -> Dict:
+                    content_search: bool = False, cursor: str = None,
+                    limit: int = None, max_results: int = None,
+                    timeout: float = None, context: int = 0) -> Dict:
         """
         Busca archivos por nombre o contenido
         
@@ -349,60 +629,140 @@ class FileManager:
             pattern: Patrón de búsqueda (glob para nombre, regex para contenido)
             directory: Directorio donde buscar
             content_search: Si True, busca en el contenido de los archivos
+            cursor: Ruta del último resultado de la página anterior
+            limit: Resultados por página (activa la paginación)
+            max_results: Resultados tras los que se detiene la búsqueda
+            timeout: Segundos máximos de búsqueda en contenido
+            context: Líneas de contexto alrededor de cada coincidencia
         
         Returns:
-            {"ok": bool, "results": [{"path": str, "matches": [...]}], "error": str}
+            {"ok": bool, "results": [{"path": str, "matches": [...], "lines": [...]}],
+             "next_cursor": str, "timed_out": bool, "error": str}
         """
+        if cursor is not None or limit is not None:
+            search = self.iter_search_files(pattern, directory, content_search=content_search, cursor=cursor,
+                                            max_results=max_results, timeout=timeout, context=context)
+            if not search["ok"]:
+                return search
+            results, next_cursor = self._take_page(search["results"], limit)
+            return self._search_response(pattern, results, search["results"], next_cursor=next_cursor)
+        
         try:
             dir_path = self.workspace_root / directory
             
             if not self._is_path_safe(dir_path):
                 return {"ok": False, "error": "Ruta no permitida"}
             
-            results = []
-            
-            if content_search:
-                # Búsqueda en contenido
-                import re
-                regex = re.compile(pattern, re.IGNORECASE)
-                
-                for file_path in dir_path.rglob("*"):
-                    if not file_path.is_file():
-                        continue
-                    
-                    if file_path.suffix not in self.allowed_extensions:
-                        continue
-                    
-                    try:
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            content = f.read()
-                            matches = regex.findall(content)
-                            if matches:
-                                results.append({
-                                    "path": str(file_path.relative_to(self.workspace_root)),
-                                    "matches": list(set(matches))[:10],  # Limitar a 10 matches
-                                })
-                    except:
-                        continue
-            else:
-                # Búsqueda por nombre
-                for file_path in dir_path.rglob(pattern):
-                    results.append({
-                        "path": str(file_path.relative_to(self.workspace_root)),
-                        "type": "directory" if file_path.is_dir() else "file",
-                    })
-            
-            return {
-                "ok": True,
-                "pattern": pattern,
-                "results": results,
-                "count": len(results),
-            }
+            # Motor de búsqueda en contenido, índices o recorrido podado del disco
+            search = self.iter_search_files(pattern, directory, content_search=content_search,
+                                            max_results=max_results, timeout=timeout, context=context)
+            if not search["ok"]:
+                return search
+            results = list(search["results"])
+            return self._search_response(pattern, results, search["results"])
         
         except Exception as e:
             logger.error(f"Error buscando archivos: {e}")
             return {"ok": False, "error": str(e)}
     
+    @staticmethod
+    def _search_response(pattern: str, results: List[Dict], run, **extra) -> Dict:
+        response = {"ok": True, "pattern": pattern, "results": results, "count": len(results), **extra}
+        if isinstance(run, SearchRun):
+            run.close()  # Una página deja lotes en vuelo: se cancelan
+            response["timed_out"] = run.timed_out
+            response["limited"] = run.limited
+            response["skipped"] = {"binary": run.stats["binary"], "large": run.stats["large"]}
+        return response
+    
+    def _content_files(self, dir_path: Path, cursor_parts: tuple, pattern: str) -> Iterator[tuple]:
+        """
+        Archivos donde buscar en contenido, en orden de recorrido
+        
+        Con índice de trigramas solo los candidatos; si no, el índice de
+        metadatos o el disco.
+        
+        Yields:
+            (ruta absoluta, ruta relativa al workspace)
+        """
+        rel = self._index_rel(dir_path)
+        candidates = None
+        if rel is not None and self.content_index is not None:
+            candidates = self.content_index.candidates(pattern)
+        
+        if candidates is not None:
+            # Preorden ordenado = orden lexicográfico de las claves de cada componente
+            prefix = rel + "/" if rel else ""
+            cursor_key = tuple(self._sort_key(part) for part in PurePath(rel).parts + cursor_parts)
+            keyed = sorted(
+                (tuple(self._sort_key(part) for part in path.split("/")), path)
+                for path in candidates if path.startswith(prefix)
+            )
+            for key, path in keyed:
+                if cursor_parts and key <= cursor_key:
+                    continue
+                if PurePath(path).suffix in self.allowed_extensions:
+                    yield str(self.workspace_root / path), str(PurePath(path))
+        elif rel is not None:
+            for path, name, record in self.index.walk(rel, True, True, cursor_parts):
+                if not record[0] and PurePath(name).suffix in self.allowed_extensions:
+                    yield str(self.workspace_root / path), str(PurePath(path))
+        else:
+            for entry, is_dir in self.walker.walk(str(dir_path), True, True, cursor_parts):
+                if not is_dir and Path(entry.name).suffix in self.allowed_extensions:
+                    yield entry.path, str(Path(entry.path).relative_to(self.workspace_root))
+    
+    def iter_search_files(self, pattern: str, directory: str = ".",
+                          content_search: bool = False, cursor: str = None,
+                          max_results: int = None, timeout: float = None,
+                          context: int = 0) -> Dict:
+        """
+        Búsqueda perezosa en orden de recorrido estable
+        
+        La búsqueda en contenido la hace search_engine en paralelo; los
+        resultados llegan en orden y cerrar el iterador cancela el resto.
+        
+        Returns:
+            {"ok": bool, "pattern": str, "results": Iterator[Dict], "error": str}
+        """
+        dir_path, error = self._resolve_dir(directory)
+        if error:
+            return error
+        try:
+            cursor_parts = self._cursor_parts(dir_path, cursor)
+        except ValueError:
+            return {"ok": False, "error": "Cursor inválido"}
+        
+        if content_search:
+            try:
+                run = self.search_engine.search(
+                    self._content_files(dir_path, cursor_parts, pattern), pattern,
+                    context=max(0, context), max_results=max_results, timeout=timeout,
+                )
+            except re.error as e:
+                return {"ok": False, "error": f"Expresión regular inválida: {e}"}
+            return {"ok": True, "pattern": pattern, "results": run}
+        
+        rel = self._index_rel(dir_path)
+        
+        def generate():
+            if rel is not None:
+                base = PurePath(rel)
+                for path, _, record in self.index.walk(rel, True, True, cursor_parts):
+                    if PurePath(path).relative_to(base).match(pattern):
+                        yield {"path": str(PurePath(path)), "type": "directory" if record[0] else "file"}
+                return
+            for entry, is_dir in self.walker.walk(str(dir_path), True, True, cursor_parts):
+                if PurePath(os.path.relpath(entry.path, dir_path)).match(pattern):
+                    rel_path = str(Path(entry.path).relative_to(self.workspace_root))
+                    yield {"path": rel_path, "type": "directory" if is_dir else "file"}
+        
+        results = generate()
+        if max_results is not None:
+            results = islice(results, max_results)
+        return {"ok": True, "pattern": pattern, "results": results}
+    
+    @count_calls("arkaios_file_operations_total", op="get_file_info")
     def get_file_info(self, filepath: str) -> Dict:
         """
         Obtiene información detallada de un archivo
@@ -458,7 +818,10 @@ class FileManager:
         
     def add_to_history(self, path: str) -> None:
         """Añade una ruta al historial de navegación"""
-        rel_path = str(Path(path).relative_to(self.workspace_root))
+        full_path = Path(path)
+        if not full_path.is_absolute():
+            full_path = self.workspace_root / full_path
+        rel_path = str(full_path.resolve().relative_to(self.workspace_root))
         if rel_path in self.navigation_history:
             self.navigation_history.remove(rel_path)
         self.navigation_history.insert(0, rel_path)
@@ -534,6 +897,7 @@ class FileManager:
             logger.error(f"Error preparando archivo para observar: {e}")
             return {"ok": False, "error": str(e)}
             
+    @count_calls("arkaios_file_operations_total", op="get_file_tree")
     def get_file_tree(self, directory: str = ".", max_depth: int = 3) -> Dict:
         """
         Obtiene la estructura de directorios en formato árbol
@@ -553,10 +917,18 @@ class FileManager:
             if not dir_path.is_dir():
                 return {"ok": False, "error": "No es un directorio"}
             
-            def build_tree(path, current_depth=0):
+            generation = self._generation
+            visited = []
+            
+            def build_tree(path, current_depth=0, chain=None):
                 if current_depth > max_depth:
                     return {"name": path.name, "type": "directory", "children": [{"name": "...", "type": "more"}]}
                 
+                try:
+                    visited.append((str(path), path.stat().st_mtime_ns))
+                except OSError:
+                    pass
+                
                 result = {
                     "name": path.name,
                     "path": str(path.relative_to(self.workspace_root)),
@@ -565,32 +937,81 @@ class FileManager:
                 }
                 
                 try:
-                    items = sorted(list(path.iterdir()), key=lambda p: (p.is_file(), p.name.lower()))
-                    for item in items:
-                        # Omitir ocultos y directorios especiales
-                        if item.name.startswith(".") or item.name in ["node_modules", "__pycache__", "venv", ".venv"]:
+                    # El tipo viene de DirEntry (d_type): sin stat extra por entrada
+                    items, child_chain = self.walker.scan(str(path), chain)
+                    items.sort(key=lambda item: (not item[1], item[0].name.lower()))
+                    for entry, is_dir, _ in items:
+                        # Omitir ocultos (los directorios especiales ya los poda el walker)
+                        if entry.name.startswith("."):
                             continue
                         
-                        if item.is_dir():
-                            result["children"].append(build_tree(item, current_depth + 1))
+                        if is_dir:
+                            result["children"].append(build_tree(Path(entry.path), current_depth + 1, child_chain))
                         else:
                             result["children"].append({
-                                "name": item.name,
-                                "path": str(item.relative_to(self.workspace_root)),
+                                "name": entry.name,
+                                "path": str(Path(entry.path).relative_to(self.workspace_root)),
                                 "type": "file",
-                                "extension": item.suffix
+                                "extension": PurePath(entry.name).suffix
                             })
                 except Exception as e:
                     logger.warning(f"Error accediendo a {path}: {e}")
                 
                 return result
             
-            tree = build_tree(dir_path)
+            def build_indexed(rel, name, current_depth=0):
+                if current_depth > max_depth:
+                    return {"name": name, "type": "directory", "children": [{"name": "...", "type": "more"}]}
+                
+                result = {
+                    "name": name,
+                    "path": str(PurePath(rel)) if rel else ".",
+                    "type": "directory",
+                    "children": []
+                }
+                
+                prefix = rel + "/" if rel else ""
+                items = self.index.children(rel) or []
+                items.sort(key=lambda item: (not item[1][0], item[0].lower()))
+                for child_name, (is_dir, is_link, _, _) in items:
+                    if child_name.startswith("."):
+                        continue
+                    if is_dir and is_link:
+                        # El índice no entra en enlaces simbólicos: se leen del disco
+                        result["children"].append(build_tree(self.workspace_root / (prefix + child_name), current_depth + 1))
+                    elif is_dir:
+                        result["children"].append(build_indexed(prefix + child_name, child_name, current_depth + 1))
+                    else:
+                        result["children"].append({
+                            "name": child_name,
+                            "path": str(PurePath(prefix + child_name)),
+                            "type": "file",
+                            "extension": PurePath(child_name).suffix
+                        })
+                
+                return result
+            
+            rel = self._index_rel(dir_path)
+            index_version = self.index.version if rel is not None else None
+            if rel is not None:
+                tree = build_indexed(rel, dir_path.name)
+            else:
+                tree = build_tree(dir_path)
+            
+            digest = hashlib.sha1()
+            digest.update(f"{generation}:{max_depth}:{index_version}".encode())
+            for visited_path, mtime_ns in visited:
+                digest.update(f"{visited_path}:{mtime_ns}".encode("utf-8", "surrogateescape"))
+            etag = digest.hexdigest()[:20]
+            with self._signature_lock:
+                if len(self._tree_signatures) >= 256:
+                    self._tree_signatures.clear()
+                self._tree_signatures[(directory, max_depth)] = (generation, index_version, visited, etag)
             
             # Añadir a historial
             self.add_to_history(directory)
             
-            return {"ok": True, "tree": tree}
+            return {"ok": True, "tree": tree, "etag": etag}
         
         except Exception as e:
             logger.error(f"Error obteniendo árbol de directorios: {e}")
@@ -0,0 +1,288 @@
+# arkaios_file_reader.py - Lecturas por rangos de archivos grandes para ARKAIOS
+"""
+Lee rangos de bytes y de líneas de archivos de cualquier tamaño a través de
+mmap, sin cargarlos enteros en memoria. Las ventanas de líneas se resuelven
+con un índice de saltos de línea disperso (un punto de control cada STRIDE
+líneas) que se construye bajo demanda solo hasta la línea pedida y se
+cachea mientras el archivo no cambie
+"""
+
+import os
+import mmap
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from itertools import accumulate
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger("arkaios.file_reader")
+
+# Líneas entre puntos de control del índice (8 bytes por punto)
+STRIDE = 256
+
+# Bytes examinados de una vez al construir el índice
+SCAN_CHUNK = 1024 * 1024
+
+
+class LineIndex:
+    """
+    Índice disperso de inicios de línea de una versión concreta de un archivo
+
+    Quien lo use debe tomar su lock: construirlo puede recorrer el archivo
+    entero y no debe bloquear las lecturas de otros archivos.
+    """
+
+    def __init__(self, identity: tuple, size: int):
+        self.identity = identity
+        self.size = size
+        self.lock = threading.Lock()
+        # checkpoints[k] = offset del inicio de la línea k * STRIDE
+        self.checkpoints = array("Q", [0])
+        self.line = 0       # Última línea cuyo inicio se conoce (la mayor)
+        self.line_pos = 0   # Offset de su inicio
+        self.pos = 0        # Todo lo anterior a pos ya está examinado
+        self.total_lines: Optional[int] = None
+
+    def _extend(self, mm: mmap.mmap, target: int):
+        """Avanza el índice (por bloques completos) hasta pasar la línea target o el final"""
+        size = self.size
+        while self.line < target and self.pos < size:
+            end = min(size, self.pos + SCAN_CHUNK)
+            chunk = mm[self.pos:end]
+            found = chunk.count(b"\n")
+            if found:
+                next_checkpoint = len(self.checkpoints) * STRIDE
+                if self.line + found >= next_checkpoint:
+                    # Inicios de línea del bloque, solo si cae algún punto de control
+                    starts = list(accumulate(len(part) + 1 for part in chunk.split(b"\n")[:-1]))
+                    for line in range(next_checkpoint, self.line + found + 1, STRIDE):
+                        self.checkpoints.append(self.pos + starts[line - self.line - 1])
+                self.line += found
+                self.line_pos = self.pos + chunk.rfind(b"\n") + 1
+            self.pos = end
+        if self.pos >= size and self.total_lines is None:
+            # Como splitlines: un salto final no abre una línea vacía
+            self.total_lines = self.line + (1 if self.line_pos < size else 0)
+
+    def offset(self, mm: mmap.mmap, line: int) -> Optional[int]:
+        """Offset del inicio de la línea (0 = primera) o None si está más allá del final"""
+        if line > self.line:
+            self._extend(mm, line)
+            if line > self.line:
+                return None
+        if line == self.line:
+            pos = self.line_pos
+        else:
+            # Desde el punto de control anterior, como mucho STRIDE saltos
+            k = line // STRIDE
+            pos = self.checkpoints[k]
+            for _ in range(line - k * STRIDE):
+                pos = mm.find(b"\n", pos) + 1
+        if pos >= self.size and line > 0:
+            return None
+        return pos
+
+    def count(self, mm: mmap.mmap) -> int:
+        """Número total de líneas (recorre lo que falte del archivo)"""
+        if self.total_lines is None:
+            self._extend(mm, self.size + 1)
+        return self.total_lines
+
+
+class _Mapped:
+    """Archivo abierto y mapeado en memoria (size 0 = sin mapa)"""
+
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        try:
+            st = os.fstat(self.file.fileno())
+            self.size = st.st_size
+            self.stat = st
+            self.identity = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        except Exception:
+            self.file.close()
+            raise
+
+    def slice(self, start: int, end: int) -> bytes:
+        """Bytes [start, end); se corta si el archivo encogió (leer más allá daría SIGBUS)"""
+        current = os.fstat(self.file.fileno()).st_size
+        return self.mm[start:min(end, current)] if start < current else b""
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FileReader:
+    """Lecturas por rangos con índices de líneas cacheados por archivo"""
+
+    def __init__(self, chunk_size: int = 64 * 1024, max_indexes: int = 32):
+        """
+        Args:
+            chunk_size: Tamaño de cada bloque en lecturas transmitidas
+            max_indexes: Índices de líneas que se mantienen en caché (LRU)
+        """
+        self.chunk_size = chunk_size
+        self.max_indexes = max_indexes
+        self._indexes: "OrderedDict[str, LineIndex]" = OrderedDict()
+        # Solo protege la caché de índices; cada LineIndex tiene su propio lock
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _clamp(start: Optional[int], end: Optional[int], size: int) -> Optional[Tuple[int, int]]:
+        """Normaliza un rango como parse_byte_range (inclusivo, start negativo = sufijo)"""
+        start = 0 if start is None else start
+        if start < 0:
+            start, end = max(0, size + start), None
+        if start >= size:
+            return None
+        end = size - 1 if end is None else min(end, size - 1)
+        return start, end
+
+    def _line_index(self, path: str, mapped: _Mapped) -> LineIndex:
+        """Índice de la versión actual del archivo (uno nuevo si cambió)"""
+        with self._lock:
+            index = self._indexes.get(path)
+            if index is None or index.identity != mapped.identity:
+                index = LineIndex(mapped.identity, mapped.size)
+                self._indexes[path] = index
+                while len(self._indexes) > self.max_indexes:
+                    self._indexes.popitem(last=False)
+            self._indexes.move_to_end(path)
+            return index
+
+    def read_bytes(self, path: str, start: int = None, end: int = None) -> Dict:
+        """
+        Lee un rango de bytes
+
+        Returns:
+            {"ok": bool, "data": bytes, "start": int, "end": int (inclusivo),
+             "size": int, "stat": os.stat_result, "error": str}
+        """
+        with _Mapped(path) as mapped:
+            if mapped.size == 0 and not start:
+                return {"ok": True, "data": b"", "start": 0, "end": -1, "size": 0, "stat": mapped.stat}
+            byte_range = self._clamp(start, end, mapped.size)
+            if byte_range is None:
+                return {"ok": False, "error": "Rango fuera del archivo", "size": mapped.size}
+            start, end = byte_range
+            data = mapped.slice(start, end + 1)
+            return {"ok": True, "data": data, "start": start, "end": start + len(data) - 1,
+                    "size": mapped.size, "stat": mapped.stat}
+
+    def read_lines(self, path: str, first: int, count: int, max_bytes: int = None) -> Dict:
+        """
+        Lee count líneas desde first (0 = primera), como mucho max_bytes
+
+        Returns:
+            {"ok": bool, "data": bytes, "first": int, "last": int (exclusivo),
+             "start": int, "end": int (exclusivo), "size": int,
+             "total_lines": int o None si aún no se conoce, "eof": bool,
+             "stat": os.stat_result, "error": str}
+        """
+        with _Mapped(path) as mapped:
+            if mapped.mm is None:
+                start = end = None
+                total = 0
+            else:
+                index = self._line_index(path, mapped)
+                with index.lock:
+                    start = index.offset(mapped.mm, first)
+                    end = index.offset(mapped.mm, first + count) if start is not None else None
+                    total = index.total_lines
+            if start is None:
+                if first > 0:
+                    return {"ok": False, "error": "Línea fuera del archivo", "size": mapped.size,
+                            "total_lines": total}
+                start = 0
+            end = mapped.size if end is None else end
+            last = first + count if end < mapped.size else total if total is not None else first + count
+
+            if max_bytes is not None and end - start > max_bytes:
+                # Ventana demasiado grande: se corta en el último salto de línea que cabe
+                cut = mapped.mm.rfind(b"\n", start, start + max_bytes)
+                if cut == -1:
+                    return {"ok": False, "error": f"La línea {first + 1} supera {max_bytes} bytes",
+                            "size": mapped.size}
+                end = cut + 1
+                last = first + mapped.mm[start:end].count(b"\n")
+
+            data = mapped.slice(start, end)
+            return {
+                "ok": True,
+                "data": data,
+                "first": first,
+                "last": last,
+                "start": start,
+                "end": start + len(data),
+                "size": mapped.size,
+                "total_lines": total,
+                "eof": start + len(data) >= mapped.size,
+                "stat": mapped.stat,
+            }
+
+    def count_lines(self, path: str) -> int:
+        """Número de líneas (el índice queda completo y cacheado)"""
+        with _Mapped(path) as mapped:
+            if mapped.mm is None:
+                return 0
+            index = self._line_index(path, mapped)
+            with index.lock:
+                return index.count(mapped.mm)
+
+    def stream(self, path: str, start: int = None, end: int = None) -> Dict:
+        """
+        Prepara la transmisión de un rango de bytes en bloques de chunk_size
+
+        El archivo queda abierto hasta agotar o cerrar el iterador.
+
+        Returns:
+            {"ok": bool, "chunks": Iterator[bytes], "start": int,
+             "end": int (inclusivo), "size": int, "stat": os.stat_result,
+             "error": str}
+        """
+        mapped = _Mapped(path)
+        if mapped.size == 0 and start is None:
+            mapped.close()
+            return {"ok": True, "chunks": iter(()), "start": 0, "end": -1, "size": 0, "stat": mapped.stat}
+        byte_range = self._clamp(start, end, mapped.size)
+        if byte_range is None:
+            mapped.close()
+            return {"ok": False, "error": "Rango fuera del archivo", "size": mapped.size}
+        start, end = byte_range
+
+        def chunks() -> Iterator[bytes]:
+            try:
+                pos = start
+                while pos <= end:
+                    data = mapped.slice(pos, min(end + 1, pos + self.chunk_size))
+                    if not data:
+                        break  # Truncado mientras se transmitía
+                    yield data
+                    pos += len(data)
+            finally:
+                mapped.close()
+
+        return {"ok": True, "chunks": chunks(), "start": start, "end": end,
+                "size": mapped.size, "stat": mapped.stat}
+
+
+# Singleton instance
+_file_reader_instance = None
+
+
+def get_file_reader(**kwargs) -> FileReader:
+    """Obtiene la instancia singleton del lector de archivos"""
+    global _file_reader_instance
+    if _file_reader_instance is None:
+        _file_reader_instance = FileReader(**kwargs)
+    return _file_reader_instance
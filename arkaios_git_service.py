@@ -0,0 +1,426 @@
+# arkaios_git_service.py - Servicio git estructurado para ARKAIOS
+"""
+Estado, historial y lectura de objetos git como JSON:
+- status: git status --porcelain=v2 -z
+- log: git log -z con formato de campos separados
+- blobs y árboles: un proceso git cat-file --batch persistente por repositorio
+
+Los resultados se cachean hasta que cambian index, HEAD o la rama actual
+"""
+
+import time
+import logging
+import threading
+import subprocess
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from arkaios_result_cache import find_git_dir, git_state_signature
+
+logger = logging.getLogger("arkaios.git_service")
+
+GIT_TIMEOUT = 30
+
+# Separador de campos en el formato de log
+_FS = "\x1f"
+_LOG_FIELDS = ("hash", "parents", "author_name", "author_email", "timestamp", "subject", "body")
+_LOG_FORMAT = _FS.join(("%H", "%P", "%an", "%ae", "%at", "%s", "%b"))
+
+_MODE_TYPES = {"40000": "tree", "160000": "commit"}
+
+# Bytes iniciales examinados para decidir si un blob es binario
+SNIFF_BYTES = 8000
+
+
+class _CatFile:
+    """Proceso git cat-file --batch de un repositorio"""
+
+    def __init__(self, repo: Path):
+        self.repo = repo
+        self.lock = threading.Lock()
+        self.process = None
+
+    def _start(self):
+        self.process = subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            cwd=str(self.repo),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def read(self, spec: str, max_size: int = None) -> Optional[tuple]:
+        """
+        Lee un objeto
+
+        Un blob mayor que max_size no se carga: se drena del pipe por bloques
+        y solo se conserva el principio (para detectar si es binario).
+
+        Returns:
+            (oid, type, size, data, complete) o None si no existe
+        """
+        with self.lock:
+            for attempt in (1, 2):
+                if self.process is None or self.process.poll() is not None:
+                    self._start()
+                try:
+                    self.process.stdin.write(spec.encode() + b"\n")
+                    self.process.stdin.flush()
+                    header = self.process.stdout.readline()
+                    if not header:
+                        raise BrokenPipeError("cat-file terminó")
+                    parts = header.decode().split()
+                    if len(parts) != 3:
+                        return None  # "<spec> missing" / "ambiguous"
+                    oid, kind, size = parts[0], parts[1], int(parts[2])
+                    if kind == "blob" and max_size is not None and size > max_size:
+                        data = self._drain(size)
+                        return oid, kind, size, data, False
+                    data = self.process.stdout.read(size)
+                    self.process.stdout.read(1)  # "\n" final
+                    return oid, kind, size, data, True
+                except (BrokenPipeError, OSError, ValueError):
+                    self.close()
+                    if attempt == 2:
+                        raise
+
+    def _drain(self, size: int) -> bytes:
+        """Consume size bytes (y el "\n" final) conservando solo los primeros SNIFF_BYTES"""
+        head = self.process.stdout.read(min(size, SNIFF_BYTES))
+        remaining = size - len(head) + 1
+        while remaining > 0:
+            chunk = self.process.stdout.read(min(remaining, 64 * 1024))
+            if not chunk:
+                raise BrokenPipeError("cat-file terminó")
+            remaining -= len(chunk)
+        return head
+
+    def close(self):
+        if self.process is not None:
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=2)
+            except Exception:
+                self.process.kill()
+            self.process = None
+
+
+class GitService:
+    """Consultas git estructuradas y cacheadas sobre repositorios del workspace"""
+
+    def __init__(self, workspace_root: str, max_repos: int = 16, cache_size: int = 256,
+                 status_ttl: float = 2.0, max_blob_bytes: int = 10 * 1024 * 1024,
+                 cache_bytes: int = 32 * 1024 * 1024):
+        """
+        Args:
+            workspace_root: Raíz del workspace (los cwd son relativos a ella)
+            max_repos: Procesos cat-file abiertos a la vez
+            cache_size: Resultados máximos en caché
+            status_ttl: Segundos de validez de status (el árbol de trabajo
+                        puede cambiar sin tocar index ni HEAD)
+            max_blob_bytes: Blobs mayores se devuelven sin contenido
+            cache_bytes: Contenido de blobs máximo en caché
+        """
+        self.workspace_root = Path(workspace_root).resolve()
+        self.max_repos = max_repos
+        self.cache_size = cache_size
+        self.status_ttl = status_ttl
+        self.max_blob_bytes = max_blob_bytes
+        self.cache_bytes = cache_bytes
+
+        self._cat_files: "OrderedDict[str, _CatFile]" = OrderedDict()
+        # clave -> (resultado, guardado en, bytes de contenido)
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+        logger.info(f"GitService iniciado. Workspace: {self.workspace_root}")
+
+    # ===== Utilidades =====
+
+    def _resolve(self, cwd: str = None) -> tuple:
+        """
+        Returns:
+            (work_dir, signature, error)
+        """
+        work_dir = (self.workspace_root / cwd).resolve() if cwd else self.workspace_root
+        if work_dir != self.workspace_root and self.workspace_root not in work_dir.parents:
+            return None, None, "Ruta fuera del workspace"
+        if not work_dir.is_dir():
+            return None, None, f"Directorio no existe: {cwd}"
+        signature = git_state_signature(work_dir)
+        if signature is None:
+            return None, None, "No es un repositorio git"
+        return work_dir, signature, None
+
+    def _git(self, work_dir: Path, args: List[str]) -> tuple:
+        """Ejecuta git y devuelve (stdout_bytes, error)"""
+        try:
+            proc = subprocess.run(
+                ["git"] + args,
+                cwd=str(work_dir),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=GIT_TIMEOUT,
+            )
+        except FileNotFoundError:
+            return None, "git no está instalado o no está en PATH"
+        except subprocess.TimeoutExpired:
+            return None, f"Timeout de {GIT_TIMEOUT} segundos excedido"
+        if proc.returncode != 0:
+            return None, proc.stderr.decode(errors="replace").strip() or f"git terminó con código {proc.returncode}"
+        return proc.stdout, None
+
+    def _cached(self, key: tuple, ttl: float = None) -> Optional[Dict]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            result, stored_at, weight = entry
+            if ttl is not None and time.monotonic() - stored_at > ttl:
+                del self._cache[key]
+                self._cached_bytes -= weight
+                return None
+            self._cache.move_to_end(key)
+            return dict(result, cached=True)
+
+    def _store(self, key: tuple, result: Dict):
+        content = result.get("content")
+        weight = len(content) if isinstance(content, str) else 0
+        if weight > self.cache_bytes // 8:
+            return  # Un blob grande desplazaría toda la caché: no se guarda
+        with self._lock:
+            previous = self._cache.pop(key, None)
+            if previous is not None:
+                self._cached_bytes -= previous[2]
+            self._cache[key] = (result, time.monotonic(), weight)
+            self._cached_bytes += weight
+            while len(self._cache) > self.cache_size or self._cached_bytes > self.cache_bytes:
+                _, (_, _, evicted) = self._cache.popitem(last=False)
+                self._cached_bytes -= evicted
+
+    def _cat_file(self, work_dir: Path) -> _CatFile:
+        repo = str(find_git_dir(work_dir))
+        with self._lock:
+            cat_file = self._cat_files.get(repo)
+            if cat_file is None:
+                cat_file = self._cat_files[repo] = _CatFile(work_dir)
+            self._cat_files.move_to_end(repo)
+            evicted = []
+            while len(self._cat_files) > self.max_repos:
+                evicted.append(self._cat_files.popitem(last=False)[1])
+        for old in evicted:
+            with old.lock:
+                old.close()
+        return cat_file
+
+    # ===== Status =====
+
+    @staticmethod
+    def _parse_status(data: bytes) -> Dict:
+        branch = {}
+        entries = []
+        fields = data.decode(errors="replace").split("\0")
+        i = 0
+        while i < len(fields):
+            line = fields[i]
+            i += 1
+            if not line:
+                continue
+            if line.startswith("# "):
+                key, _, value = line[2:].partition(" ")
+                if key == "branch.oid":
+                    branch["oid"] = None if value == "(initial)" else value
+                elif key == "branch.head":
+                    branch["head"] = None if value == "(detached)" else value
+                elif key == "branch.upstream":
+                    branch["upstream"] = value
+                elif key == "branch.ab":
+                    ahead, behind = value.split()
+                    branch["ahead"], branch["behind"] = int(ahead), int(behind)
+                continue
+
+            kind = line[0]
+            if kind == "1":
+                parts = line.split(" ", 8)
+                entries.append({"kind": "changed", "index": parts[1][0], "worktree": parts[1][1],
+                                "submodule": parts[2] != "N...", "path": parts[8]})
+            elif kind == "2":
+                parts = line.split(" ", 9)
+                entries.append({"kind": "renamed", "index": parts[1][0], "worktree": parts[1][1],
+                                "submodule": parts[2] != "N...", "score": parts[8],
+                                "path": parts[9], "orig_path": fields[i]})
+                i += 1  # Con -z la ruta original va en el siguiente campo
+            elif kind == "u":
+                parts = line.split(" ", 10)
+                entries.append({"kind": "unmerged", "index": parts[1][0], "worktree": parts[1][1],
+                                "submodule": parts[2] != "N...", "path": parts[10]})
+            elif kind == "?":
+                entries.append({"kind": "untracked", "path": line[2:]})
+            elif kind == "!":
+                entries.append({"kind": "ignored", "path": line[2:]})
+
+        return {"branch": branch, "entries": entries}
+
+    def status(self, cwd: str = None) -> Dict:
+        """
+        Estado del repositorio
+
+        Returns:
+            {"ok": bool, "branch": {"oid", "head", "upstream", "ahead", "behind"},
+             "entries": [{"kind", "path", "index", "worktree", "orig_path"}],
+             "clean": bool, "cached": bool, "error": str}
+        """
+        work_dir, signature, error = self._resolve(cwd)
+        if error:
+            return {"ok": False, "error": error}
+
+        key = ("status", str(work_dir)) + signature
+        cached = self._cached(key, ttl=self.status_ttl)
+        if cached is not None:
+            return cached
+
+        data, error = self._git(work_dir, ["status", "--porcelain=v2", "-z", "--branch"])
+        if error:
+            return {"ok": False, "error": error}
+
+        result = {"ok": True, **self._parse_status(data)}
+        result["clean"] = not any(e["kind"] != "ignored" for e in result["entries"])
+        self._store(key, result)
+        return dict(result, cached=False)
+
+    # ===== Log =====
+
+    def log(self, cwd: str = None, ref: str = "HEAD", limit: int = 50, skip: int = 0,
+            path: str = None) -> Dict:
+        """
+        Historial de commits
+
+        Returns:
+            {"ok": bool, "commits": [{"hash", "parents", "author_name", "author_email",
+             "timestamp", "subject", "body"}], "count": int, "cached": bool, "error": str}
+        """
+        if ref.startswith("-") or (path and path.startswith("-")):
+            return {"ok": False, "error": "Referencia o ruta inválida"}
+
+        work_dir, signature, error = self._resolve(cwd)
+        if error:
+            return {"ok": False, "error": error}
+
+        key = ("log", str(work_dir), ref, limit, skip, path) + signature
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        args = ["log", "-z", f"--format={_LOG_FORMAT}", f"-n{int(limit)}", f"--skip={int(skip)}", ref]
+        if path:
+            args += ["--", path]
+        data, error = self._git(work_dir, args)
+        if error:
+            if ref == "HEAD" and ("does not have any commits" in error or "unknown revision" in error):
+                # Repositorio sin commits todavía
+                return {"ok": True, "commits": [], "count": 0, "cached": False}
+            return {"ok": False, "error": error}
+
+        commits = []
+        for record in data.decode(errors="replace").split("\0"):
+            if not record.strip():
+                continue
+            values = record.split(_FS)
+            commit = dict(zip(_LOG_FIELDS, values))
+            commit["hash"] = commit["hash"].lstrip("\n")
+            commit["parents"] = commit.get("parents", "").split()
+            commit["timestamp"] = int(commit.get("timestamp") or 0)
+            commit["body"] = commit.get("body", "").strip()
+            commits.append(commit)
+
+        result = {"ok": True, "commits": commits, "count": len(commits)}
+        self._store(key, result)
+        return dict(result, cached=False)
+
+    # ===== Objetos =====
+
+    def show(self, cwd: str = None, rev: str = "HEAD", path: str = "") -> Dict:
+        """
+        Lee un blob o un árbol en una revisión con cat-file --batch
+
+        Los blobs mayores que max_blob_bytes se devuelven sin contenido
+        ("too_large": True); el resto del pipe se drena sin cargarlo.
+
+        Returns:
+            {"ok": bool, "type": "blob"|"tree", "oid": str, "size": int,
+             "content": str, "binary": bool, "too_large": bool, (blob)
+             "entries": [{"mode", "type", "name", "oid"}], (tree)
+             "error": str}
+        """
+        if "\n" in rev or "\n" in path or rev.startswith("-"):
+            return {"ok": False, "error": "Revisión o ruta inválida"}
+
+        work_dir, signature, error = self._resolve(cwd)
+        if error:
+            return {"ok": False, "error": error}
+
+        spec = f"{rev}:{path.strip('/')}"
+        key = ("show", str(work_dir), spec) + signature
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        try:
+            found = self._cat_file(work_dir).read(spec, self.max_blob_bytes)
+        except (OSError, ValueError) as e:
+            return {"ok": False, "error": f"Error leyendo objeto git: {e}"}
+        if found is None:
+            return {"ok": False, "error": f"No existe {spec}"}
+
+        oid, kind, size, data, complete = found
+        result = {"ok": True, "type": kind, "oid": oid, "size": size}
+        if kind == "tree":
+            result["entries"] = self._parse_tree(data)
+        elif kind == "blob":
+            binary = b"\0" in data[:SNIFF_BYTES]
+            result["binary"] = binary
+            result["too_large"] = not complete
+            result["content"] = None if binary or not complete else data.decode(errors="replace")
+        else:
+            result["content"] = data.decode(errors="replace")
+
+        self._store(key, result)
+        return dict(result, cached=False)
+
+    @staticmethod
+    def _parse_tree(data: bytes) -> List[Dict]:
+        """Formato binario de árbol: "<mode> <nombre>\\0<oid de 20 bytes>" repetido"""
+        entries = []
+        pos = 0
+        while pos < len(data):
+            space = data.index(b" ", pos)
+            nul = data.index(b"\0", space)
+            mode = data[pos:space].decode()
+            name = data[space + 1:nul].decode(errors="replace")
+            oid = data[nul + 1:nul + 21].hex()
+            entries.append({"mode": mode, "type": _MODE_TYPES.get(mode, "blob"), "name": name, "oid": oid})
+            pos = nul + 21
+        return entries
+
+    def close(self):
+        """Cierra los procesos cat-file"""
+        with self._lock:
+            cat_files = list(self._cat_files.values())
+            self._cat_files.clear()
+        for cat_file in cat_files:
+            with cat_file.lock:
+                cat_file.close()
+
+
+# Singleton instance
+_git_service_instance = None
+
+
+def get_git_service(workspace_root: str = None, **kwargs) -> GitService:
+    """Obtiene la instancia singleton del servicio git"""
+    global _git_service_instance
+    if _git_service_instance is None:
+        _git_service_instance = GitService(workspace_root, **kwargs)
+    return _git_service_instance
@@ -0,0 +1,524 @@
+# arkaios_interp_pool.py - Pool de intérpretes precalentados para ARKAIOS
+"""
+Mantiene procesos python/node ya arrancados que ejecutan fragmentos de código
+recibidos por stdin con un protocolo de longitud prefijada (4 bytes big-endian
++ JSON) que responde por un pipe propio. La salida de cada fragmento va a un
+par de archivos temporales, no al canal del protocolo. Cada tarea corre con
+su propio cwd y timeout; los workers se reciclan tras N tareas o si su
+memoria crece demasiado.
+
+Aislamiento entre tareas: el worker Python hace fork por tarea (el fragmento
+corre en un hijo desechable, así que módulos, parches, os.environ, fds e
+hilos no pasan a la siguiente). Donde no hay fork (Node, Windows) cada worker
+ejecuta una sola tarea y se sustituye por otro precalentado
+"""
+
+import os
+import json
+import time
+import queue
+import signal
+import struct
+import logging
+import threading
+import tempfile
+import subprocess
+from typing import Dict, List
+
+from arkaios_output_store import STREAMS
+
+logger = logging.getLogger("arkaios.interp_pool")
+
+_HEADER = struct.Struct(">I")
+
+# Canal del protocolo: un pipe propio heredado por el worker (ARKAIOS_PROTO_FD),
+# así que los fds 1 y 2 quedan libres para la salida de los fragmentos. Sin fds
+# heredables (Windows) el worker Python usa una copia del fd 1
+PROTO_FD_ENV = "ARKAIOS_PROTO_FD"
+
+# Worker Python: con fork, cada tarea corre en un hijo desechable con los fds
+# 1 y 2 apuntando a los archivos de salida de la tarea (también capturan
+# os.system, subprocess o extensiones C); el padre devuelve su rusage (wait4)
+PYTHON_WORKER = r'''
+import os, sys, json, signal, struct, traceback, contextlib
+H = struct.Struct(">I")
+proto_in = sys.stdin.buffer
+proto_fd = int(os.environ.pop("ARKAIOS_PROTO_FD", "0"))
+if proto_fd:
+    proto_out = os.fdopen(proto_fd, "wb")
+else:
+    proto_out = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+def rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        try:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except Exception:
+            return 0
+def execute(task):
+    code = 0
+    try:
+        os.chdir(task.get("cwd") or home)
+        try:
+            exec(compile(task["code"], "<string>", "exec"), {"__name__": "__main__"})
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            if e.code is not None and not isinstance(e.code, int):
+                print(e.code, file=sys.stderr)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+    except Exception as e:
+        print(e, file=sys.stderr)
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.chdir(home)
+    return {"return_code": code}
+def isolated(task):
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(r)
+            os.close(proto_out.fileno())
+            null = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(null, 0)
+            for fd, stream in ((1, "stdout"), (2, "stderr")):
+                target = os.open(task[stream], os.O_WRONLY | os.O_TRUNC)
+                os.dup2(target, fd)
+                os.close(target)
+            with os.fdopen(w, "wb") as f:
+                f.write(json.dumps(execute(task)).encode())
+        finally:
+            os._exit(0)
+    os.close(w)
+    with os.fdopen(r, "rb") as f:
+        data = f.read()
+    _, status, ru = os.wait4(pid, 0)
+    code = os.waitstatus_to_exitcode(status)
+    try:
+        result = json.loads(data)
+    except ValueError:
+        # os._exit() del fragmento o una señal: sin respuesta del hijo
+        result = {"return_code": code}
+        if code < 0:
+            with open(task["stderr"], "a") as f:
+                f.write(f"El fragmento terminó por la señal {-code}\n")
+    maxrss = ru.ru_maxrss // 1024 if sys.platform == "darwin" else ru.ru_maxrss
+    result["resources"] = {"cpu_user": round(ru.ru_utime, 4), "cpu_sys": round(ru.ru_stime, 4),
+                           "max_rss_kb": maxrss}
+    if hasattr(signal, "SIGXCPU") and code == -signal.SIGXCPU:
+        result["resources"]["limit_exceeded"] = "cpu"
+    return result
+def direct(task):
+    with open(task["stdout"], "w") as out, open(task["stderr"], "w") as err:
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            return execute(task)
+home = os.getcwd()
+while True:
+    header = proto_in.read(4)
+    if len(header) < 4:
+        break
+    task = json.loads(proto_in.read(H.unpack(header)[0]))
+    result = isolated(task) if hasattr(os, "fork") else direct(task)
+    result["rss"] = rss()
+    data = json.dumps(result).encode()
+    proto_out.write(H.pack(len(data)) + data)
+    proto_out.flush()
+'''
+
+# Worker Node: de un solo uso (require, process y los globales no se pueden
+# aislar entre tareas, ver ISOLATED_KINDS); su código va en una función para
+# no dejar declaraciones en el ámbito global del fragmento. Arranca con stdout/stderr ya
+# apuntando a los archivos de salida, ejecuta la tarea como "node -e" y
+# responde al salir, cuando el bucle de eventos se ha vaciado (temporizadores
+# y promesas pendientes incluidos) o el fragmento llama a process.exit()
+NODE_WORKER = r'''
+(() => {
+const vm = require("vm"), fs = require("fs");
+const proto = Number(process.env.ARKAIOS_PROTO_FD);
+delete process.env.ARKAIOS_PROTO_FD;
+let buf = Buffer.alloc(0), started = false;
+function send(obj) {
+  const data = Buffer.from(JSON.stringify(obj));
+  const header = Buffer.alloc(4);
+  header.writeUInt32BE(data.length, 0);
+  fs.writeSync(proto, Buffer.concat([header, data]));
+}
+process.on("exit", (code) => {
+  if (started) send({ return_code: code, rss: process.memoryUsage().rss });
+});
+function run(task) {
+  started = true;
+  process.stdin.removeAllListeners("data");
+  process.stdin.destroy();
+  try {
+    process.chdir(task.cwd || process.cwd());
+    vm.runInThisContext(task.code, { filename: "[eval]" });
+  } catch (e) {
+    console.error(e && e.stack ? e.stack : String(e));
+    process.exit(1);
+  }
+}
+process.stdin.on("data", (chunk) => {
+  buf = Buffer.concat([buf, chunk]);
+  if (started || buf.length < 4) return;
+  const len = buf.readUInt32BE(0);
+  if (buf.length >= 4 + len) run(JSON.parse(buf.subarray(4, 4 + len).toString()));
+});
+})();
+'''
+
+WORKER_COMMANDS = {
+    "python": ["python", "-u", "-c", PYTHON_WORKER],
+    "node": ["node", "-e", NODE_WORKER],
+}
+if os.name == "nt":
+    # Node solo recibe el canal del protocolo como fd heredado (POSIX)
+    del WORKER_COMMANDS["node"]
+
+# Intérpretes cuyo worker aísla cada tarea (fork); el resto se usa una sola vez
+ISOLATED_KINDS = {"python"} if hasattr(os, "fork") else set()
+
+# Bloque de copia de los archivos de salida
+_COPY_CHUNK = 64 * 1024
+
+
+def _output_files() -> tuple:
+    """Par de archivos temporales (stdout, stderr) para la salida de una tarea"""
+    paths = []
+    for stream in STREAMS:
+        fd, path = tempfile.mkstemp(prefix="arkaios-interp-", suffix=f".{stream}")
+        os.close(fd)
+        paths.append(path)
+    return tuple(paths)
+
+
+def _collect_output(paths: tuple, capture=None) -> Dict:
+    """
+    Vuelca los archivos de salida de una tarea y los elimina
+
+    Con capture (CaptureSet) se copian por bloques a sus capturas; sin
+    ella se devuelven como texto {"stdout": str, "stderr": str}
+    """
+    fields = {}
+    for stream, path in zip(STREAMS, paths):
+        try:
+            with open(path, "rb") as f:
+                if capture is None:
+                    fields[stream] = f.read().decode(errors="replace")
+                else:
+                    target = getattr(capture, stream)
+                    for chunk in iter(lambda: f.read(_COPY_CHUNK), b""):
+                        target.write(chunk)
+        except OSError as e:
+            logger.warning(f"No se pudo leer la salida {path}: {e}")
+        finally:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+    return fields
+
+
+class WorkerCrashed(Exception):
+    """El worker terminó o respondió algo inválido"""
+
+
+class _Worker:
+    """Un proceso intérprete con su hilo lector de respuestas"""
+
+    def __init__(self, kind: str, command: List[str], preexec_fn=None, single_use: bool = False):
+        """
+        Args:
+            single_use: El worker ejecuta una sola tarea: su stdout/stderr
+                        son directamente los archivos de salida (outputs;
+                        en Windows el stdout del worker es el protocolo)
+        """
+        self.kind = kind
+        self.tasks = 0
+        self.rss = 0
+        self._responses = queue.Queue()
+        self.outputs = _output_files() if single_use and os.name != "nt" else None
+
+        kwargs = {}
+        proto_w = None
+        if os.name == "nt":
+            kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs["start_new_session"] = True
+            # Límites del perfil del comando; los hijos de cada tarea los heredan
+            kwargs["preexec_fn"] = preexec_fn
+            proto_r, proto_w = os.pipe()
+            kwargs["pass_fds"] = (proto_w,)
+            kwargs["env"] = dict(os.environ, **{PROTO_FD_ENV: str(proto_w)})
+
+        out = err = None
+        try:
+            if self.outputs is not None:
+                out, err = (open(path, "wb") for path in self.outputs)
+            self.process = subprocess.Popen(
+                command,
+                stdin=subprocess.PIPE,
+                stdout=out or (subprocess.DEVNULL if proto_w is not None else subprocess.PIPE),
+                stderr=err or subprocess.DEVNULL,
+                **kwargs,
+            )
+        except OSError:
+            if proto_w is not None:
+                os.close(proto_r)
+            self._remove_outputs()
+            raise
+        finally:
+            for f in (out, err):
+                if f is not None:
+                    f.close()
+            if proto_w is not None:
+                os.close(proto_w)
+        self._proto = os.fdopen(proto_r, "rb") if proto_w is not None else self.process.stdout
+        self._reader = threading.Thread(target=self._read_loop, name=f"arkaios-interp-{kind}", daemon=True)
+        self._reader.start()
+
+    def _read_loop(self):
+        pipe = self._proto
+        try:
+            while True:
+                header = pipe.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                data = pipe.read(_HEADER.unpack(header)[0])
+                self._responses.put(json.loads(data))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Worker {self.kind} respondió datos inválidos: {e}")
+        finally:
+            pipe.close()
+            self._responses.put(None)
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(self, code: str, cwd: str, outputs: tuple, timeout: float) -> Dict:
+        """Envía una tarea y espera la respuesta (queue.Empty si expira)"""
+        task = {"code": code, "cwd": cwd, "stdout": outputs[0], "stderr": outputs[1]}
+        payload = json.dumps(task).encode()
+        try:
+            self.process.stdin.write(_HEADER.pack(len(payload)) + payload)
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise WorkerCrashed(str(e))
+
+        response = self._responses.get(timeout=timeout)
+        if response is None:
+            raise WorkerCrashed(f"El worker terminó (código {self.process.poll()})")
+        self.tasks += 1
+        self.rss = response.pop("rss", 0)
+        return response
+
+    def _remove_outputs(self):
+        for path in self.outputs or ():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def kill(self):
+        self._remove_outputs()
+        try:
+            if os.name == "nt":
+                self.process.kill()
+            else:
+                os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError, OSError):
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+    def close(self):
+        """Cierre ordenado: EOF en stdin"""
+        self._remove_outputs()
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=2)
+        except Exception:
+            self.kill()
+
+
+class InterpreterPool:
+    """Pool de workers de un intérprete (python o node)"""
+
+    def __init__(self, kind: str, size: int = 2, max_tasks: int = 100,
+                 max_rss_mb: int = 256, command: List[str] = None):
+        """
+        Args:
+            kind: "python" o "node"
+            size: Workers máximos (y precalentados tras el primer uso)
+            max_tasks: Tareas tras las que se recicla un worker (1 si el
+                intérprete no aísla las tareas, ver ISOLATED_KINDS)
+            max_rss_mb: Memoria residente a partir de la cual se recicla un worker
+            command: Comando del worker (por defecto WORKER_COMMANDS[kind])
+        """
+        self.kind = kind
+        self.size = size
+        self.max_tasks = max_tasks if kind in ISOLATED_KINDS else 1
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.command = command or WORKER_COMMANDS[kind]
+
+        self._idle: "queue.LifoQueue[_Worker]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._count = 0
+        self._available = None  # None = sin comprobar
+        self._stats = {"tasks": 0, "spawned": 0, "recycled": 0, "timeouts": 0, "crashes": 0}
+        # preexec_fn de los workers (límites del executor); se fija antes del primer uso
+        self.preexec_fn = None
+
+        logger.info(f"InterpreterPool iniciado. {kind}: {size} workers, reciclado cada {self.max_tasks} tareas")
+
+    @property
+    def available(self) -> bool:
+        """False si el intérprete no se pudo arrancar"""
+        return self._available is not False
+
+    def _spawn(self) -> _Worker:
+        try:
+            worker = _Worker(self.kind, self.command, self.preexec_fn,
+                             single_use=self.kind not in ISOLATED_KINDS)
+        except OSError:
+            self._available = False
+            raise
+        self._available = True
+        self._count_stat("spawned")
+        return worker
+
+    def warm(self):
+        """Arranca workers en segundo plano hasta completar el pool"""
+        def fill():
+            while True:
+                with self._lock:
+                    if self._count >= self.size:
+                        return
+                    self._count += 1
+                try:
+                    self._idle.put(self._spawn())
+                except OSError:
+                    with self._lock:
+                        self._count -= 1
+                    return
+
+        threading.Thread(target=fill, name=f"arkaios-interp-warm-{self.kind}", daemon=True).start()
+
+    def _count_stat(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _acquire(self, timeout: float) -> _Worker:
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker.alive():
+                return worker
+            self._discard(worker)
+        with self._lock:
+            spawn = self._count < self.size
+            if spawn:
+                self._count += 1
+        if spawn:
+            try:
+                return self._spawn()
+            except OSError:
+                with self._lock:
+                    self._count -= 1
+                raise
+        return self._idle.get(timeout=timeout)
+
+    def _discard(self, worker: _Worker, graceful: bool = False):
+        worker.close() if graceful else worker.kill()
+        with self._lock:
+            self._count -= 1
+
+    def _release(self, worker: _Worker):
+        if not worker.alive():
+            self._discard(worker)
+        elif worker.tasks >= self.max_tasks or worker.rss > self.max_rss:
+            self._count_stat("recycled")
+            self._discard(worker, graceful=True)
+            self.warm()
+        else:
+            self._idle.put(worker)
+
+    def run(self, code: str, cwd: str, timeout: float, capture=None) -> Dict:
+        """
+        Ejecuta un fragmento de código en un worker
+
+        La salida (también la parcial si expira el timeout) se copia a
+        capture (CaptureSet de OutputStore) si se da; si no, se devuelve
+        en stdout/stderr.
+
+        Returns:
+            {"ok": bool, "stdout": str, "stderr": str, "return_code": int, "error": str}
+
+        Raises:
+            OSError: el intérprete no está instalado
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            worker = self._acquire(timeout)
+        except queue.Empty:
+            return {"ok": False, "error": f"Sin workers {self.kind} libres tras {timeout}s"}
+
+        # Los archivos de salida pasan a la tarea: se leen y eliminan al terminar
+        outputs, worker.outputs = worker.outputs or _output_files(), None
+        remaining = max(0.1, deadline - time.monotonic())
+        self._count_stat("tasks")
+        try:
+            response = worker.run(code, cwd, outputs, remaining)
+        except queue.Empty:
+            self._count_stat("timeouts")
+            self._discard(worker)
+            self.warm()
+            response = {"ok": False, "error": f"Timeout de {timeout} segundos excedido"}
+        except WorkerCrashed as e:
+            self._count_stat("crashes")
+            self._discard(worker)
+            response = {"ok": False, "error": f"El intérprete {self.kind} terminó inesperadamente: {e}"}
+        except BaseException:
+            _collect_output(outputs)
+            raise
+        else:
+            self._release(worker)
+            response["ok"] = response.get("return_code") == 0
+        response.update(_collect_output(outputs, capture))
+        return response
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats, workers=self._count, idle=self._idle.qsize())
+
+    def shutdown(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(worker, graceful=True)
+
+
+# Singleton instance
+_pools_instance = None
+
+
+def get_interpreter_pools(**kwargs) -> Dict[str, InterpreterPool]:
+    """Obtiene los pools singleton {"python": ..., "node": ...}"""
+    global _pools_instance
+    if _pools_instance is None:
+        _pools_instance = {kind: InterpreterPool(kind, **kwargs) for kind in WORKER_COMMANDS}
+    return _pools_instance
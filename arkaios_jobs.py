@@ -0,0 +1,256 @@
+# arkaios_jobs.py - Cola de trabajos asíncronos para ARKAIOS
+"""
+Ejecuta tareas largas (scaffolding, npm install...) en un pool acotado de
+workers; los clientes consultan estado, pasos y resultado, o cancelan
+"""
+
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger("arkaios.jobs")
+
+# Estados de un trabajo
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+_local = threading.local()
+
+
+def current_job() -> Optional["Job"]:
+    """Trabajo que se está ejecutando en el hilo actual (o None)"""
+    return getattr(_local, "job", None)
+
+
+class JobCancelled(Exception):
+    """Se lanza dentro de un trabajo cuando se solicita su cancelación"""
+
+
+class Job:
+    """Estado de un trabajo enviado al JobManager"""
+
+    def __init__(self, kind: str, params: Dict = None, user: str = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.user = user
+        self.status = QUEUED
+        self.steps: List[str] = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0
+
+        self.cancel_event = threading.Event()
+        self._processes = set()
+        self._manager = None
+        self._future = None
+
+    def _changed(self):
+        self.version += 1
+        if self._manager is not None:
+            self._manager._notify()
+
+    def step(self, message: str):
+        """Registra un paso de progreso"""
+        self.steps.append(message)
+        self._changed()
+
+    def check_cancelled(self):
+        """Lanza JobCancelled si se pidió cancelar el trabajo"""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def attach_process(self, process):
+        """Asocia un subproceso para poder terminarlo al cancelar"""
+        self._processes.add(process)
+        if self.cancel_event.is_set():
+            self._kill(process)
+
+    def detach_process(self, process):
+        self._processes.discard(process)
+
+    @staticmethod
+    def _kill(process):
+        try:
+            process.kill()
+        except Exception:
+            pass
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "user": self.user,
+            "status": self.status,
+            "steps": list(self.steps),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "version": self.version,
+        }
+
+
+class JobManager:
+    """Pool acotado de workers para trabajos de larga duración"""
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 50,
+                 max_finished: int = 200):
+        """
+        Args:
+            max_workers: Trabajos ejecutándose a la vez
+            max_queue: Trabajos en espera antes de rechazar nuevos envíos
+            max_finished: Trabajos terminados que se conservan para consulta
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_finished = max_finished
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="arkaios-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._cond = threading.Condition()
+
+        logger.info(f"JobManager iniciado. Workers: {max_workers}, cola: {max_queue}")
+
+    def _notify(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def pending(self) -> int:
+        """Trabajos en cola (sin empezar)"""
+        with self._cond:
+            return sum(1 for job in self._jobs.values() if job.status == QUEUED)
+
+    def submit(self, kind: str, fn: Callable, *args, params: Dict = None,
+               user: str = None, **kwargs) -> Optional[Job]:
+        """
+        Envía un trabajo al pool
+
+        fn se ejecuta en un worker con current_job() apuntando al trabajo;
+        su resultado (dict con "ok") define el estado final.
+
+        Returns:
+            El Job creado, o None si la cola está llena
+        """
+        if self.pending() >= self.max_queue:
+            logger.warning(f"Cola de trabajos llena, rechazado: {kind}")
+            return None
+
+        job = Job(kind, params=params, user=user)
+        job._manager = self
+
+        with self._cond:
+            self._jobs[job.id] = job
+            self._prune()
+
+        job._future = self._pool.submit(self._run, job, fn, args, kwargs)
+        logger.info(f"Trabajo {job.id} encolado: {kind}")
+        self._notify()
+        return job
+
+    def _run(self, job: Job, fn: Callable, args, kwargs):
+        if job.cancel_event.is_set():
+            job.status = CANCELLED
+            job.finished_at = job.finished_at or time.time()
+            job._changed()
+            return
+
+        job.status = RUNNING
+        job.started_at = time.time()
+        job._changed()
+
+        _local.job = job
+        try:
+            result = fn(*args, **kwargs)
+            job.result = result
+            job.check_cancelled()
+            if isinstance(result, dict) and not result.get("ok", False):
+                job.status = FAILED
+                job.error = result.get("error")
+            else:
+                job.status = SUCCEEDED
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            logger.error(f"Error en trabajo {job.id}: {e}")
+            job.status = FAILED
+            job.error = str(e)
+        finally:
+            _local.job = None
+            if job.cancel_event.is_set() and job.status != SUCCEEDED:
+                job.status = CANCELLED
+            job.finished_at = time.time()
+            job._changed()
+            logger.info(f"Trabajo {job.id} terminado: {job.status}")
+
+    def _prune(self):
+        """Descarta los trabajos terminados más antiguos (requiere lock)"""
+        finished = [jid for jid, job in self._jobs.items() if job.status in FINISHED_STATES]
+        for jid in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[jid]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self, limit: int = 50) -> List[Dict]:
+        """Trabajos más recientes primero"""
+        with self._cond:
+            jobs = list(self._jobs.values())[-limit:]
+        return [job.to_dict() for job in reversed(jobs)]
+
+    def cancel(self, job_id: str) -> Dict:
+        """
+        Cancela un trabajo: si está en cola no llega a ejecutarse; si está
+        corriendo se terminan sus subprocesos
+
+        Returns:
+            {"ok": bool, "job": {...}, "error": str}
+        """
+        job = self.get(job_id)
+        if job is None:
+            return {"ok": False, "error": "Trabajo no encontrado"}
+        if job.status in FINISHED_STATES:
+            return {"ok": False, "error": f"El trabajo ya terminó ({job.status})", "job": job.to_dict()}
+
+        job.cancel_event.set()
+        if job._future is not None and job._future.cancel():
+            job.status = CANCELLED
+            job.finished_at = time.time()
+        for process in list(job._processes):
+            job._kill(process)
+        job._changed()
+
+        logger.info(f"Cancelación solicitada para trabajo {job.id}")
+        return {"ok": True, "job": job.to_dict()}
+
+    def wait_for_change(self, job: Job, version: int, timeout: float = 15.0) -> bool:
+        """Espera a que la versión del trabajo cambie; False si expira el timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: job.version != version, timeout)
+
+
+# Singleton instance
+_job_manager_instance = None
+
+
+def get_job_manager(**kwargs) -> JobManager:
+    """Obtiene la instancia singleton del gestor de trabajos"""
+    global _job_manager_instance
+    if _job_manager_instance is None:
+        _job_manager_instance = JobManager(**kwargs)
+    return _job_manager_instance
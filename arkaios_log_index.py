@@ -0,0 +1,331 @@
+# arkaios_log_index.py - Índice de consultas sobre el log estructurado
+"""
+Índice disperso timestamp -> offset sobre el segmento JSONL activo,
+construido de forma incremental y consultado con lecturas mmap.
+Los rangos anteriores al segmento activo se leen de los segmentos rotados
+"""
+
+import gzip
+import json
+import mmap
+import bisect
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("arkaios.log_index")
+
+# Tolerancia (ms) para eventos escritos ligeramente fuera de orden
+ORDER_SLACK_MS = 1000
+
+
+class LogIndex:
+    """Índice disperso sobre un archivo JSONL ordenado (aprox.) por "ts" """
+
+    def __init__(self, path: str, stride_bytes: int = 64 * 1024,
+                 segments: Callable[[], List[Path]] = None):
+        """
+        Args:
+            path: Ruta del archivo JSONL activo
+            stride_bytes: Distancia mínima en bytes entre puntos del índice
+            segments: Lista los segmentos rotados del más antiguo al más reciente
+                (p. ej. AuditLogWriter.list_segments); sin ella solo se consulta
+                el segmento activo
+        """
+        self.path = Path(path)
+        self.stride_bytes = stride_bytes
+        self.segments = segments
+
+        self._lock = threading.Lock()
+        # Puntos del índice: offsets y máximo "ts" visto antes de cada offset
+        self._offsets: List[int] = []
+        self._prefix_max: List[int] = []
+        self._max_ts = 0
+        self._first_ts = None
+        self._indexed_bytes = 0
+        self._inode = None
+        # Primer "ts" de cada segmento rotado (son inmutables)
+        self._segment_first_ts: Dict[str, Optional[int]] = {}
+
+        with self._lock:
+            self._catch_up()
+
+        logger.info(f"LogIndex iniciado. Archivo: {self.path} ({len(self._offsets)} puntos)")
+
+    # ===== Construcción incremental =====
+
+    def _reset(self):
+        self._offsets = []
+        self._prefix_max = []
+        self._max_ts = 0
+        self._first_ts = None
+        self._indexed_bytes = 0
+        self._inode = None
+
+    def _add(self, ts: int, offset: int, end: int):
+        """Registra un evento ya escrito en [offset, end)"""
+        if offset < self._indexed_bytes:
+            return
+        if not self._offsets or offset - self._offsets[-1] >= self.stride_bytes:
+            self._offsets.append(offset)
+            self._prefix_max.append(self._max_ts)
+        if isinstance(ts, (int, float)):
+            if offset == 0:
+                self._first_ts = int(ts)
+            if ts > self._max_ts:
+                self._max_ts = int(ts)
+        self._indexed_bytes = end
+
+    def on_log_event(self, kind: str, entries: List[tuple]):
+        """Listener para AuditLogWriter.add_listener"""
+        with self._lock:
+            if kind == "rotate":
+                self._reset()
+                return
+            if entries and entries[0][1] > self._indexed_bytes:
+                # Hueco (eventos escritos antes de registrar el listener)
+                self._catch_up()
+            for ts, offset, end in entries:
+                self._add(ts, offset, end)
+
+    def _catch_up(self):
+        """Indexa los bytes añadidos al archivo desde la última vez (requiere lock)"""
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            self._reset()
+            return
+
+        if self._inode is not None and (st.st_ino != self._inode or st.st_size < self._indexed_bytes):
+            # El archivo fue rotado o truncado
+            self._reset()
+        self._inode = st.st_ino
+
+        if st.st_size <= self._indexed_bytes:
+            return
+
+        with self.path.open("rb") as f:
+            f.seek(self._indexed_bytes)
+            offset = self._indexed_bytes
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Línea parcial: se indexará cuando se complete
+                end = offset + len(line)
+                try:
+                    ts = json.loads(line).get("ts", 0)
+                except (ValueError, AttributeError):
+                    ts = 0
+                self._add(ts, offset, end)
+                offset = end
+
+    # ===== Consultas =====
+
+    def _start_offset(self, since: Optional[int]) -> int:
+        """Offset desde el que es seguro empezar a leer para ts >= since"""
+        if since is None or not self._offsets:
+            return 0
+        # Último punto cuyos eventos anteriores son todos < since
+        pos = bisect.bisect_left(self._prefix_max, since) - 1
+        return self._offsets[pos] if pos >= 0 else 0
+
+    def _rotated(self, since: Optional[int], after: str = None) -> List[Path]:
+        """
+        Segmentos rotados a leer, del más antiguo al más reciente
+
+        Se recorren del más reciente hacia atrás y se para en el primero que
+        empieza antes de since. Con after (cursor) se continúa desde ese segmento
+        """
+        if self.segments is None:
+            return []
+        # Un segmento puede figurar dos veces mientras se comprime: se usa el nombre base
+        names = sorted({p.name[:-3] if p.name.endswith(".gz") else p.name for p in self.segments()})
+        cache = self._segment_first_ts
+        self._segment_first_ts = cache = {n: cache[n] for n in names if n in cache}
+
+        if after is not None:
+            return [self.path.with_name(n) for n in names if n >= after]
+
+        needed = []
+        for name in reversed(names):
+            needed.append(self.path.with_name(name))
+            if since is None:
+                continue
+            if name not in cache:
+                cache[name] = self._read_first_ts(needed[-1])
+            first_ts = cache[name]
+            if first_ts is not None and first_ts + ORDER_SLACK_MS < since:
+                break
+        needed.reverse()
+        return needed
+
+    @staticmethod
+    def _read_first_ts(segment: Path) -> Optional[int]:
+        """"ts" del primer evento de un segmento rotado (None si no se puede leer)"""
+        try:
+            for _, line in _segment_lines(segment, 0):
+                return int(json.loads(line).get("ts", 0))
+        except (OSError, EOFError, ValueError, AttributeError, TypeError):
+            pass
+        return None
+
+    @staticmethod
+    def _scan(lines: Iterator[Tuple[int, bytes]], since: Optional[int], until: Optional[int],
+              event_type: Optional[str], user: Optional[str], limit: int,
+              events: List[Dict]) -> Tuple[Optional[int], bool]:
+        """
+        Añade a events los eventos de lines que pasan los filtros
+
+        Returns:
+            (offset desde el que continuar o None, True si la consulta terminó)
+        """
+        for line_start, line in lines:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            ts = event.get("ts", 0)
+
+            if until is not None and ts > until + ORDER_SLACK_MS:
+                return None, True
+            if since is not None and ts < since:
+                continue
+            if until is not None and ts > until:
+                continue
+            if event_type and event.get("type") != event_type:
+                continue
+            if user and user not in (event.get("user"), event.get("email")):
+                continue
+
+            if len(events) >= limit:
+                return line_start, True
+            events.append(event)
+        return None, False
+
+    def query(self, since: int = None, until: int = None, event_type: str = None,
+              user: str = None, limit: int = 100, cursor=None) -> Dict:
+        """
+        Consulta eventos del log
+
+        Si el rango empieza antes del primer evento del segmento activo se leen
+        también los segmentos rotados (incluidos los .gz), en orden cronológico
+
+        Args:
+            since: Timestamp mínimo (ms, inclusivo)
+            until: Timestamp máximo (ms, inclusivo)
+            event_type: Filtra por campo "type"
+            user: Filtra por campo "user" (o "email" en eventos de login)
+            limit: Máximo de eventos devueltos
+            cursor: "next_cursor" devuelto por una consulta anterior: offset en el
+                segmento activo (int) o "segmento:offset" en uno rotado
+
+        Returns:
+            {"ok": bool, "events": [...], "count": int, "next_cursor": int|str|None}
+        """
+        segment, offset = None, None
+        if cursor is not None:
+            name, sep, value = str(cursor).rpartition(":")
+            try:
+                offset = int(value)
+            except ValueError:
+                return {"ok": False, "error": f"Cursor inválido: {cursor}"}
+            segment = name if sep else None
+
+        with self._lock:
+            self._catch_up()
+            start = self._start_offset(since)
+            size = self._indexed_bytes
+            first_ts = self._first_ts
+
+        if segment is not None:
+            rotated = self._rotated(since, after=segment)
+        elif cursor is None and (since is None or first_ts is None or since < first_ts + ORDER_SLACK_MS):
+            rotated = self._rotated(since)
+        else:
+            rotated = []
+
+        events = []
+        filters = (since, until, event_type, user, limit, events)
+
+        for path in rotated:
+            skip = offset if path.name == segment else 0
+            try:
+                resume, done = self._scan(_segment_lines(path, skip), *filters)
+            except (OSError, EOFError) as e:
+                # Segmento eliminado por la poda o .gz a medio escribir
+                logger.warning(f"Error leyendo segmento {path.name}: {e}")
+                continue
+            if resume is not None:
+                return {"ok": True, "events": events, "count": len(events),
+                        "next_cursor": f"{path.name}:{resume}"}
+            if done:
+                return {"ok": True, "events": events, "count": len(events), "next_cursor": None}
+
+        if segment is None and offset is not None:
+            start = max(start, offset)
+
+        next_cursor = None
+        if size > 0 and start < size:
+            try:
+                with self.path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    next_cursor, _ = self._scan(_mmap_lines(mm, start, min(size, len(mm))), *filters)
+            except (FileNotFoundError, ValueError) as e:
+                # ValueError: mmap de un archivo vacío (rotado entre el stat y la lectura)
+                logger.warning(f"Error leyendo log JSONL: {e}")
+
+        return {
+            "ok": True,
+            "events": events,
+            "count": len(events),
+            "next_cursor": next_cursor,
+        }
+
+    def stats(self) -> Dict:
+        """Estadísticas del índice"""
+        with self._lock:
+            return {
+                "path": str(self.path),
+                "points": len(self._offsets),
+                "indexed_bytes": self._indexed_bytes,
+                "max_ts": self._max_ts,
+            }
+
+
+def _mmap_lines(mm: mmap.mmap, start: int, size: int) -> Iterator[Tuple[int, bytes]]:
+    """(offset, línea) de las líneas completas de mm[start:size]"""
+    pos = start
+    while pos < size:
+        nl = mm.find(b"\n", pos, size)
+        if nl < 0:
+            break
+        yield pos, mm[pos:nl]
+        pos = nl + 1
+
+
+def _segment_lines(path: Path, start: int) -> Iterator[Tuple[int, bytes]]:
+    """(offset, línea) de un segmento rotado desde start (offsets sin comprimir)"""
+    try:
+        f = path.open("rb")
+    except FileNotFoundError:
+        # Ya comprimido: el .gz solo existe completo cuando se borra el original
+        f = gzip.open(Path(str(path) + ".gz"), "rb")
+    with f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            yield offset, line[:-1]
+            offset += len(line)
+
+
+# Singleton instance
+_log_index_instance = None
+
+
+def get_log_index(path: str = None, **kwargs) -> LogIndex:
+    """Obtiene la instancia singleton del índice de log"""
+    global _log_index_instance
+    if _log_index_instance is None:
+        _log_index_instance = LogIndex(path, **kwargs)
+    return _log_index_instance
@@ -0,0 +1,209 @@
+# arkaios_metrics.py - Métricas para ARKAIOS
+"""
+Contadores e histogramas en formato Prometheus con agregación por hilo:
+cada hilo escribe en su propio shard sin locks y los shards se combinan
+solo al exportar /metrics
+"""
+
+import bisect
+import logging
+import threading
+import functools
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger("arkaios.metrics")
+
+# Buckets de latencia (segundos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Shard:
+    """Datos de un hilo: solo ese hilo escribe en él"""
+
+    __slots__ = ("thread", "counters", "histograms")
+
+    def __init__(self, thread: threading.Thread):
+        self.thread = thread
+        self.counters: Dict[tuple, float] = {}
+        self.histograms: Dict[tuple, List[float]] = {}
+
+
+class MetricsRegistry:
+    """Registro de métricas con shards por hilo"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._retired = _Shard(None)
+        self._lock = threading.Lock()
+        self._meta: Dict[str, Tuple[str, str]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str):
+        """Declara tipo ("counter" o "histogram") y descripción de una métrica"""
+        self._meta[name] = (kind, help_text)
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard(threading.current_thread())
+            self._local.shard = shard
+            with self._lock:
+                # Servidor con un hilo por petición: consolidar aquí los shards
+                # de hilos terminados para no acumularlos hasta el próximo /metrics
+                self._retire_dead()
+                self._shards.append(shard)
+        return shard
+
+    @staticmethod
+    def _key(name: str, labels: Dict) -> tuple:
+        return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Incrementa un contador"""
+        counters = self._shard().counters
+        key = self._key(name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """Registra una observación en un histograma"""
+        histograms = self._shard().histograms
+        key = self._key(name, labels)
+        data = histograms.get(key)
+        if data is None:
+            # [cuenta por bucket..., +Inf, suma]
+            data = histograms[key] = [0] * (len(self.buckets) + 2)
+        data[bisect.bisect_left(self.buckets, value)] += 1
+        data[-1] += value
+
+    # ===== Exportación =====
+
+    @staticmethod
+    def _merge_into(target: _Shard, shard: _Shard):
+        for key, value in list(shard.counters.items()):
+            target.counters[key] = target.counters.get(key, 0) + value
+        for key, data in list(shard.histograms.items()):
+            acc = target.histograms.get(key)
+            if acc is None:
+                target.histograms[key] = list(data)
+            else:
+                for i, v in enumerate(data):
+                    acc[i] += v
+
+    def _retire_dead(self):
+        """Consolida en _retired los shards de hilos terminados (requiere lock)"""
+        alive = []
+        for shard in self._shards:
+            if shard.thread is not None and not shard.thread.is_alive():
+                self._merge_into(self._retired, shard)
+            else:
+                alive.append(shard)
+        self._shards = alive
+
+    def _collect(self) -> _Shard:
+        """Combina todos los shards; los de hilos terminados se consolidan"""
+        with self._lock:
+            self._retire_dead()
+            total = _Shard(None)
+            self._merge_into(total, self._retired)
+            for shard in self._shards:
+                self._merge_into(total, shard)
+        return total
+
+    @staticmethod
+    def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+        items = list(labels) + list(extra)
+        if not items:
+            return ""
+        def esc(v):
+            return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+    def render(self) -> str:
+        """Exporta todas las métricas en formato de texto Prometheus"""
+        total = self._collect()
+        lines = []
+
+        by_name: Dict[str, list] = {}
+        for (name, labels), value in sorted(total.counters.items()):
+            by_name.setdefault(name, []).append((labels, value))
+        for name, series in by_name.items():
+            kind, help_text = self._meta.get(name, ("counter", name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in series:
+                lines.append(f"{name}{self._format_labels(labels)} {value:g}")
+
+        by_name = {}
+        for (name, labels), data in sorted(total.histograms.items()):
+            by_name.setdefault(name, []).append((labels, data))
+        for name, series in by_name.items():
+            _, help_text = self._meta.get(name, ("histogram", name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, data in series:
+                cumulative = 0
+                for bound, count in zip(self.buckets, data):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{self._format_labels(labels, (('le', f'{bound:g}'),))} {cumulative}")
+                cumulative += data[len(self.buckets)]
+                lines.append(f"{name}_bucket{self._format_labels(labels, (('le', '+Inf'),))} {cumulative}")
+                lines.append(f"{name}_sum{self._format_labels(labels)} {data[-1]:g}")
+                lines.append(f"{name}_count{self._format_labels(labels)} {cumulative}")
+
+        return "\n".join(lines) + "\n"
+
+
+def count_calls(metric: str, outcome: Callable = None, skip: Callable = None, **labels):
+    """
+    Decorador que cuenta llamadas por resultado
+
+    Por defecto el resultado es "ok"/"error" según el campo "ok" del dict
+    devuelto; outcome permite otra clasificación. skip recibe los mismos
+    argumentos que la función: si devuelve True la llamada cuenta como
+    "skipped" (p. ej. un proveedor sin configurar), no como error.
+    """
+    def classify(result):
+        if outcome is not None:
+            return outcome(result)
+        if isinstance(result, dict):
+            return "ok" if result.get("ok") else "error"
+        return "ok"
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if skip is not None and skip(*args, **kwargs):
+                get_metrics().inc(metric, outcome="skipped", **labels)
+                return fn(*args, **kwargs)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                get_metrics().inc(metric, outcome="exception", **labels)
+                raise
+            get_metrics().inc(metric, outcome=classify(result), **labels)
+            return result
+        return wrapper
+    return decorator
+
+
+# Singleton instance
+_metrics_instance = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Obtiene la instancia singleton del registro de métricas"""
+    global _metrics_instance
+    if _metrics_instance is None:
+        with _metrics_lock:
+            if _metrics_instance is None:
+                registry = MetricsRegistry()
+                registry.describe("arkaios_http_requests_total", "counter", "Peticiones HTTP por ruta, método y estado")
+                registry.describe("arkaios_http_request_duration_seconds", "histogram", "Latencia de peticiones HTTP")
+                registry.describe("arkaios_executor_spawns_total", "counter", "Procesos lanzados por el executor")
+                registry.describe("arkaios_executor_cache_total", "counter", "Consultas a la caché de resultados del executor")
+                registry.describe("arkaios_ai_provider_calls_total", "counter", "Llamadas a proveedores de IA por resultado")
+                registry.describe("arkaios_file_operations_total", "counter", "Operaciones del file manager por resultado")
+                _metrics_instance = registry
+    return _metrics_instance
@@ -0,0 +1,277 @@
+# arkaios_output_store.py - Captura acotada de salida de comandos para ARKAIOS
+"""
+Captura stdout/stderr con memoria acotada: por debajo del umbral la salida
+se guarda en memoria; por encima se vuelca a un archivo temporal y solo se
+conservan en memoria el principio y el final. El resto se sirve por rangos
+"""
+
+import os
+import time
+import uuid
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger("arkaios.output_store")
+
+STREAMS = ("stdout", "stderr")
+
+
+class OutputCapture:
+    """
+    Captura de un stream: memoria hasta el umbral, después archivo
+
+    Tras close() las escrituras se descartan: un lector que sigue vivo (un
+    nieto mantiene el pipe abierto tras un timeout) no toca el estado ya
+    entregado.
+    """
+
+    def __init__(self, store: "OutputStore", output_id: str, stream: str):
+        self.store = store
+        self.output_id = output_id
+        self.stream = stream
+        self.size = 0
+
+        self._buffer: Optional[bytearray] = bytearray()
+        self._file = None
+        self._head = b""
+        self._tail = bytearray()
+        self._closed = False
+        self._lock = threading.Lock()
+
+    @property
+    def spilled(self) -> bool:
+        return self._buffer is None
+
+    def write(self, data: bytes):
+        if not data:
+            return
+        with self._lock:
+            if self._closed:
+                return
+            self.size += len(data)
+
+            if self._buffer is not None:
+                self._buffer += data
+                if len(self._buffer) > self.store.spill_threshold:
+                    self._spill()
+                return
+
+            self._file.write(data)
+            self._tail += data
+            if len(self._tail) > 2 * self.store.tail_bytes:
+                del self._tail[:-self.store.tail_bytes]
+
+    def _spill(self):
+        """Pasa de memoria a archivo conservando principio y final"""
+        path = self.store.path_for(self.output_id, self.stream)
+        self._file = open(path, "wb")
+        self._file.write(self._buffer)
+        self._head = bytes(self._buffer[:self.store.head_bytes])
+        self._tail = bytearray(self._buffer[-self.store.tail_bytes:])
+        self._buffer = None
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def text(self) -> str:
+        """Salida completa, o principio + final si se volcó a disco"""
+        with self._lock:
+            if self._buffer is not None:
+                return self._buffer.decode(errors="replace")
+            tail = bytes(self._tail[-self.store.tail_bytes:])
+            omitted = self.size - len(self._head) - len(tail)
+        return (
+            self._head.decode(errors="replace")
+            + f"\n… [{omitted} bytes omitidos] …\n"
+            + tail.decode(errors="replace")
+        )
+
+
+class CaptureSet:
+    """stdout y stderr de una ejecución"""
+
+    def __init__(self, store: "OutputStore"):
+        self.store = store
+        self.id = uuid.uuid4().hex
+        self.stdout = OutputCapture(store, self.id, "stdout")
+        self.stderr = OutputCapture(store, self.id, "stderr")
+
+    def result(self) -> Dict:
+        """
+        Cierra las capturas y devuelve los campos para la respuesta
+
+        Returns:
+            {"stdout": str, "stderr": str, "truncated": bool,
+             "output_id": str (si truncated), "stdout_bytes": int, "stderr_bytes": int}
+        """
+        self.stdout.close()
+        self.stderr.close()
+
+        fields = {
+            "stdout": self.stdout.text(),
+            "stderr": self.stderr.text(),
+            "truncated": self.stdout.spilled or self.stderr.spilled,
+        }
+        if fields["truncated"]:
+            self.store.register(self)
+            fields["output_id"] = self.id
+            fields["stdout_bytes"] = self.stdout.size
+            fields["stderr_bytes"] = self.stderr.size
+        return fields
+
+
+class OutputStore:
+    """Archivos de salida volcados a disco, con expiración y cuota"""
+
+    def __init__(self, directory: str = None, spill_threshold: int = 1024 * 1024,
+                 head_bytes: int = 16 * 1024, tail_bytes: int = 64 * 1024,
+                 ttl: int = 3600, max_total_bytes: int = 512 * 1024 * 1024):
+        """
+        Args:
+            directory: Carpeta de los archivos (por defecto, en el temporal del sistema)
+            spill_threshold: Bytes por stream que se guardan en memoria antes de volcar
+            head_bytes: Bytes del principio incluidos en la respuesta
+            tail_bytes: Bytes del final incluidos en la respuesta
+            ttl: Segundos que se conserva una salida volcada
+            max_total_bytes: Tamaño total máximo de las salidas en disco
+        """
+        self.directory = Path(directory or Path(tempfile.gettempdir()) / "arkaios-output")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.spill_threshold = spill_threshold
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.ttl = ttl
+        self.max_total_bytes = max_total_bytes
+
+        # output_id -> (created_at, bytes en disco)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self._remove_stale()
+        logger.info(f"OutputStore iniciado. Carpeta: {self.directory}")
+
+    def capture(self) -> CaptureSet:
+        """Nueva captura para una ejecución"""
+        return CaptureSet(self)
+
+    def path_for(self, output_id: str, stream: str) -> Path:
+        return self.directory / f"{output_id}.{stream}"
+
+    def register(self, capture: CaptureSet):
+        """Da de alta una salida volcada y aplica expiración y cuota"""
+        size = sum(c.size for c in (capture.stdout, capture.stderr) if c.spilled)
+        with self._lock:
+            self._entries[capture.id] = (time.time(), size)
+            self._total_bytes += size
+            self._evict()
+
+    def _evict(self):
+        """Elimina salidas expiradas o las más antiguas si se supera la cuota (requiere lock)"""
+        now = time.time()
+        while self._entries:
+            output_id, (created_at, size) = next(iter(self._entries.items()))
+            if created_at + self.ttl > now and self._total_bytes <= self.max_total_bytes:
+                break
+            del self._entries[output_id]
+            self._total_bytes -= size
+            self._unlink(output_id)
+
+    def _unlink(self, output_id: str):
+        for stream in STREAMS:
+            try:
+                self.path_for(output_id, stream).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"No se pudo eliminar salida {output_id}: {e}")
+
+    def _remove_stale(self):
+        """Limpia archivos de ejecuciones anteriores del proceso"""
+        cutoff = time.time() - self.ttl
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(STREAMS) and entry.stat().st_mtime < cutoff:
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+
+    def stream(self, output_id: str, stream: str = "stdout", start: int = 0,
+               end: int = None, chunk_size: int = 64 * 1024) -> Dict:
+        """
+        Abre un rango de bytes de una salida volcada para transmitirlo por bloques
+
+        El archivo queda abierto hasta agotar o cerrar el iterador, así que
+        ni una salida de varios GB se carga entera en memoria.
+
+        Args:
+            output_id: Id devuelto en la respuesta del comando
+            stream: "stdout" o "stderr"
+            start: Primer byte (inclusivo); negativo = últimos -start bytes
+            end: Último byte (inclusivo); None = hasta el final
+            chunk_size: Bytes por bloque
+
+        Returns:
+            {"ok": bool, "chunks": Iterator[bytes], "start": int, "end": int,
+             "size": int, "error": str}
+        """
+        if stream not in STREAMS:
+            return {"ok": False, "error": f"Stream no válido: {stream}"}
+        with self._lock:
+            self._evict()
+            known = output_id in self._entries
+        if not known:
+            return {"ok": False, "error": "Salida no encontrada o expirada"}
+
+        path = self.path_for(output_id, stream)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            # Solo uno de los streams se volcó: el otro cabe entero en la respuesta
+            return {"ok": False, "error": f"El stream {stream} no se volcó a disco"}
+
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            f.close()
+            return {"ok": True, "chunks": iter(()), "start": 0, "end": -1, "size": 0}
+        if start < 0:
+            start, end = max(0, size + start), None
+        if start >= size:
+            f.close()
+            return {"ok": False, "error": "Rango fuera del archivo", "size": size}
+        end = size - 1 if end is None else min(end, size - 1)
+
+        def chunks() -> Iterator[bytes]:
+            try:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    data = f.read(min(chunk_size, remaining))
+                    if not data:
+                        break
+                    remaining -= len(data)
+                    yield data
+            finally:
+                f.close()
+
+        return {"ok": True, "chunks": chunks(), "start": start, "end": end, "size": size}
+
+
+# Singleton instance
+_output_store_instance = None
+
+
+def get_output_store(directory: str = None, **kwargs) -> OutputStore:
+    """Obtiene la instancia singleton del almacén de salidas"""
+    global _output_store_instance
+    if _output_store_instance is None:
+        _output_store_instance = OutputStore(directory, **kwargs)
+    return _output_store_instance
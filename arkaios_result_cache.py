@@ -0,0 +1,201 @@
+# arkaios_result_cache.py - Caché de resultados del executor de ARKAIOS
+"""
+Memoiza comandos idempotentes (sondas de versión y git de solo lectura) con
+TTL y expulsión LRU. La clave incluye el estado del que depende la salida:
+PATH para las versiones y el estado del repositorio (index, HEAD y la rama
+actual) para git
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from arkaios_metrics import get_metrics
+
+logger = logging.getLogger("arkaios.result_cache")
+
+VERSION_ARGS = {"-v", "--version", "-V", "version"}
+
+# Subcomandos git que no modifican el repositorio
+GIT_READ_ONLY = {"status", "log", "branch", "diff", "show", "rev-parse", "ls-files", "--version"}
+
+# Subcomandos cuya salida depende también del árbol de trabajo: editar un
+# archivo no cambia index ni HEAD, así que usan el TTL corto de status
+GIT_WORKTREE = {"status", "diff", "ls-files"}
+
+# Argumentos de git branch que modifican refs
+GIT_BRANCH_WRITES = {"-d", "-D", "-m", "-M", "-c", "-C", "--delete", "--move", "--copy",
+                     "--set-upstream-to", "-u", "--unset-upstream", "-f", "--force"}
+
+# TTL por tipo de comando (segundos)
+DEFAULT_TTLS = {
+    "version": 300.0,
+    "git": 60.0,
+    # status, diff y ls-files (GIT_WORKTREE)
+    "git_status": 2.0,
+}
+
+
+def _mtime_ns(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+
+def find_git_dir(work_dir: Path) -> Optional[Path]:
+    """Carpeta .git del repositorio que contiene work_dir (o None)"""
+    for directory in (work_dir, *work_dir.parents):
+        candidate = directory / ".git"
+        if candidate.is_dir():
+            return candidate
+        if candidate.is_file():
+            # Worktrees y submódulos: ".git" es un archivo "gitdir: <ruta>"
+            try:
+                content = candidate.read_text(encoding="utf-8").strip()
+            except OSError:
+                return None
+            if content.startswith("gitdir:"):
+                return (directory / content[len("gitdir:"):].strip()).resolve()
+            return None
+    return None
+
+
+def git_state_signature(work_dir: Path) -> Optional[tuple]:
+    """
+    Firma barata del estado del repositorio: mtimes de index, HEAD, la ref
+    a la que apunta HEAD y packed-refs. Cambia con commits, checkouts y add
+    """
+    git_dir = find_git_dir(Path(work_dir))
+    if git_dir is None:
+        return None
+
+    head = git_dir / "HEAD"
+    ref_mtime = 0
+    try:
+        content = head.read_text(encoding="utf-8").strip()
+        if content.startswith("ref:"):
+            ref_mtime = _mtime_ns(git_dir / content[len("ref:"):].strip())
+    except OSError:
+        content = ""
+
+    return (
+        str(git_dir),
+        content,
+        _mtime_ns(head),
+        _mtime_ns(git_dir / "index"),
+        ref_mtime,
+        _mtime_ns(git_dir / "packed-refs"),
+    )
+
+
+def classify(command: str, args: List[str]) -> Optional[str]:
+    """Tipo de caché aplicable al comando, o None si no es cacheable"""
+    if len(args) == 1 and args[0] in VERSION_ARGS:
+        return "version"
+    if command != "git" or not args:
+        return None
+    sub = args[0]
+    if sub not in GIT_READ_ONLY:
+        return None
+    if sub == "branch" and (len(args) > 1 and not all(a.startswith("-") for a in args[1:])
+                            or any(a in GIT_BRANCH_WRITES for a in args[1:])):
+        return None  # Crear, borrar o renombrar ramas
+    if sub in GIT_WORKTREE:
+        return "git_status"
+    return "git"
+
+
+class ResultCache:
+    """Caché LRU con TTL de resultados de CommandExecutor.execute_command"""
+
+    def __init__(self, max_entries: int = 256, ttls: Dict[str, float] = None):
+        """
+        Args:
+            max_entries: Resultados máximos en caché
+            ttls: TTL en segundos por tipo ("version", "git", "git_status")
+        """
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+
+        # key -> (result, expires_at)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+        logger.info(f"ResultCache iniciado. Entradas: {max_entries}")
+
+    def key_for(self, command: str, args: List[str], work_dir: Path,
+                env: Dict[str, str] = None) -> Optional[tuple]:
+        """Clave de caché del comando, o None si no es cacheable"""
+        kind = classify(command, args)
+        if kind is None:
+            return None
+
+        path = (env or {}).get("PATH", os.environ.get("PATH", ""))
+        key = (kind, command, tuple(args), str(work_dir), path)
+        if kind in ("git", "git_status"):
+            state = git_state_signature(work_dir)
+            if state is None:
+                return None  # Fuera de un repositorio: no hay estado que vigilar
+            key += state
+        return key
+
+    def get(self, key: tuple) -> Optional[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                hit = True
+            else:
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                hit = False
+        get_metrics().inc("arkaios_executor_cache_total", outcome="hit" if hit else "miss")
+        return dict(entry[0], cached=True) if hit else None
+
+    def put(self, key: tuple, result: Dict):
+        """Guarda un resultado terminado (no timeouts, rechazos ni salidas truncadas)"""
+        if "return_code" not in result or result.get("truncated"):
+            return
+        ttl = self.ttls.get(key[0], 0)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (result, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Vacía la caché"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+# Singleton instance
+_result_cache_instance = None
+
+
+def get_result_cache(**kwargs) -> ResultCache:
+    """Obtiene la instancia singleton de la caché de resultados"""
+    global _result_cache_instance
+    if _result_cache_instance is None:
+        _result_cache_instance = ResultCache(**kwargs)
+    return _result_cache_instance
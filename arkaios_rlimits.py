@@ -0,0 +1,137 @@
+# arkaios_rlimits.py - Límites de recursos y contabilidad por comando para ARKAIOS
+"""
+Aplica RLIMIT_CPU, RLIMIT_AS y RLIMIT_NOFILE a los procesos hijos (perfiles
+por comando) y recoge su consumo real (CPU, RSS máximo) con wait4
+"""
+
+import os
+import sys
+import signal
+import logging
+import threading
+import subprocess
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("arkaios.rlimits")
+
+# Perfiles por comando: cpu (segundos), as_mb (memoria virtual), nofile.
+# None = sin límite. Nada basado en V8 limita AS (node, npm, npx, firebase y
+# code, que es Electron): reserva mucha más memoria virtual de la que usa
+DEFAULT_LIMIT_PROFILES = {
+    "default": {"cpu": 300, "as_mb": 2048, "nofile": 1024},
+    "npm": {"cpu": 1800, "as_mb": None, "nofile": 8192},
+    "npx": {"cpu": 1800, "as_mb": None, "nofile": 8192},
+    "node": {"cpu": 600, "as_mb": None, "nofile": 4096},
+    "python": {"cpu": 600, "as_mb": 4096, "nofile": 4096},
+    "pip": {"cpu": 1800, "as_mb": 4096, "nofile": 4096},
+    "git": {"cpu": 600, "as_mb": 4096, "nofile": 4096},
+    "firebase": {"cpu": 1800, "as_mb": None, "nofile": 8192},
+    "code": {"cpu": None, "as_mb": None, "nofile": 8192},
+}
+
+SUPPORTED = resource is not None and hasattr(os, "wait4")
+
+
+def profile_for(profiles: Dict[str, Dict], command: str) -> Dict:
+    """Perfil del comando (o el de "default")"""
+    return profiles.get(command) or profiles.get("default") or {}
+
+
+def make_preexec(limits: Dict) -> Optional[Callable[[], None]]:
+    """
+    Función para preexec_fn que aplica los límites en el hijo antes de exec
+
+    Solo se bajan los límites soft/hard si son más altos que el perfil.
+    """
+    if resource is None or not limits:
+        return None
+
+    wanted = []
+    if limits.get("cpu"):
+        wanted.append((resource.RLIMIT_CPU, int(limits["cpu"])))
+    if limits.get("as_mb") and hasattr(resource, "RLIMIT_AS"):
+        wanted.append((resource.RLIMIT_AS, int(limits["as_mb"]) * 1024 * 1024))
+    if limits.get("nofile"):
+        wanted.append((resource.RLIMIT_NOFILE, int(limits["nofile"])))
+    if not wanted:
+        return None
+
+    def apply():
+        for which, value in wanted:
+            soft, hard = resource.getrlimit(which)
+            if hard != resource.RLIM_INFINITY:
+                value = min(value, hard)
+            new_hard = value
+            if which == resource.RLIMIT_CPU:
+                # Margen entre el soft (SIGXCPU) y el hard (SIGKILL)
+                new_hard = value + 5 if hard == resource.RLIM_INFINITY else min(hard, value + 5)
+            resource.setrlimit(which, (value, new_hard))
+
+    return apply
+
+
+def _maxrss_kb(ru_maxrss: int) -> int:
+    # Linux lo expresa en KB y macOS en bytes
+    return ru_maxrss // 1024 if sys.platform == "darwin" else ru_maxrss
+
+
+def wait_with_usage(process: subprocess.Popen, timeout: float = None,
+                    on_timeout: Callable[[], None] = None) -> Tuple[int, Optional[Dict], bool]:
+    """
+    Espera al proceso recogiendo su consumo con wait4
+
+    Args:
+        process: Proceso lanzado con Popen
+        timeout: Segundos máximos; al expirar se llama on_timeout (o kill)
+        on_timeout: Cómo terminar el proceso al expirar
+
+    Returns:
+        (return_code, usage, timed_out) con usage None si no hay wait4
+    """
+    timed_out = threading.Event()
+
+    def expire():
+        timed_out.set()
+        (on_timeout or process.kill)()
+
+    if not SUPPORTED:
+        try:
+            return process.wait(timeout=timeout), None, False
+        except subprocess.TimeoutExpired:
+            expire()
+            return process.wait(), None, True
+
+    timer = threading.Timer(timeout, expire) if timeout else None
+    if timer is not None:
+        timer.daemon = True
+        timer.start()
+    try:
+        while True:
+            try:
+                _, status, ru = os.wait4(process.pid, 0)
+                # Popen no debe volver a esperar (ni señalar) al pid
+                process.returncode = os.waitstatus_to_exitcode(status)
+                break
+            except InterruptedError:
+                continue
+            except ChildProcessError:
+                # Ya recogido por otra vía (p. ej. Popen.poll)
+                return process.wait(), None, timed_out.is_set()
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+    return_code = process.returncode
+    usage = {
+        "cpu_user": round(ru.ru_utime, 4),
+        "cpu_sys": round(ru.ru_stime, 4),
+        "max_rss_kb": _maxrss_kb(ru.ru_maxrss),
+    }
+    if hasattr(signal, "SIGXCPU") and return_code == -signal.SIGXCPU:
+        usage["limit_exceeded"] = "cpu"
+    return return_code, usage, timed_out.is_set()
@@ -0,0 +1,465 @@
+# arkaios_search_engine.py - Motor de búsqueda en contenido para ARKAIOS
+"""
+Busca una regex en muchos archivos repartiéndolos en lotes entre procesos
+worker (un hilo despachador por worker, con el protocolo de longitud
+prefijada de arkaios_interp_pool). Cada archivo se lee por bloques de
+líneas, se descartan los binarios y los que superan el tamaño máximo, y se
+devuelven número de línea y contexto. La búsqueda termina antes al llegar a
+max_results o al plazo, cancelando los lotes pendientes
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import struct
+import logging
+import threading
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+logger = logging.getLogger("arkaios.search_engine")
+
+# Bytes del principio que se inspeccionan para detectar binarios
+SNIFF_BYTES = 8192
+# Tamaño aproximado de cada bloque de líneas
+CHUNK_CHARS = 64 * 1024
+# Longitud máxima de una línea devuelta (las líneas minificadas se recortan)
+MAX_LINE_CHARS = 500
+
+_HEADER = struct.Struct(">I")
+
+# Los workers solo importan este módulo (nunca el del servidor)
+WORKER_COMMAND = [sys.executable, "-c", "import arkaios_search_engine; arkaios_search_engine.worker_main()"]
+
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+if hasattr(sre_parse, "POSSESSIVE_REPEAT"):
+    _REPEATS.add(sre_parse.POSSESSIVE_REPEAT)
+
+# Categorías de clase que incluyen el salto de línea (\s, \D, \W)
+_NEWLINE_CATEGORIES = {sre_parse.CATEGORY_SPACE, sre_parse.CATEGORY_NOT_DIGIT, sre_parse.CATEGORY_NOT_WORD}
+
+
+def _class_has_newline(items) -> bool:
+    for op, av in items:
+        if op is sre_parse.NEGATE:
+            return True
+        if op is sre_parse.LITERAL and av == 10:
+            return True
+        if op is sre_parse.RANGE and av[0] <= 10 <= av[1]:
+            return True
+        if op is sre_parse.CATEGORY and av in _NEWLINE_CATEGORIES:
+            return True
+    return False
+
+
+def _spans_lines(parsed, dotall: bool) -> bool:
+    """True si el patrón puede casar con un salto de línea o usa anclas de texto"""
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            if av == 10:
+                return True
+        elif op is sre_parse.NOT_LITERAL:
+            if av != 10:
+                return True
+        elif op is sre_parse.ANY:
+            if dotall:
+                return True
+        elif op is sre_parse.IN:
+            if _class_has_newline(av):
+                return True
+        elif op is sre_parse.AT:
+            # ^, $, \A y \Z dependen del texto completo; \b y \B no
+            if av not in (sre_parse.AT_BOUNDARY, sre_parse.AT_NON_BOUNDARY):
+                return True
+        elif op is sre_parse.SUBPATTERN:
+            _, add_flags, del_flags, sub = av
+            sub_dotall = (dotall or bool(add_flags & sre_parse.SRE_FLAG_DOTALL)) \
+                and not del_flags & sre_parse.SRE_FLAG_DOTALL
+            if _spans_lines(sub, sub_dotall):
+                return True
+        elif op in _REPEATS:
+            if _spans_lines(av[2], dotall):
+                return True
+        elif op is sre_parse.BRANCH:
+            if any(_spans_lines(item, dotall) for item in av[1]):
+                return True
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            if _spans_lines(av[1], dotall):
+                return True
+        elif op is getattr(sre_parse, "ATOMIC_GROUP", None):
+            if _spans_lines(av, dotall):
+                return True
+        else:
+            return True  # Referencias a grupos y demás: se asume que sí
+    return False
+
+
+def needs_whole_file(pattern: str, flags: int = 0) -> bool:
+    """Si el patrón debe evaluarse sobre el archivo completo en vez de línea a línea"""
+    parsed = sre_parse.parse(pattern, flags)
+    return _spans_lines(parsed, bool(parsed.state.flags & sre_parse.SRE_FLAG_DOTALL))
+
+
+def _clip(line: str) -> str:
+    return line if len(line) <= MAX_LINE_CHARS else line[:MAX_LINE_CHARS] + "…"
+
+
+def _dedupe(matches: list, limit: int) -> list:
+    return list(dict.fromkeys(matches))[:limit]
+
+
+def _scan_lines(text: io.TextIOWrapper, regex, context: int, max_matches: int,
+                deadline: Optional[float]) -> Optional[Dict]:
+    """Búsqueda línea a línea por bloques; un bloque sin coincidencias se salta entero"""
+    found, lines = [], []
+    before = deque(maxlen=context)
+    waiting = []  # Coincidencias a las que aún les faltan líneas de contexto posterior
+    number = 0
+
+    while len(lines) < max_matches or waiting:
+        if deadline is not None and time.time() > deadline:
+            raise TimeoutError
+        block = text.readlines(CHUNK_CHARS)
+        if not block:
+            break
+        hit_block = len(lines) < max_matches and regex.search("".join(block)) is not None
+
+        for line in block:
+            number += 1
+            line = line.rstrip("\n")
+            if waiting:
+                for entry in waiting:
+                    entry["after"].append(_clip(line))
+                waiting = [entry for entry in waiting if len(entry["after"]) < context]
+            if hit_block and len(lines) < max_matches:
+                hits = regex.findall(line)
+                if hits:
+                    found.extend(hits)
+                    entry = {"line": number, "text": _clip(line)}
+                    if context:
+                        entry["before"] = list(before)
+                        entry["after"] = []
+                        waiting.append(entry)
+                    lines.append(entry)
+            if context:
+                before.append(_clip(line))
+            if not waiting and len(lines) >= max_matches:
+                break
+
+    if not lines:
+        return None
+    return {"matches": _dedupe(found, max_matches), "lines": lines}
+
+
+def _scan_whole(content: str, regex, context: int, max_matches: int) -> Optional[Dict]:
+    """Búsqueda sobre el texto completo (patrones que cruzan líneas o usan anclas)"""
+    found = regex.findall(content)
+    if not found:
+        return None
+
+    all_lines = content.split("\n")
+    lines, seen = [], set()
+    number, position = 1, 0
+    for match in regex.finditer(content):
+        number += content.count("\n", position, match.start())
+        position = match.start()
+        if number in seen:
+            continue
+        seen.add(number)
+        entry = {"line": number, "text": _clip(all_lines[number - 1])}
+        if context:
+            entry["before"] = [_clip(line) for line in all_lines[max(0, number - 1 - context):number - 1]]
+            entry["after"] = [_clip(line) for line in all_lines[number:number + context]]
+        lines.append(entry)
+        if len(lines) >= max_matches:
+            break
+    return {"matches": _dedupe(found, max_matches), "lines": lines}
+
+
+def search_batch(files: List[Tuple[str, str]], pattern: str, flags: int, context: int,
+                 max_matches: int, max_file_bytes: int, deadline: Optional[float]) -> List[tuple]:
+    """
+    Busca en un lote de archivos (se ejecuta en los procesos worker)
+
+    Returns:
+        [(rel_path, estado, resultado)] con estado "match", "nomatch", "binary",
+        "large", "unreadable" o "timeout" (el resto del lote no se procesó)
+    """
+    regex = re.compile(pattern, flags)
+    whole = needs_whole_file(pattern, flags)
+    outcomes = []
+    for path, rel_path in files:
+        if deadline is not None and time.time() > deadline:
+            outcomes.append((rel_path, "timeout", None))
+            break
+        try:
+            with open(path, "rb") as raw:
+                if os.fstat(raw.fileno()).st_size > max_file_bytes:
+                    outcomes.append((rel_path, "large", None))
+                    continue
+                if b"\0" in raw.read(SNIFF_BYTES):
+                    outcomes.append((rel_path, "binary", None))
+                    continue
+                raw.seek(0)
+                text = io.TextIOWrapper(raw, encoding="utf-8", newline=None)
+                if whole:
+                    result = _scan_whole(text.read(), regex, context, max_matches)
+                else:
+                    result = _scan_lines(text, regex, context, max_matches, deadline)
+        except TimeoutError:
+            outcomes.append((rel_path, "timeout", None))
+            break
+        except UnicodeDecodeError:
+            outcomes.append((rel_path, "binary", None))
+            continue
+        except OSError:
+            outcomes.append((rel_path, "unreadable", None))
+            continue
+        outcomes.append((rel_path, "match" if result else "nomatch", result))
+    return outcomes
+
+
+def worker_main():
+    """Bucle del proceso worker: lotes por stdin, resultados por stdout"""
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    while True:
+        header = stdin.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return
+        args = json.loads(stdin.read(_HEADER.unpack(header)[0]))
+        data = json.dumps(search_batch(*args)).encode()
+        stdout.write(_HEADER.pack(len(data)) + data)
+        stdout.flush()
+
+
+class _Worker:
+    """Proceso worker de búsqueda"""
+
+    def __init__(self):
+        env = dict(os.environ)
+        module_dir = os.path.dirname(os.path.abspath(__file__))
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [module_dir, env.get("PYTHONPATH")]))
+        self.process = subprocess.Popen(
+            WORKER_COMMAND,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+        )
+
+    def run(self, args: tuple) -> List[tuple]:
+        payload = json.dumps(args).encode()
+        self.process.stdin.write(_HEADER.pack(len(payload)) + payload)
+        self.process.stdin.flush()
+        header = self.process.stdout.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise EOFError(f"El worker de búsqueda terminó (código {self.process.poll()})")
+        return json.loads(self.process.stdout.read(_HEADER.unpack(header)[0]))
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=2)
+        except Exception:
+            self.process.kill()
+
+
+def _batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class SearchRun:
+    """
+    Iterador de resultados de una búsqueda, en el orden de los archivos de entrada
+
+    Tras consumirlo, timed_out/limited indican si terminó antes de tiempo.
+    Cerrarlo (o dejar de iterar) cancela los lotes aún no empezados.
+    """
+
+    def __init__(self, engine: "ContentSearchEngine", files: Iterable[Tuple[str, str]], pattern: str,
+                 flags: int, context: int, max_results: Optional[int], timeout: Optional[float]):
+        self.engine = engine
+        self.pattern = pattern
+        self.flags = flags
+        self.context = context
+        self.max_results = max_results
+        self.deadline = time.time() + timeout if timeout else None
+        self.timed_out = False
+        self.limited = False
+        self.stats = {"files": 0, "results": 0, "binary": 0, "large": 0, "unreadable": 0}
+        self._gen = self._generate(files)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Dict:
+        return next(self._gen)
+
+    def close(self):
+        self._gen.close()
+
+    def _args(self, batch: list) -> tuple:
+        return (batch, self.pattern, self.flags, self.context, self.engine.max_matches_per_file,
+                self.engine.max_file_bytes, self.deadline)
+
+    def _generate(self, files: Iterable[Tuple[str, str]]) -> Iterator[Dict]:
+        batches = _batched(files, self.engine.batch_files)
+        first = next(batches, None)
+        if first is None:
+            return
+        second = next(batches, None)
+        if second is None:
+            # Un solo lote: no compensa el viaje a los workers
+            yield from self._consume(search_batch(*self._args(first)))
+            return
+
+        batches = chain([first, second], batches)
+        inflight = deque()
+
+        def submit() -> bool:
+            batch = next(batches, None)
+            if batch is None:
+                return False
+            inflight.append(self.engine.submit(self._args(batch)))
+            return True
+
+        try:
+            for _ in range(self.engine.max_workers * 2):
+                if not submit():
+                    break
+            while inflight:
+                outcomes = inflight.popleft().result()
+                submit()
+                for result in self._consume(outcomes):
+                    yield result
+                if self.timed_out or self.limited:
+                    return
+        finally:
+            for future in inflight:
+                future.cancel()
+
+    def _consume(self, outcomes: List[tuple]) -> Iterator[Dict]:
+        for rel_path, status, result in outcomes:
+            if status == "timeout":
+                self.timed_out = True
+                return
+            self.stats["files"] += 1
+            if status in self.stats:
+                self.stats[status] += 1
+            if status != "match":
+                continue
+            if self.max_results is not None and self.stats["results"] >= self.max_results:
+                self.limited = True
+                return
+            self.stats["results"] += 1
+            yield {"path": rel_path, **result}
+        if self.deadline is not None and time.time() > self.deadline:
+            self.timed_out = True
+
+
+class ContentSearchEngine:
+    """Workers compartidos por las búsquedas en contenido"""
+
+    def __init__(self, max_workers: int = None, max_file_bytes: int = 10 * 1024 * 1024,
+                 batch_files: int = 32, max_matches_per_file: int = 10):
+        """
+        Args:
+            max_workers: Procesos worker (por defecto, uno por núcleo)
+            max_file_bytes: Archivos mayores se omiten
+            batch_files: Archivos por lote enviado a un worker
+            max_matches_per_file: Líneas con coincidencia devueltas por archivo
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_file_bytes = max_file_bytes
+        self.batch_files = batch_files
+        self.max_matches_per_file = max_matches_per_file
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._workers: List[_Worker] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        logger.info(f"ContentSearchEngine iniciado. Workers: {self.max_workers}")
+
+    def _run_batch(self, args: tuple) -> List[tuple]:
+        """Ejecuta un lote en el worker del hilo actual (o en el propio proceso si falla)"""
+        worker = getattr(self._local, "worker", None)
+        try:
+            if worker is None:
+                worker = self._local.worker = _Worker()
+                with self._lock:
+                    self._workers.append(worker)
+            return worker.run(args)
+        except (OSError, EOFError, ValueError) as e:
+            logger.warning(f"Worker de búsqueda caído, se reemplaza: {e}")
+            if worker is not None:
+                worker.close()
+                with self._lock:
+                    if worker in self._workers:
+                        self._workers.remove(worker)
+            self._local.worker = None
+            return search_batch(*args)
+
+    def submit(self, args: tuple):
+        """Encola un lote; devuelve un Future con sus resultados"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="arkaios-search")
+            return self._executor.submit(self._run_batch, args)
+
+    def search(self, files: Iterable[Tuple[str, str]], pattern: str, flags: int = re.IGNORECASE,
+               context: int = 0, max_results: int = None, timeout: float = None) -> SearchRun:
+        """
+        Busca pattern en files
+
+        Args:
+            files: Iterable de (ruta absoluta, ruta a devolver), en el orden deseado
+            context: Líneas de contexto antes y después de cada coincidencia
+            max_results: Archivos con coincidencias tras los que se para
+            timeout: Segundos máximos de búsqueda
+
+        Returns:
+            SearchRun que genera {"path", "matches", "lines": [{"line", "text", "before", "after"}]}
+
+        Raises:
+            re.error: patrón inválido
+        """
+        re.compile(pattern, flags)
+        return SearchRun(self, files, pattern, flags, context, max_results, timeout)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            workers, self._workers = self._workers, []
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        for worker in workers:
+            worker.close()
+
+
+# Singleton instance
+_search_engine_instance = None
+
+
+def get_search_engine(**kwargs) -> ContentSearchEngine:
+    """Obtiene la instancia singleton del motor de búsqueda"""
+    global _search_engine_instance
+    if _search_engine_instance is None:
+        _search_engine_instance = ContentSearchEngine(**kwargs)
+    return _search_engine_instance
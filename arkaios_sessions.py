@@ -0,0 +1,227 @@
+# arkaios_sessions.py - Almacén de sesiones para ARKAIOS
+"""
+Almacén de sesiones con backend intercambiable (memoria o SQLite en modo WAL),
+caché LRU en proceso y expiración por TTL
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger("arkaios.sessions")
+
+
+class MemorySessionBackend:
+    """Backend en memoria (un solo proceso, se pierde al reiniciar)"""
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[tuple]:
+        """Devuelve (data, expires_at) o None"""
+        with self._lock:
+            return self._data.get(token)
+
+    def set(self, token: str, data: Dict, expires_at: float):
+        with self._lock:
+            self._data[token] = (data, expires_at)
+
+    def delete(self, token: str):
+        with self._lock:
+            self._data.pop(token, None)
+
+    def purge_expired(self, now: float) -> int:
+        with self._lock:
+            expired = [tok for tok, (_, exp) in self._data.items() if exp <= now]
+            for tok in expired:
+                del self._data[tok]
+            return len(expired)
+
+
+class SQLiteSessionBackend:
+    """Backend SQLite en modo WAL, compartido entre procesos worker"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " token TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        """Una conexión por hilo"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, token: str) -> Optional[tuple]:
+        row = self._conn().execute(
+            "SELECT data, expires_at FROM sessions WHERE token = ?", (token,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, token: str, data: Dict, expires_at: float):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (token, data, expires_at) VALUES (?, ?, ?)",
+            (token, json.dumps(data, ensure_ascii=False), expires_at),
+        )
+        conn.commit()
+
+    def delete(self, token: str):
+        conn = self._conn()
+        conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
+        conn.commit()
+
+    def purge_expired(self, now: float) -> int:
+        conn = self._conn()
+        cur = conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+        conn.commit()
+        return cur.rowcount
+
+
+class SessionStore:
+    """Sesiones con caché LRU en proceso delante de un backend persistente"""
+
+    def __init__(self, backend, ttl: int = 7 * 24 * 3600, cache_size: int = 10000,
+                 cache_ttl: float = 30.0, purge_every: int = 500):
+        """
+        Args:
+            backend: MemorySessionBackend o SQLiteSessionBackend
+            ttl: Segundos de vida de una sesión
+            cache_size: Entradas máximas en la caché LRU
+            cache_ttl: Segundos que una entrada cacheada se da por válida sin
+                       consultar el backend (acota la desincronización entre workers)
+            purge_every: Cada cuántas altas se purgan sesiones expiradas
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.purge_every = purge_every
+
+        # token -> (data, expires_at, cached_at)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._sets = 0
+
+        logger.info(f"SessionStore iniciado. Backend: {type(backend).__name__}")
+
+    def _cache_put(self, token: str, data: Dict, expires_at: float, now: float):
+        with self._lock:
+            self._cache[token] = (data, expires_at, now)
+            self._cache.move_to_end(token)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def get(self, token: str) -> Optional[Dict]:
+        """Devuelve los datos de la sesión o None si no existe o expiró"""
+        if not token:
+            return None
+        now = time.time()
+
+        with self._lock:
+            entry = self._cache.get(token)
+            if entry is not None:
+                data, expires_at, cached_at = entry
+                if expires_at <= now:
+                    del self._cache[token]
+                    return None
+                if now - cached_at < self.cache_ttl:
+                    self._cache.move_to_end(token)
+                    return data
+
+        try:
+            stored = self.backend.get(token)
+        except Exception as e:
+            logger.error(f"Error leyendo sesión: {e}")
+            return None
+
+        if stored is None:
+            with self._lock:
+                self._cache.pop(token, None)
+            return None
+
+        data, expires_at = stored
+        if expires_at <= now:
+            self.delete(token)
+            return None
+
+        self._cache_put(token, data, expires_at, now)
+        return data
+
+    def set(self, token: str, data: Dict, ttl: int = None):
+        """Crea o reemplaza una sesión"""
+        now = time.time()
+        expires_at = now + (ttl or self.ttl)
+        self.backend.set(token, data, expires_at)
+        self._cache_put(token, data, expires_at, now)
+
+        self._sets += 1
+        if self._sets % self.purge_every == 0:
+            self.purge_expired()
+
+    def delete(self, token: str):
+        """Elimina una sesión"""
+        with self._lock:
+            self._cache.pop(token, None)
+        try:
+            self.backend.delete(token)
+        except Exception as e:
+            logger.error(f"Error eliminando sesión: {e}")
+
+    def purge_expired(self) -> int:
+        """Elimina las sesiones expiradas del backend"""
+        try:
+            removed = self.backend.purge_expired(time.time())
+            if removed:
+                logger.info(f"Sesiones expiradas eliminadas: {removed}")
+            return removed
+        except Exception as e:
+            logger.error(f"Error purgando sesiones: {e}")
+            return 0
+
+
+# Singleton instance
+_session_store_instance = None
+
+
+def get_session_store(backend: str = "sqlite", path: str = None, **kwargs) -> SessionStore:
+    """
+    Obtiene la instancia singleton del almacén de sesiones
+
+    Args:
+        backend: "sqlite" (persistente, multi-proceso) o "memory"
+        path: Ruta de la base SQLite
+    """
+    global _session_store_instance
+    if _session_store_instance is None:
+        if backend == "memory":
+            store_backend = MemorySessionBackend()
+        elif backend == "sqlite":
+            store_backend = SQLiteSessionBackend(path)
+        else:
+            raise ValueError(f"Backend de sesiones no soportado: {backend}")
+        _session_store_instance = SessionStore(store_backend, **kwargs)
+    return _session_store_instance
@@ -0,0 +1,140 @@
+# arkaios_tool_probe.py - Caché de detección de herramientas para ARKAIOS
+"""
+Sondea en paralelo las herramientas instaladas (node, npm, git...) y mantiene
+una instantánea en caché, refrescada en segundo plano por TTL o cuando cambia PATH
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+logger = logging.getLogger("arkaios.tool_probe")
+
+DEFAULT_TOOLS = ["node", "npm", "python", "git", "firebase"]
+
+
+class ToolProbeCache:
+    """Instantánea cacheada de CommandExecutor.check_tool_installed"""
+
+    def __init__(self, executor, tools: List[str] = None, ttl: float = 300.0,
+                 max_workers: int = 8):
+        """
+        Args:
+            executor: CommandExecutor usado para las sondas
+            tools: Herramientas a sondear
+            ttl: Segundos entre refrescos en segundo plano
+            max_workers: Sondas concurrentes
+        """
+        self.executor = executor
+        self.tools = list(tools or DEFAULT_TOOLS)
+        self.ttl = ttl
+        self.max_workers = max_workers
+
+        self._snapshot: Dict[str, Dict] = {}
+        self._updated_at = 0.0
+        self._path = None
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        logger.info(f"ToolProbeCache iniciado. Herramientas: {', '.join(self.tools)}")
+
+    def start(self):
+        """Arranca el hilo que sondea al inicio y refresca por TTL"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="arkaios-tool-probe", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def refresh(self) -> Dict[str, Dict]:
+        """Ejecuta todas las sondas en paralelo y reemplaza la instantánea"""
+        with self._refreshing:
+            path = os.environ.get("PATH", "")
+            started = time.monotonic()
+
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.tools) or 1)) as pool:
+                # Sin caché de resultados: un refresco siempre vuelve a ejecutar las sondas
+                probe = lambda tool: self.executor.check_tool_installed(tool, cache=False)
+                results = dict(zip(self.tools, pool.map(probe, self.tools)))
+
+            with self._lock:
+                self._snapshot = results
+                self._updated_at = time.time()
+                self._path = path
+
+            logger.info(f"Herramientas sondeadas en {time.monotonic() - started:.2f}s")
+            return results
+
+    def _is_stale(self) -> bool:
+        return (
+            self._path != os.environ.get("PATH", "")
+            or time.time() - self._updated_at >= self.ttl
+        )
+
+    def _run(self):
+        """Refresca por TTL; se despierta antes si se invalida la caché"""
+        while not self._stop.is_set():
+            with self._lock:
+                wait = max(0.0, self._updated_at + self.ttl - time.time())
+            self._wake.wait(wait)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            if self._is_stale() or not self._snapshot:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Error refrescando herramientas: {e}")
+                    self._stop.wait(min(self.ttl, 30.0))
+
+    def invalidate(self):
+        """Fuerza un refresco en segundo plano"""
+        with self._lock:
+            self._updated_at = 0.0
+        self._wake.set()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Devuelve la última instantánea sin ejecutar procesos
+
+        Si PATH cambió, se programa un refresco en segundo plano y se devuelve
+        la instantánea anterior.
+        """
+        if self._path is not None and self._path != os.environ.get("PATH", ""):
+            self.invalidate()
+        with self._lock:
+            return dict(self._snapshot)
+
+    def installed(self) -> Dict[str, bool]:
+        """Mapa herramienta -> instalada"""
+        return {tool: info.get("installed", False) for tool, info in self.snapshot().items()}
+
+    def is_ready(self) -> bool:
+        """True si ya existe una primera instantánea"""
+        with self._lock:
+            return self._updated_at > 0 or bool(self._snapshot)
+
+    def age(self) -> float:
+        """Segundos desde el último sondeo"""
+        with self._lock:
+            return time.time() - self._updated_at if self._updated_at else -1.0
+
+
+# Singleton instance
+_tool_probe_instance = None
+
+
+def get_tool_probe(executor=None, **kwargs) -> ToolProbeCache:
+    """Obtiene la instancia singleton de la caché de herramientas"""
+    global _tool_probe_instance
+    if _tool_probe_instance is None:
+        _tool_probe_instance = ToolProbeCache(executor, **kwargs)
+    return _tool_probe_instance
@@ -0,0 +1,434 @@
+# arkaios_trigram_index.py - Índice de trigramas para búsqueda en contenido de ARKAIOS
+"""
+Índice invertido trigrama -> archivos sobre los archivos de texto del
+workspace. Una búsqueda por regex extrae los literales obligatorios del
+patrón, intersecta las listas de sus trigramas y solo abre los archivos
+candidatos, que se verifican después con re. Se actualiza de forma
+incremental siguiendo al WorkspaceIndex y persiste en SQLite
+"""
+
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from array import array
+from pathlib import Path, PurePath
+from typing import Dict, List, Optional, Set
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+logger = logging.getLogger("arkaios.trigram_index")
+
+# Caracteres no ASCII que re.IGNORECASE empareja con letras ASCII
+# (İ, ı, K de Kelvin y s larga): se indexan como su letra ASCII
+_ASCII_FOLDS = [
+    ("İ".encode(), b"i"),
+    ("ı".encode(), b"i"),
+    ("K".encode(), b"k"),
+    ("ſ".encode(), b"s"),
+]
+
+# Alternativas máximas que se combinan al expandir grupos con "|"
+MAX_ALTERNATIVES = 32
+
+# Tipos de archivo indexado
+TEXT, BINARY, LARGE = 0, 1, 2
+
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+if hasattr(sre_parse, "POSSESSIVE_REPEAT"):
+    _REPEATS.add(sre_parse.POSSESSIVE_REPEAT)
+
+
+def normalize(data: bytes) -> bytes:
+    """Contenido tal como se indexa: saltos de línea universales y minúsculas ASCII"""
+    data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    for folded, ascii_letter in _ASCII_FOLDS:
+        if folded in data:
+            data = data.replace(folded, ascii_letter)
+    return data.lower()
+
+
+_TRIGRAM = re.compile(b"...", re.DOTALL)
+
+
+def trigrams(data: bytes) -> Set[bytes]:
+    """Trigramas distintos de data (tres pasadas de findall en C, una por desfase)"""
+    grams = set()
+    for offset in range(3):
+        grams.update(_TRIGRAM.findall(data, offset))
+    return grams
+
+
+def _and(left: List[Set[bytes]], right: List[Set[bytes]]) -> List[Set[bytes]]:
+    combined = [a | b for a in left for b in right]
+    # Demasiadas combinaciones: descartar la parte derecha solo amplía los candidatos
+    return combined if len(combined) <= MAX_ALTERNATIVES else left
+
+
+def _plan(parsed) -> List[Set[bytes]]:
+    """Alternativas (OR) de conjuntos de trigramas obligatorios (AND)"""
+    alternatives: List[Set[bytes]] = [set()]
+    run: List[str] = []
+
+    def flush():
+        if len(run) >= 3:
+            required = trigrams("".join(run).encode())
+            for alternative in alternatives:
+                alternative |= required
+        run.clear()
+
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            char = chr(av)
+            if char.isascii():
+                run.append(char.lower())
+                continue
+            flush()
+            continue
+
+        flush()
+        sub = None
+        if op is sre_parse.SUBPATTERN:
+            sub = _plan(av[-1])
+        elif op in _REPEATS:
+            low, _, item = av
+            if low >= 1:
+                sub = _plan(item)
+        elif op is sre_parse.BRANCH:
+            sub = []
+            for item in av[1]:
+                sub.extend(_plan(item))
+            if len(sub) > MAX_ALTERNATIVES or any(not alternative for alternative in sub):
+                sub = None
+        elif op is getattr(sre_parse, "ATOMIC_GROUP", None):
+            sub = _plan(av)
+        if sub:
+            alternatives = _and(alternatives, sub)
+    flush()
+    return alternatives
+
+
+def regex_trigrams(pattern: str) -> Optional[List[Set[bytes]]]:
+    """
+    Trigramas que todo texto que case con pattern debe contener
+
+    Returns:
+        Lista de alternativas (basta con cumplir una), o None si el patrón
+        no tiene literales suficientes para acotar la búsqueda
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return None
+    plan = _plan(parsed)
+    if any(not alternative for alternative in plan):
+        return None
+    return plan
+
+
+class TrigramIndex:
+    """Índice de trigramas de los archivos de texto de un WorkspaceIndex"""
+
+    def __init__(self, workspace_index, path: str = None, extensions: Set[str] = None,
+                 max_file_bytes: int = 1024 * 1024, sync_interval: float = 0.5,
+                 batch_size: int = 64):
+        """
+        Args:
+            workspace_index: WorkspaceIndex del que se toman los archivos y sus cambios
+            path: Base SQLite con los trigramas de cada archivo (None = solo memoria)
+            extensions: Extensiones indexadas (None = todas)
+            max_file_bytes: Archivos mayores no se indexan (siempre son candidatos)
+            sync_interval: Segundos entre comprobaciones de cambios
+            batch_size: Archivos indexados por transacción
+        """
+        self.workspace_index = workspace_index
+        self.path = Path(path) if path else None
+        self.extensions = extensions
+        self.max_file_bytes = max_file_bytes
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+
+        # ruta relativa -> (size, mtime_ns, tipo) de lo indexado
+        self._meta: Dict[str, tuple] = {}
+        self._ids: Dict[str, int] = {}
+        self._paths: Dict[int, str] = {}
+        self._postings: Dict[bytes, array] = {}
+        self._dead = 0
+        self._next_id = 0
+        # Rutas nuevas o modificadas aún sin indexar: siempre son candidatas
+        self._pending: Set[str] = set()
+        # Archivos mayores que max_file_bytes: siempre son candidatos
+        self._large: Set[str] = set()
+        self._removed: Set[str] = set()
+        self._synced_version = None
+
+        self._lock = threading.RLock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+        logger.info(f"TrigramIndex iniciado. SQLite: {self.path or 'desactivado'}")
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+
+    # ===== Postings (requieren lock) =====
+
+    def _add_postings(self, rel: str, grams) -> None:
+        file_id = self._next_id
+        self._next_id += 1
+        self._ids[rel] = file_id
+        self._paths[file_id] = rel
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array("I")
+            postings.append(file_id)
+
+    def _forget(self, rel: str) -> None:
+        """Da de baja el archivo; sus ids quedan en las listas hasta compactar"""
+        file_id = self._ids.pop(rel, None)
+        if file_id is not None:
+            del self._paths[file_id]
+            self._dead += 1
+        self._meta.pop(rel, None)
+        self._large.discard(rel)
+
+    # ===== Persistencia =====
+
+    def _open_db(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " kind INTEGER NOT NULL,"
+            " trigrams BLOB)"
+        )
+        conn.commit()
+        self._conn = conn
+
+    def _load(self):
+        """Reconstruye las listas en memoria desde SQLite"""
+        started = time.monotonic()
+        meta, rows = {}, []
+        for rel, size, mtime_ns, kind, blob in self._conn.execute(
+                "SELECT path, size, mtime_ns, kind, trigrams FROM files"):
+            meta[rel] = (size, mtime_ns, kind)
+            if kind == TEXT and blob:
+                rows.append((rel, blob))
+        with self._lock:
+            self._ids.clear()
+            self._paths.clear()
+            self._postings.clear()
+            self._dead = 0
+            self._meta = meta
+            self._large = {rel for rel, (_, _, kind) in meta.items() if kind == LARGE}
+            for rel, blob in rows:
+                self._add_postings(rel, (blob[i:i + 3] for i in range(0, len(blob), 3)))
+        logger.info(f"Índice de trigramas cargado: {len(meta)} archivos "
+                    f"en {time.monotonic() - started:.2f}s")
+
+    def _compact(self):
+        """Elimina de las listas los ids de archivos dados de baja"""
+        if self._conn is None:
+            # Sin SQLite no hay de dónde releer: se filtran las listas en memoria
+            with self._lock:
+                live = self._paths
+                for gram in list(self._postings):
+                    kept = array("I", (i for i in self._postings[gram] if i in live))
+                    if kept:
+                        self._postings[gram] = kept
+                    else:
+                        del self._postings[gram]
+                self._dead = 0
+            return
+        self._conn.commit()
+        self._load()
+
+    # ===== Sincronización =====
+
+    def _indexable(self, rel: str) -> bool:
+        return self.extensions is None or PurePath(rel).suffix in self.extensions
+
+    def _sync(self):
+        """Compara con el WorkspaceIndex y marca altas, cambios y bajas (requiere lock)"""
+        version = self.workspace_index.version
+        if version == self._synced_version:
+            return
+        self._synced_version = version
+
+        current = {rel: (record[2], record[3]) for rel, record in self.workspace_index.files()
+                   if self._indexable(rel)}
+        for rel in list(self._meta):
+            if rel not in current:
+                self._forget(rel)
+                self._removed.add(rel)
+        self._pending = {rel for rel, state in current.items()
+                         if self._meta.get(rel, (None, None))[:2] != state}
+
+    def _read(self, rel: str) -> tuple:
+        """(size, mtime_ns, tipo, trigramas) leyendo el archivo"""
+        path = self.workspace_index.root / rel
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size > self.max_file_bytes:
+                return stat.st_size, stat.st_mtime_ns, LARGE, None
+            data = f.read()
+        try:
+            data.decode("utf-8")
+        except UnicodeDecodeError:
+            # La búsqueda en contenido lee en UTF-8: estos archivos nunca casan
+            return stat.st_size, stat.st_mtime_ns, BINARY, None
+        return stat.st_size, stat.st_mtime_ns, TEXT, trigrams(normalize(data))
+
+    def _index_pending(self) -> int:
+        """Indexa un lote de archivos pendientes; devuelve cuántos"""
+        with self._lock:
+            self._sync()
+            batch = sorted(self._pending)[:self.batch_size]
+            removed, self._removed = self._removed, set()
+
+        rows = []
+        for rel in batch:
+            try:
+                size, mtime_ns, kind, grams = self._read(rel)
+            except OSError:
+                continue  # Borrado entre medias: la próxima sincronización lo da de baja
+            rows.append((rel, size, mtime_ns, kind, grams))
+
+        with self._lock:
+            for rel, size, mtime_ns, kind, grams in rows:
+                self._forget(rel)
+                self._meta[rel] = (size, mtime_ns, kind)
+                if kind == TEXT:
+                    self._add_postings(rel, grams)
+                elif kind == LARGE:
+                    self._large.add(rel)
+            # Los que fallaron al leerse se reintentan en la próxima sincronización
+            self._pending.difference_update(batch)
+            compact = self._dead > max(10000, len(self._paths))
+
+        if self._conn is not None and (rows or removed):
+            try:
+                self._conn.executemany("DELETE FROM files WHERE path = ?", [(rel,) for rel in removed])
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO files (path, size, mtime_ns, kind, trigrams) VALUES (?, ?, ?, ?, ?)",
+                    [(rel, size, mtime_ns, kind, b"".join(sorted(grams)) if grams else None)
+                     for rel, size, mtime_ns, kind, grams in rows],
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo persistir el índice de trigramas: {e}")
+        if compact:
+            self._compact()
+        return len(batch)
+
+    # ===== Hilo =====
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="arkaios-trigram-index", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        try:
+            if self.path is not None:
+                self._open_db()
+                self._load()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Índice de trigramas sin persistencia: {e}")
+            self._conn = None
+
+        self.workspace_index.wait_ready()
+        while not self._stop.is_set():
+            try:
+                indexed = self._index_pending()
+            except Exception as e:
+                logger.error(f"Error actualizando el índice de trigramas: {e}")
+                indexed = 0
+            if not indexed:
+                if not self._ready.is_set():
+                    self._ready.set()
+                    logger.info(f"Índice de trigramas al día: {len(self._paths)} archivos de texto")
+                self._stop.wait(self.sync_interval)
+
+        if self._conn is not None:
+            self._conn.close()
+
+    # ===== Consultas =====
+
+    def candidates(self, pattern: str) -> Optional[Set[str]]:
+        """
+        Archivos que pueden casar con pattern (búsqueda sin distinguir mayúsculas)
+
+        Incluye los archivos pendientes de indexar y los que superan
+        max_file_bytes. None si el índice no está listo o el patrón no
+        permite acotar: hay que recorrer todo.
+        """
+        if not self.is_ready():
+            return None
+        plan = regex_trigrams(pattern)
+        if plan is None:
+            return None
+
+        with self._lock:
+            self._sync()
+            found: Set[int] = set()
+            for alternative in plan:
+                lists = sorted((self._postings.get(gram, ()) for gram in alternative), key=len)
+                if not lists[0]:
+                    continue
+                ids = set(lists[0])
+                for postings in lists[1:]:
+                    ids.intersection_update(postings)
+                    if not ids:
+                        break
+                found |= ids
+
+            paths = {self._paths[i] for i in found if i in self._paths}
+            paths |= self._pending
+            paths |= self._large
+        return paths
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "ready": self.is_ready(),
+                "files": len(self._meta),
+                "text_files": len(self._paths),
+                "pending": len(self._pending),
+                "large_files": len(self._large),
+                "trigrams": len(self._postings),
+                "dead_ids": self._dead,
+            }
+
+
+# Singleton instance
+_trigram_index_instance = None
+
+
+def get_trigram_index(workspace_index=None, **kwargs) -> TrigramIndex:
+    """Obtiene la instancia singleton del índice de trigramas"""
+    global _trigram_index_instance
+    if _trigram_index_instance is None:
+        _trigram_index_instance = TrigramIndex(workspace_index, **kwargs)
+    return _trigram_index_instance
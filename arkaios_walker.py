@@ -0,0 +1,318 @@
+# arkaios_walker.py - Recorrido del workspace para ARKAIOS
+"""
+Motor de recorrido compartido por el file manager, el índice del workspace y
+la búsqueda: os.scandir ordenado que poda los directorios ignorados antes de
+entrar en ellos, reutiliza el tipo (d_type) y el stat cacheado de cada
+DirEntry y aplica las reglas de .gitignore/.arkaiosignore compiladas a regex
+"""
+
+import os
+import re
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("arkaios.walker")
+
+# Directorios que nunca se recorren en listados
+SKIP_DIRS = {"node_modules", ".venv", "venv", "__pycache__"}
+
+# Metadatos de control de versiones: se listan, pero los recorridos recursivos,
+# la búsqueda y el índice no entran en ellos (prune_vcs)
+VCS_DIRS = {".git", ".hg", ".svn"}
+
+# Archivos de reglas, en orden de prioridad creciente dentro de un directorio
+IGNORE_FILES = (".gitignore", ".arkaiosignore")
+
+
+def sort_key(name: str) -> tuple:
+    """Orden de recorrido: alfabético sin distinguir mayúsculas, estable"""
+    return (name.lower(), name)
+
+
+def _translate(pattern: str) -> str:
+    """Traduce un patrón de gitignore (sin anclar) a regex"""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i) and (i == 0 or pattern[i - 1] == "/"):
+                if i + 2 == n:
+                    out.append(".*")  # "dir/**": todo lo que contiene
+                    i += 2
+                    continue
+                if pattern[i + 2] == "/":
+                    out.append("(?:.*/)?")  # "**/": cero o más directorios
+                    i += 3
+                    continue
+            while i < n and pattern[i] == "*":
+                i += 1
+            out.append("[^/]*")
+            continue
+        if c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2 if pattern[i + 1:i + 2] in ("!", "^", "]") else i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body[:1] in ("!", "^"):
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """Reglas de un archivo de ignorados, relativas a su directorio"""
+
+    def __init__(self, lines: List[str]):
+        # (regex, negada, solo directorios) en orden de aparición
+        self.rules: List[Tuple["re.Pattern", bool, bool]] = []
+        for raw in lines:
+            line = raw.rstrip("\n").rstrip("\r")
+            if not line or line.startswith("#"):
+                continue
+            # Los espacios finales se ignoran salvo escapados
+            stripped = line.rstrip(" ")
+            if stripped.endswith("\\") and len(stripped) < len(line):
+                stripped += " "
+            line = stripped
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith("\\!") or line.startswith("\\#"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            if "/" in line:
+                regex = "^" + _translate(line.lstrip("/")) + "$"
+            else:
+                regex = "^(?:.*/)?" + _translate(line) + "$"
+            try:
+                self.rules.append((re.compile(regex, re.DOTALL), negate, dir_only))
+            except re.error:
+                logger.warning(f"Regla de ignorados inválida: {raw.strip()}")
+
+        # Prefiltro: una sola regex con todas las reglas (el caso común es que ninguna case)
+        any_rules = [rule.pattern for rule, _, dir_only in self.rules if not dir_only]
+        dir_rules = [rule.pattern for rule, _, _ in self.rules]
+        self._any = re.compile("|".join(f"(?:{p})" for p in any_rules), re.DOTALL) if any_rules else None
+        self._dir = re.compile("|".join(f"(?:{p})" for p in dir_rules), re.DOTALL) if dir_rules else None
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    def match(self, rel: str, is_dir: bool) -> Optional[bool]:
+        """True = ignorado, False = re-incluido con "!", None = ninguna regla aplica"""
+        prefilter = self._dir if is_dir else self._any
+        if prefilter is None or prefilter.match(rel) is None:
+            return None
+        for regex, negate, dir_only in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel):
+                return not negate
+        return None
+
+
+# Cadena de reglas activas: ((ruta relativa del directorio base, IgnoreRules), ...)
+Chain = Tuple[Tuple[str, IgnoreRules], ...]
+
+
+class Walker:
+    """Recorrido ordenado y podado de un árbol de directorios"""
+
+    def __init__(self, root: str, respect_ignore: bool = True, skip_dirs: set = None,
+                 prune_vcs: bool = True):
+        """
+        Args:
+            root: Raíz (las reglas de ignorados se buscan desde aquí hacia abajo)
+            respect_ignore: Aplicar .gitignore/.arkaiosignore
+            skip_dirs: Nombres de directorio que nunca se recorren
+            prune_vcs: No entrar en VCS_DIRS (siguen apareciendo en los listados)
+        """
+        self.root = os.path.abspath(root)
+        self.respect_ignore = respect_ignore
+        self.skip_dirs = SKIP_DIRS if skip_dirs is None else skip_dirs
+        self.prune_vcs = prune_vcs
+        # ruta del archivo de reglas -> ((mtime_ns, size), IgnoreRules)
+        self._rules_cache: Dict[str, tuple] = {}
+
+    def prunes(self, name: str) -> bool:
+        """Si un directorio con este nombre se lista pero no se recorre"""
+        return self.prune_vcs and name in VCS_DIRS
+
+    def _rel(self, path: str) -> str:
+        rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+        return "" if rel == "." else rel
+
+    def _load_rules(self, path: str, stat: os.stat_result) -> IgnoreRules:
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._rules_cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                rules = IgnoreRules(f.readlines())
+        except OSError:
+            rules = IgnoreRules([])
+        if len(self._rules_cache) >= 4096:
+            self._rules_cache.clear()
+        self._rules_cache[path] = (key, rules)
+        return rules
+
+    def _extend(self, chain: Chain, dir_path: str, ignore_entries: List[os.DirEntry]) -> Chain:
+        """Añade a la cadena las reglas de los archivos de ignorados del directorio"""
+        if not ignore_entries:
+            return chain
+        base = self._rel(dir_path)
+        for entry in sorted(ignore_entries, key=lambda e: IGNORE_FILES.index(e.name)):
+            try:
+                rules = self._load_rules(entry.path, entry.stat())
+            except OSError:
+                continue
+            if rules:
+                chain = chain + ((base, rules),)
+        return chain
+
+    @staticmethod
+    def ignored(chain: Chain, rel: str, is_dir: bool) -> bool:
+        """Si rel (relativa a la raíz) queda ignorada por la cadena; gana la regla más profunda"""
+        for base, rules in reversed(chain):
+            if base:
+                if not rel.startswith(base + "/"):
+                    continue
+                result = rules.match(rel[len(base) + 1:], is_dir)
+            else:
+                result = rules.match(rel, is_dir)
+            if result is not None:
+                return result
+        return False
+
+    def chain_for(self, dir_path: str) -> Chain:
+        """Cadena de reglas que aplica dentro de dir_path (reglas de la raíz y ancestros)"""
+        chain: Chain = ()
+        if not self.respect_ignore:
+            return chain
+        rel = self._rel(dir_path)
+        if rel.startswith(".."):
+            return chain
+        current = self.root
+        for part in [""] + (rel.split("/") if rel else []):
+            if part:
+                current = os.path.join(current, part)
+            found = []
+            for name in IGNORE_FILES:
+                path = os.path.join(current, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((name, path, stat))
+            for name, path, stat in found:
+                rules = self._load_rules(path, stat)
+                if rules:
+                    chain = chain + ((self._rel(current), rules),)
+        return chain
+
+    def is_ignored(self, path: str, is_dir: bool) -> bool:
+        """
+        Si path (absoluta) se omite: directorio podado, dentro de uno de
+        control de versiones, o ignorada ella o un ancestro
+        """
+        rel = self._rel(path)
+        if not rel or rel.startswith(".."):
+            return False
+        parts = rel.split("/")
+        if any(part in self.skip_dirs or self.prunes(part) for part in parts[:-1]):
+            return True
+        if is_dir and parts[-1] in self.skip_dirs:
+            return True
+        if not self.respect_ignore:
+            return False
+        chain = self.chain_for(os.path.dirname(path))
+        for depth in range(1, len(parts)):
+            if self.ignored(chain, "/".join(parts[:depth]), True):
+                return True
+        return self.ignored(chain, rel, is_dir)
+
+    def scan(self, dir_path: str, chain: Chain = None) -> Tuple[List[tuple], Chain]:
+        """
+        Lista un directorio sin entrar en nada
+
+        Returns:
+            ([(DirEntry, is_dir, is_symlink)] ordenadas y filtradas, cadena
+            de reglas para sus subdirectorios)
+        """
+        if chain is None:
+            chain = self.chain_for(dir_path)
+        try:
+            with os.scandir(dir_path) as it:
+                raw = list(it)
+        except OSError as e:
+            logger.warning(f"Error accediendo a {dir_path}: {e}")
+            return [], chain
+
+        if self.respect_ignore:
+            chain = self._extend(chain, dir_path, [e for e in raw if e.name in IGNORE_FILES])
+        base = self._rel(dir_path)
+        prefix = base + "/" if base else ""
+
+        entries = []
+        for entry in raw:
+            try:
+                # d_type de readdir: sin stat salvo en enlaces simbólicos
+                is_dir = entry.is_dir()
+                is_link = entry.is_symlink()
+            except OSError:
+                continue
+            if is_dir and entry.name in self.skip_dirs:
+                continue
+            if chain and self.ignored(chain, prefix + entry.name, is_dir):
+                continue
+            entries.append((entry, is_dir, is_link))
+        entries.sort(key=lambda item: sort_key(item[0].name))
+        return entries, chain
+
+    def walk(self, path: str, recursive: bool, include_hidden: bool,
+             cursor_parts: tuple = (), chain: Chain = None) -> Iterator[Tuple[os.DirEntry, bool]]:
+        """
+        Recorrido en preorden con entradas ordenadas por nombre
+
+        Con cursor_parts (ruta relativa del último elemento entregado) se
+        reanuda justo después de él, saltando ramas anteriores sin listarlas.
+
+        Yields:
+            (os.DirEntry, is_dir)
+        """
+        entries, chain = self.scan(path, chain)
+        cursor_key = sort_key(cursor_parts[0]) if cursor_parts else None
+
+        for entry, is_dir, is_link in entries:
+            if not include_hidden and entry.name.startswith("."):
+                continue
+            descend = recursive and is_dir and not is_link and not self.prunes(entry.name)
+
+            if cursor_key is not None:
+                key = sort_key(entry.name)
+                if key < cursor_key:
+                    continue
+                if key == cursor_key:
+                    # Ya entregado: continuar dentro de él si procede
+                    if descend:
+                        yield from self.walk(entry.path, recursive, include_hidden, cursor_parts[1:], chain)
+                    continue
+
+            yield entry, is_dir
+            if descend:
+                yield from self.walk(entry.path, recursive, include_hidden, chain=chain)
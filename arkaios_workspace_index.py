@@ -0,0 +1,609 @@
+# arkaios_workspace_index.py - Índice vivo de metadatos del workspace para ARKAIOS
+"""
+Mantiene en memoria (y persistido en disco) el árbol del workspace con tipo,
+tamaño y mtime de cada entrada. Se construye una vez y se mantiene al día con
+inotify (Linux) o, si no está disponible, con un sondeo periódico del mtime
+de los directorios (solo se releen los que cambiaron). Los
+listados, árboles y búsquedas por nombre se sirven desde aquí sin tocar disco.
+Lo podado por el Walker (SKIP_DIRS, .gitignore/.arkaiosignore) no se indexa;
+de .git/.hg/.svn solo se guarda la entrada, no su contenido
+"""
+
+import os
+import json
+import time
+import errno
+import select
+import struct
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from arkaios_walker import IGNORE_FILES, Walker, sort_key
+
+logger = logging.getLogger("arkaios.workspace_index")
+
+try:
+    import ctypes
+    import ctypes.util
+
+    _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    _libc.inotify_init1
+    _libc.inotify_add_watch
+except (ImportError, OSError, AttributeError):  # Windows, macOS
+    _libc = None
+
+# Máscaras de inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+
+_EVENT = struct.Struct("iIII")
+
+# Registro de una entrada: (is_dir, is_symlink, size, mtime_ns)
+Record = Tuple[bool, bool, int, int]
+
+
+class _Inotify:
+    """Envoltorio mínimo de inotify sobre ctypes"""
+
+    def __init__(self):
+        self.fd = _libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+
+    def add_watch(self, path: str) -> int:
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch {path}")
+        return wd
+
+    def read_events(self, timeout: float) -> Optional[List[tuple]]:
+        """Eventos pendientes [(wd, mask, name)] o None si no hubo en timeout"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return None
+        try:
+            data = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class WorkspaceIndex:
+    """Árbol de metadatos del workspace mantenido al día en segundo plano"""
+
+    def __init__(self, workspace_root: str, path: str = None, poll_interval: float = 5.0,
+                 save_interval: float = 30.0, use_inotify: bool = True,
+                 respect_ignore: bool = True, full_scan_interval: float = 300.0,
+                 prune_vcs: bool = True):
+        """
+        Args:
+            workspace_root: Raíz indexada
+            path: Archivo JSON de persistencia (None = solo memoria)
+            poll_interval: Segundos entre sondeos si no hay inotify
+            full_scan_interval: Segundos entre recorridos completos en modo
+                                sondeo (recogen archivos reescritos en su
+                                sitio, que no cambian el mtime del directorio)
+            save_interval: Segundos mínimos entre guardados del índice
+            use_inotify: False fuerza el sondeo
+            respect_ignore: Excluir lo ignorado por .gitignore/.arkaiosignore
+            prune_vcs: No indexar el contenido de .git/.hg/.svn
+        """
+        self.root = Path(workspace_root).resolve()
+        self.path = Path(path) if path else None
+        self.poll_interval = poll_interval
+        self.full_scan_interval = full_scan_interval
+        self.save_interval = save_interval
+        self.use_inotify = use_inotify and _libc is not None
+        self.walker = Walker(str(self.root), respect_ignore=respect_ignore, prune_vcs=prune_vcs)
+
+        # ruta relativa ("" = raíz, separador "/") -> Record
+        self._entries: Dict[str, Record] = {}
+        # directorio relativo -> nombres de sus hijos
+        self._children: Dict[str, set] = {}
+        # Directorios nuevos recorriéndose fuera del lock -> rutas refrescadas entretanto
+        self._scanning: Dict[str, List[str]] = {}
+        self._lock = threading.RLock()
+        self._version = 0
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+        self._inotify: Optional[_Inotify] = None
+        self._watches: Dict[int, str] = {}
+        self._watches_exhausted = False
+        # Cambió un archivo de reglas: lo ignorado se recalcula con un rebuild
+        self._rules_changed = False
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.mode = "idle"
+
+        logger.info(f"WorkspaceIndex iniciado. Raíz: {self.root}")
+
+    # ===== Estado =====
+
+    @property
+    def version(self) -> int:
+        """Contador que cambia con cada modificación del índice"""
+        return self._version
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def relative(self, path: Path) -> Optional[str]:
+        """Ruta relativa del índice para path, o None si está fuera de la raíz"""
+        try:
+            rel = Path(path).resolve().relative_to(self.root).as_posix()
+        except ValueError:
+            return None
+        return "" if rel == "." else rel
+
+    def _abs(self, rel: str) -> str:
+        return os.path.join(str(self.root), rel) if rel else str(self.root)
+
+    # ===== Consultas =====
+
+    def has_dir(self, rel: str) -> bool:
+        """True si rel es un directorio con su contenido indexado"""
+        with self._lock:
+            return rel in self._children
+
+    def files(self) -> List[Tuple[str, Record]]:
+        """Instantánea de todos los archivos (no directorios) indexados"""
+        with self._lock:
+            return [(rel, record) for rel, record in self._entries.items() if not record[0]]
+
+    def get(self, rel: str) -> Optional[Record]:
+        with self._lock:
+            return self._entries.get(rel)
+
+    def children(self, rel: str) -> Optional[List[Tuple[str, Record]]]:
+        """Hijos (nombre, Record) ordenados, o None si rel no es un directorio indexado"""
+        with self._lock:
+            names = self._children.get(rel)
+            if names is None:
+                return None
+            prefix = rel + "/" if rel else ""
+            items = [(name, self._entries[prefix + name]) for name in names]
+        items.sort(key=lambda item: sort_key(item[0]))
+        return items
+
+    def walk(self, rel: str, recursive: bool, include_hidden: bool,
+             cursor_parts: tuple = ()) -> Iterator[Tuple[str, str, Record]]:
+        """
+        Recorrido en preorden con el mismo orden y la misma reanudación por
+        cursor que Walker.walk
+
+        Yields:
+            (ruta relativa, nombre, Record)
+        """
+        items = self.children(rel)
+        if items is None:
+            return
+        prefix = rel + "/" if rel else ""
+        cursor_key = sort_key(cursor_parts[0]) if cursor_parts else None
+
+        for name, record in items:
+            if not include_hidden and name.startswith("."):
+                continue
+            child = prefix + name
+            descend = recursive and record[0] and not record[1]
+
+            if cursor_key is not None:
+                key = sort_key(name)
+                if key < cursor_key:
+                    continue
+                if key == cursor_key:
+                    if descend:
+                        yield from self.walk(child, recursive, include_hidden, cursor_parts[1:])
+                    continue
+
+            yield child, name, record
+            if descend:
+                yield from self.walk(child, recursive, include_hidden)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "ready": self.is_ready(),
+                "mode": self.mode,
+                "entries": len(self._entries),
+                "directories": len(self._children),
+                "watches": len(self._watches),
+                "version": self._version,
+            }
+
+    # ===== Construcción =====
+
+    def _stat_record(self, path: str) -> Optional[Record]:
+        try:
+            is_link = os.path.islink(path)
+            st = os.stat(path)
+        except OSError:
+            return None  # Desaparecido o enlace roto
+        is_dir = (st.st_mode & 0o170000) == 0o040000
+        return (is_dir, is_link, 0 if is_dir else st.st_size, st.st_mtime_ns)
+
+    def _scan(self, rel: str, entries: Dict[str, Record], children: Dict[str, set], chain=None):
+        """Recorre rel (un directorio real) y rellena entries/children"""
+        names = set()
+        children[rel] = names
+        prefix = rel + "/" if rel else ""
+        self._watch(rel)
+        items, chain = self.walker.scan(self._abs(rel), chain)
+        subdirs = []
+        for entry, is_dir, is_link in items:
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries[prefix + entry.name] = (is_dir, is_link, 0 if is_dir else st.st_size, st.st_mtime_ns)
+            names.add(entry.name)
+            if is_dir and not is_link and not self.walker.prunes(entry.name):
+                subdirs.append(prefix + entry.name)
+        for sub in subdirs:
+            self._scan(sub, entries, children, chain)
+
+    def rebuild(self):
+        """Recorre el workspace completo y sustituye el índice"""
+        started = time.monotonic()
+        record = self._stat_record(str(self.root))
+        entries: Dict[str, Record] = {"": record} if record else {}
+        children: Dict[str, set] = {}
+        if record:
+            self._scan("", entries, children)
+        with self._lock:
+            changed = entries != self._entries
+            if changed:
+                self._entries = entries
+                self._children = children
+                self._changed()
+        if changed or not self.is_ready():
+            logger.info(f"Índice del workspace construido: {len(entries)} entradas "
+                        f"en {time.monotonic() - started:.2f}s")
+
+    def _changed(self):
+        """Marca una modificación (requiere lock)"""
+        self._version += 1
+        self._dirty = True
+
+    def _remove(self, rel: str):
+        """Elimina rel y su subárbol (requiere lock)"""
+        if self._entries.pop(rel, None) is None:
+            return
+        parent, _, name = rel.rpartition("/")
+        self._children.get(parent, set()).discard(name)
+        names = self._children.pop(rel, None)
+        if names:
+            for child in list(names):
+                self._remove(f"{rel}/{child}")
+        self._changed()
+
+    def refresh(self, rel: str):
+        """
+        Vuelve a leer una ruta (y su subárbol si es un directorio nuevo)
+
+        Lo llaman el watcher y el file manager tras sus propias escrituras,
+        para que el índice refleje el cambio sin esperar al evento. El
+        subárbol de un directorio nuevo se recorre sin el lock y se publica
+        de una vez al terminar.
+        """
+        if rel is None:
+            return
+        parent, _, name = rel.rpartition("/")
+        if name in IGNORE_FILES:
+            self._rules_changed = True
+        record = self._stat_record(self._abs(rel)) if rel else self._stat_record(str(self.root))
+        if record is not None and rel and self.walker.is_ignored(self._abs(rel), record[0]):
+            record = None  # Ignorado: fuera del índice
+
+        with self._lock:
+            old = self._entries.get(rel)
+            if record is None:
+                self._remove(rel)
+                return
+            if rel and parent not in self._children:
+                scanning = self._scanning_ancestor(parent)
+                if scanning is not None:
+                    # El recorrido en curso la recoge o la repasa al publicar
+                    self._scanning[scanning].append(rel)
+                    return
+                missing_parent = True
+            else:
+                missing_parent = False
+                if old == record:
+                    return
+                was_tree = old is not None and old[0] and not old[1] and not self.walker.prunes(name)
+                is_tree = record[0] and not record[1] and not self.walker.prunes(name)
+                if was_tree and not is_tree:
+                    self._remove(rel)
+                self._entries[rel] = record
+                if rel:
+                    self._children[parent].add(name)
+                self._changed()
+                new_tree = is_tree and not was_tree and rel not in self._scanning
+                if new_tree:
+                    self._scanning[rel] = []
+
+        if missing_parent:
+            # Padre aún desconocido (p. ej. mkdir -p): indexarlo primero
+            self.refresh(parent)
+            return
+        if new_tree:
+            self._scan_new_dir(rel, record)
+
+    def _scanning_ancestor(self, rel: str) -> Optional[str]:
+        """rel o el ancestro suyo que se está recorriendo, o None (requiere lock)"""
+        while True:
+            if rel in self._scanning:
+                return rel
+            if not rel:
+                return None
+            rel = rel.rpartition("/")[0]
+
+    def _scan_new_dir(self, rel: str, record: Record):
+        """Recorre un directorio recién aparecido fuera del lock y publica el resultado"""
+        entries, children = {}, {}
+        try:
+            self._scan(rel, entries, children)
+        finally:
+            with self._lock:
+                deferred = self._scanning.pop(rel, [])
+                # Si mientras tanto desapareció o cambió de tipo, el recorrido ya no vale
+                current = self._entries.get(rel)
+                if current is not None and current[:2] == record[:2]:
+                    self._entries.update(entries)
+                    self._children.update(children)
+                    self._changed()
+        for path in deferred:
+            self.refresh(path)
+
+    def _rescan_dir(self, rel: str):
+        """Relee los hijos directos de un directorio indexado y refresca los que cambiaron"""
+        items, _ = self.walker.scan(self._abs(rel))
+        prefix = rel + "/" if rel else ""
+        fresh: Dict[str, Record] = {}
+        for entry, is_dir, is_link in items:
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            fresh[entry.name] = (is_dir, is_link, 0 if is_dir else st.st_size, st.st_mtime_ns)
+        with self._lock:
+            known = {name: self._entries.get(prefix + name) for name in self._children.get(rel, ())}
+        for name in sorted(known.keys() | fresh.keys()):
+            if known.get(name) != fresh.get(name):
+                self.refresh(prefix + name)
+        # El mtime del propio directorio al final: si algo falla, el siguiente sondeo lo repite
+        self.refresh(rel)
+
+    def poll(self):
+        """Sondeo incremental: un stat por directorio indexado y relectura de los que cambiaron"""
+        with self._lock:
+            dirs = [(rel, self._entries[rel][3]) for rel in self._children if rel in self._entries]
+        changed = []
+        for rel, mtime_ns in dirs:
+            try:
+                current = os.stat(self._abs(rel)).st_mtime_ns
+            except OSError:
+                continue  # Desaparecido: lo retira la relectura del padre
+            if current != mtime_ns:
+                changed.append(rel)
+        # Padres antes que hijos: un directorio retirado por su padre ya no se relee
+        changed.sort(key=lambda rel: (rel.count("/") if rel else -1, rel))
+        for rel in changed:
+            if self.has_dir(rel):
+                self._rescan_dir(rel)
+
+    # ===== Persistencia =====
+
+    def load(self) -> bool:
+        """
+        Carga el índice guardado; True si era de esta raíz
+
+        Lo cargado no se da por listo: puede estar desfasado hasta que el
+        hilo lo reconcilia con el disco.
+        """
+        if self.path is None or not self.path.exists():
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Índice del workspace ilegible, se reconstruye: {e}")
+            return False
+        if data.get("root") != str(self.root):
+            return False
+
+        entries: Dict[str, Record] = {}
+        children: Dict[str, set] = {}
+        for rel, is_dir, is_link, size, mtime_ns in data.get("entries", []):
+            entries[rel] = (bool(is_dir), bool(is_link), size, mtime_ns)
+            parent, _, name = rel.rpartition("/")
+            if is_dir and not is_link and not self.walker.prunes(name):
+                children.setdefault(rel, set())
+            if rel:
+                children.setdefault(parent, set()).add(name)
+        with self._lock:
+            self._entries = entries
+            self._children = children
+            self._changed()
+            self._dirty = False
+        logger.info(f"Índice del workspace cargado: {len(entries)} entradas")
+        return True
+
+    def save(self):
+        """Guarda el índice de forma atómica (archivo temporal + rename)"""
+        if self.path is None:
+            return
+        with self._lock:
+            rows = [[rel, *record] for rel, record in self._entries.items()]
+            self._dirty = False
+        self._last_save = time.monotonic()
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"root": str(self.root), "entries": rows}, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el índice del workspace: {e}")
+
+    def _maybe_save(self):
+        if self._dirty and time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    # ===== Vigilancia =====
+
+    def _watch(self, rel: str):
+        inotify = self._inotify
+        if inotify is None or self._watches_exhausted:
+            return
+        try:
+            wd = inotify.add_watch(self._abs(rel))
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                # Límite fs.inotify.max_user_watches agotado: el hilo pasa a sondeo
+                self._watches_exhausted = True
+            return
+        with self._lock:
+            self._watches[wd] = rel
+
+    def _disable_inotify(self):
+        logger.warning("Sin watches de inotify disponibles: se pasa a sondeo")
+        self._inotify.close()
+        self._inotify = None
+        with self._lock:
+            self._watches.clear()
+        self.mode = "polling"
+
+    def start(self):
+        """
+        Carga el índice guardado y arranca el hilo que lo mantiene al día
+
+        is_ready() solo pasa a True cuando el hilo ha reconciliado el índice
+        con el disco; hasta entonces las consultas van al disco.
+        """
+        if self._thread is not None:
+            return
+        self.load()
+        self._thread = threading.Thread(target=self._run, name="arkaios-workspace-index", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._dirty:
+            self.save()
+
+    def _run(self):
+        if self.use_inotify:
+            try:
+                self._inotify = _Inotify()
+                self.mode = "inotify"
+            except OSError as e:
+                logger.warning(f"inotify no disponible ({e}): se usa sondeo")
+        if self._inotify is None:
+            self.mode = "polling"
+
+        # Construcción (o reconciliación del índice cargado) y alta de watches
+        try:
+            self.rebuild()
+        except Exception as e:
+            logger.error(f"Error construyendo el índice del workspace: {e}")
+        self._ready.set()
+        self.save()
+        last_full_scan = time.monotonic()
+
+        while not self._stop.is_set():
+            try:
+                if self._watches_exhausted and self._inotify is not None:
+                    self._disable_inotify()
+                if self._inotify is not None:
+                    self._process_events()
+                    if self._rules_changed:
+                        self._rules_changed = False
+                        self.rebuild()
+                else:
+                    if self._stop.wait(self.poll_interval):
+                        break
+                    if self._rules_changed or time.monotonic() - last_full_scan >= self.full_scan_interval:
+                        self._rules_changed = False
+                        last_full_scan = time.monotonic()
+                        self.rebuild()
+                    else:
+                        self.poll()
+                self._maybe_save()
+            except Exception as e:
+                logger.error(f"Error manteniendo el índice del workspace: {e}")
+                self._stop.wait(1.0)
+
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _process_events(self):
+        events = self._inotify.read_events(1.0)
+        if not events:
+            return
+
+        paths = []
+        for wd, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                logger.warning("Cola de inotify desbordada: se reconstruye el índice")
+                self.rebuild()
+                return
+            with self._lock:
+                if mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    continue
+                rel = self._watches.get(wd)
+            if rel is None or mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                continue  # El evento del padre ya lo cubre
+            paths.append(f"{rel}/{name}" if rel and name else (name or rel))
+
+        # Varias escrituras al mismo archivo en una lectura = una actualización
+        for rel in dict.fromkeys(paths):
+            self.refresh(rel)
+
+
+# Singleton instance
+_workspace_index_instance = None
+
+
+def get_workspace_index(workspace_root: str = None, **kwargs) -> WorkspaceIndex:
+    """Obtiene la instancia singleton del índice del workspace"""
+    global _workspace_index_instance
+    if _workspace_index_instance is None:
+        _workspace_index_instance = WorkspaceIndex(workspace_root or os.getcwd(), **kwargs)
+    return _workspace_index_instance
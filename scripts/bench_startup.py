@@ -0,0 +1,58 @@
+# bench_startup.py - Mide el arranque en frío del servidor ARKAIOS
+"""
+Lanza N intérpretes nuevos y mide:
+  - import: tiempo de importar server_arkaios_new
+  - first_request: import + primera petición a /health/live y /health
+
+Uso: python scripts/bench_startup.py [-n 10]
+"""
+
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+import server_arkaios_new as server
+t_import = time.perf_counter() - t0
+client = server.app.test_client()
+t1 = time.perf_counter()
+client.get("/health/live")
+t_live = time.perf_counter() - t1
+client.get("/health")
+t_total = time.perf_counter() - t0
+print(json.dumps({"import": t_import, "live": t_live, "first_request": t_total}))
+"""
+
+
+def run_once() -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=str(ROOT),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque en frío")
+    parser.add_argument("-n", type=int, default=10, help="Número de arranques")
+    args = parser.parse_args()
+
+    samples = [run_once() for _ in range(args.n)]
+    for key in ("import", "live", "first_request"):
+        values = [s[key] * 1000 for s in samples]
+        print(f"{key:14s} mediana {statistics.median(values):8.1f} ms   "
+              f"min {min(values):8.1f} ms   max {max(values):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
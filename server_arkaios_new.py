@@ -4,21 +4,28 @@ Servidor Flask con capacidades completas de IA Builder Mode
 """
 
 import os
+import gzip
+import itertools
 import json
 import uuid
+import mimetypes
 import time
 import logging
+import threading
 from datetime import datetime
 from pathlib import Path
 
-from flask import Flask, request, send_from_directory, jsonify
+from flask import Flask, Response, g, request, send_from_directory, jsonify, stream_with_context
 from flask_cors import CORS
 
-# Importar módulos ARKAIOS
-from arkaios_ai_brain_real import get_ai_brain_real  # Versión con LLM real
-from arkaios_file_manager import get_file_manager
-from arkaios_executor import get_executor
-from arkaios_builder_mode import get_builder
+try:
+    import brotli  # Opcional: compresión br si está instalado
+except ImportError:
+    brotli = None
+
+# Módulos ARKAIOS: solo las métricas (las usa cada petición); el resto se
+# importa dentro de su factoría _init_* en el primer uso
+from arkaios_metrics import get_metrics
 
 # ========== CONFIG ==========
 APP_DIR = Path(__file__).parent.resolve()
@@ -29,6 +36,73 @@ WORKSPACE = Path(os.getenv("ARK_WORKSPACE", str(STORAGE / "workspace"))).resolve
 
 LOG_PATH = MEM_DIR / "arkaios_log.jsonl"
 SESSION_PATH = MEM_DIR / "arkaios_session_last.json"
+SESSION_DB = Path(os.getenv("ARK_SESSION_DB", str(MEM_DIR / "arkaios_sessions.db"))).resolve()
+SESSION_BACKEND = os.getenv("ARK_SESSION_BACKEND", "sqlite")
+SESSION_TTL = int(os.getenv("ARK_SESSION_TTL", str(7 * 24 * 3600)))
+TOOL_PROBE_TTL = float(os.getenv("ARK_TOOL_PROBE_TTL", "300"))
+JOB_WORKERS = int(os.getenv("ARK_JOB_WORKERS", "2"))
+JOB_QUEUE = int(os.getenv("ARK_JOB_QUEUE", "50"))
+BATCH_WORKERS = int(os.getenv("ARK_BATCH_WORKERS", "8"))
+COMPRESS_MIN_BYTES = int(os.getenv("ARK_COMPRESS_MIN_BYTES", "1024"))
+
+# Control de admisión del executor
+EXEC_MAX_GLOBAL = int(os.getenv("ARK_EXEC_MAX_GLOBAL", "8"))
+EXEC_MAX_PER_USER = int(os.getenv("ARK_EXEC_MAX_PER_USER", "2"))
+EXEC_MAX_QUEUE = int(os.getenv("ARK_EXEC_MAX_QUEUE", "32"))
+EXEC_QUEUE_TIMEOUT = float(os.getenv("ARK_EXEC_QUEUE_TIMEOUT", "30"))
+
+# Historial de ejecuciones (buffer en memoria + SQLite)
+EXEC_HISTORY_DB = Path(os.getenv("ARK_EXEC_HISTORY_DB", str(MEM_DIR / "arkaios_exec_history.db"))).resolve()
+EXEC_HISTORY_SIZE = int(os.getenv("ARK_EXEC_HISTORY_SIZE", "1000"))
+
+# Salida de comandos: por encima del umbral se vuelca a disco
+OUTPUT_DIR = os.getenv("ARK_OUTPUT_DIR") or None  # None = temporal del sistema
+OUTPUT_SPILL_BYTES = int(os.getenv("ARK_OUTPUT_SPILL_BYTES", str(1024 * 1024)))
+
+# Intérpretes precalentados para fragmentos python/node (0 = desactivado)
+INTERP_POOL_SIZE = int(os.getenv("ARK_INTERP_POOL_SIZE", "2"))
+INTERP_MAX_TASKS = int(os.getenv("ARK_INTERP_MAX_TASKS", "100"))
+INTERP_MAX_RSS_MB = int(os.getenv("ARK_INTERP_MAX_RSS_MB", "256"))
+
+# Límites de recursos de los procesos hijos (JSON: {"npm": {"cpu": 1800, "as_mb": null, "nofile": 8192}})
+RLIMITS_ENABLED = os.getenv("ARK_RLIMITS_ENABLED", "true").lower() == "true"
+RLIMIT_PROFILES = json.loads(os.getenv("ARK_RLIMIT_PROFILES", "{}"))
+
+# Caché compartida de npm para todas las instalaciones del servidor
+NPM_CACHE_DIR = Path(os.getenv("ARK_NPM_CACHE_DIR", str(STORAGE / "npm-cache"))).resolve()
+NPM_PREFER_OFFLINE = os.getenv("ARK_NPM_PREFER_OFFLINE", "true").lower() == "true"
+
+# Recorridos del workspace: aplicar .gitignore/.arkaiosignore (node_modules, .venv... siempre se podan)
+RESPECT_IGNORE_FILES = os.getenv("ARK_RESPECT_IGNORE_FILES", "true").lower() == "true"
+# .git/.hg/.svn aparecen en los listados, pero los recorridos recursivos, la búsqueda y el índice no entran
+PRUNE_VCS_DIRS = os.getenv("ARK_PRUNE_VCS_DIRS", "true").lower() == "true"
+
+# Índice vivo de metadatos del workspace (inotify o sondeo)
+WORKSPACE_INDEX_ENABLED = os.getenv("ARK_WORKSPACE_INDEX", "true").lower() == "true"
+WORKSPACE_INDEX_PATH = Path(os.getenv("ARK_WORKSPACE_INDEX_PATH", str(MEM_DIR / "arkaios_workspace_index.json"))).resolve()
+WORKSPACE_INDEX_POLL = float(os.getenv("ARK_WORKSPACE_INDEX_POLL", "5"))
+WORKSPACE_INDEX_FULL_SCAN = float(os.getenv("ARK_WORKSPACE_INDEX_FULL_SCAN", "300"))
+
+# Índice de trigramas para la búsqueda en contenido (requiere el índice del workspace)
+CONTENT_INDEX_ENABLED = os.getenv("ARK_CONTENT_INDEX", "true").lower() == "true"
+CONTENT_INDEX_DB = Path(os.getenv("ARK_CONTENT_INDEX_DB", str(MEM_DIR / "arkaios_content_index.db"))).resolve()
+CONTENT_INDEX_MAX_BYTES = int(os.getenv("ARK_CONTENT_INDEX_MAX_BYTES", str(1024 * 1024)))
+
+# Motor de búsqueda en contenido (pool de procesos)
+SEARCH_WORKERS = int(os.getenv("ARK_SEARCH_WORKERS", "0")) or None  # 0 = un proceso por núcleo
+SEARCH_MAX_FILE_BYTES = int(os.getenv("ARK_SEARCH_MAX_FILE_BYTES", str(10 * 1024 * 1024)))
+SEARCH_TIMEOUT = float(os.getenv("ARK_SEARCH_TIMEOUT", "30"))
+
+# Servicio git: blobs mayores se devuelven sin contenido; tope de la caché de resultados
+GIT_MAX_BLOB_BYTES = int(os.getenv("ARK_GIT_MAX_BLOB_BYTES", str(10 * 1024 * 1024)))
+GIT_CACHE_BYTES = int(os.getenv("ARK_GIT_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+# Log estructurado (escritor en segundo plano)
+LOG_MAX_BYTES = int(os.getenv("ARK_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("ARK_LOG_BACKUP_COUNT", "10"))
+LOG_BATCH_SIZE = int(os.getenv("ARK_LOG_BATCH_SIZE", "256"))
+LOG_FLUSH_INTERVAL = float(os.getenv("ARK_LOG_FLUSH_INTERVAL", "0.5"))
+LOG_FSYNC = os.getenv("ARK_LOG_FSYNC", "never")
 
 STORAGE.mkdir(parents=True, exist_ok=True)
 MEM_DIR.mkdir(parents=True, exist_ok=True)
@@ -43,26 +117,239 @@ ch.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s: %(message)s"))
 logger.addHandler(ch)
 
 def log_json(event: dict):
-    """Añade una línea JSONL al log estructurado."""
-    try:
-        event.setdefault("ts", int(time.time() * 1000))
-        LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-        with LOG_PATH.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(event, ensure_ascii=False) + "\n")
-    except Exception as e:
-        logger.warning(f"No se pudo escribir log JSONL: {e}")
+    """Encola una línea JSONL para el log estructurado (no bloquea la petición)."""
+    event.setdefault("ts", int(time.time() * 1000))
+    audit_log.write(event)
 
 # ========== APP ==========
 app = Flask(__name__, static_folder=str(STATIC_DIR), static_url_path="")
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-SESSIONS = {}  # token -> {"email":..., "name":..., "iat":...}
+# ===== Inicialización diferida =====
+class _Lazy:
+    """
+    Proxy que construye el objeto real en el primer acceso a un atributo
+    Mantiene el arranque del proceso rápido: nada se crea hasta que una petición lo usa
+    Las fábricas que dependen de otro módulo lo piden a su proxy (p. ej.
+    executor._get()), nunca a su fábrica: así un solo lock guarda cada construcción
+    """
+    
+    def __init__(self, factory):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+    
+    def _get(self):
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    instance = self._factory()
+                    object.__setattr__(self, "_instance", instance)
+        return instance
+    
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+    
+    def __setattr__(self, name, value):
+        setattr(self._get(), name, value)
+
+def _init_audit_log():
+    from arkaios_audit_log import get_audit_log
+    return get_audit_log(
+        str(LOG_PATH),
+        batch_size=LOG_BATCH_SIZE,
+        flush_interval=LOG_FLUSH_INTERVAL,
+        fsync=LOG_FSYNC,
+        max_bytes=LOG_MAX_BYTES,
+        backup_count=LOG_BACKUP_COUNT,
+    )
+
+def _init_executor():
+    from arkaios_executor import get_executor
+    from arkaios_admission import get_admission_controller
+    from arkaios_exec_history import get_execution_history
+    from arkaios_output_store import get_output_store
+    from arkaios_interp_pool import get_interpreter_pools
+    
+    instance = get_executor(str(WORKSPACE))
+    if instance.admission is None:
+        instance.admission = get_admission_controller(
+            max_global=EXEC_MAX_GLOBAL,
+            max_per_user=EXEC_MAX_PER_USER,
+            max_queue=EXEC_MAX_QUEUE,
+            queue_timeout=EXEC_QUEUE_TIMEOUT,
+        )
+        instance.history = get_execution_history(str(EXEC_HISTORY_DB), max_entries=EXEC_HISTORY_SIZE)
+        instance.output_store = get_output_store(OUTPUT_DIR, spill_threshold=OUTPUT_SPILL_BYTES)
+        instance.enforce_limits = RLIMITS_ENABLED
+        for command, profile in RLIMIT_PROFILES.items():
+            instance.limit_profiles.setdefault(command, {}).update(profile)
+        NPM_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        instance.npm_cache_dir = NPM_CACHE_DIR
+        instance.npm_prefer_offline = NPM_PREFER_OFFLINE
+        if INTERP_POOL_SIZE > 0:
+            instance.interpreter_pools = get_interpreter_pools(
+                size=INTERP_POOL_SIZE,
+                max_tasks=INTERP_MAX_TASKS,
+                max_rss_mb=INTERP_MAX_RSS_MB,
+            )
+    return instance
+
+def _init_file_manager():
+    from arkaios_file_manager import get_file_manager
+    from arkaios_search_engine import get_search_engine
+    from arkaios_workspace_index import get_workspace_index
+    from arkaios_trigram_index import get_trigram_index
+    
+    instance = get_file_manager(str(WORKSPACE))
+    instance.walker.respect_ignore = RESPECT_IGNORE_FILES
+    instance.walker.prune_vcs = PRUNE_VCS_DIRS
+    instance.search_engine = get_search_engine(
+        max_workers=SEARCH_WORKERS,
+        max_file_bytes=SEARCH_MAX_FILE_BYTES,
+    )
+    if WORKSPACE_INDEX_ENABLED and instance.index is None:
+        index = get_workspace_index(
+            str(WORKSPACE),
+            path=str(WORKSPACE_INDEX_PATH),
+            poll_interval=WORKSPACE_INDEX_POLL,
+            full_scan_interval=WORKSPACE_INDEX_FULL_SCAN,
+            respect_ignore=RESPECT_IGNORE_FILES,
+            prune_vcs=PRUNE_VCS_DIRS,
+        )
+        index.start()
+        instance.index = index
+        if CONTENT_INDEX_ENABLED:
+            content_index = get_trigram_index(
+                index,
+                path=str(CONTENT_INDEX_DB),
+                extensions=instance.allowed_extensions,
+                max_file_bytes=CONTENT_INDEX_MAX_BYTES,
+            )
+            content_index.start()
+            instance.content_index = content_index
+    return instance
+
+def _init_builder():
+    from arkaios_builder_mode import get_builder
+    executor._get()  # El builder comparte el executor (con su control de admisión)
+    return get_builder(str(WORKSPACE))
+
+def _init_tool_probe():
+    from arkaios_tool_probe import get_tool_probe
+    instance = get_tool_probe(executor._get(), ttl=TOOL_PROBE_TTL)
+    instance.start()
+    return instance
+
+def _init_log_index():
+    from arkaios_log_index import get_log_index
+    instance = get_log_index(str(LOG_PATH), segments=audit_log.list_segments)
+    audit_log.add_listener(instance.on_log_event)
+    return instance
+
+def _init_sessions():
+    from arkaios_sessions import get_session_store
+    return get_session_store(SESSION_BACKEND, path=str(SESSION_DB), ttl=SESSION_TTL)
+
+def _init_ai_brain():
+    from arkaios_ai_brain_real import get_ai_brain_real  # Versión con LLM real
+    return get_ai_brain_real()
+
+def _init_jobs():
+    from arkaios_jobs import get_job_manager
+    return get_job_manager(max_workers=JOB_WORKERS, max_queue=JOB_QUEUE)
+
+def _init_batch_runner():
+    from arkaios_batch import get_batch_runner
+    return get_batch_runner(max_workers=BATCH_WORKERS)
 
-# Inicializar módulos ARKAIOS
-ai_brain = get_ai_brain_real()  # Usar versión con LLM real
-file_manager = get_file_manager(str(WORKSPACE))
-executor = get_executor(str(WORKSPACE))
-builder = get_builder(str(WORKSPACE))
+def _init_async_engine():
+    from arkaios_async_exec import get_async_engine
+    return get_async_engine(executor._get())
+
+def _init_git_service():
+    from arkaios_git_service import get_git_service
+    return get_git_service(str(WORKSPACE), max_blob_bytes=GIT_MAX_BLOB_BYTES,
+                           cache_bytes=GIT_CACHE_BYTES)
+
+# Log estructurado: el hilo escritor arranca con el primer log_json
+audit_log = _Lazy(_init_audit_log)
+
+# token -> {"email":..., "name":..., "iat":...}
+sessions = _Lazy(_init_sessions)
+
+# Módulos ARKAIOS (se importan y construyen en el primer uso)
+ai_brain = _Lazy(_init_ai_brain)
+file_manager = _Lazy(_init_file_manager)
+executor = _Lazy(_init_executor)
+builder = _Lazy(_init_builder)
+tool_probe = _Lazy(_init_tool_probe)
+log_index = _Lazy(_init_log_index)
+jobs = _Lazy(_init_jobs)
+batch_runner = _Lazy(_init_batch_runner)
+async_engine = _Lazy(_init_async_engine)
+git_service = _Lazy(_init_git_service)
+
+metrics = get_metrics()
+
+# ===== Métricas HTTP =====
+@app.before_request
+def _metrics_start():
+    g.metrics_start = time.perf_counter()
+
+@app.after_request
+def _metrics_record(response):
+    start = getattr(g, "metrics_start", None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        status = str(response.status_code)
+        metrics.inc("arkaios_http_requests_total", route=route, method=request.method, status=status)
+        metrics.observe(
+            "arkaios_http_request_duration_seconds",
+            time.perf_counter() - start,
+            route=route, method=request.method, status=status,
+        )
+    return response
+
+# ===== Compresión =====
+@app.after_request
+def _compress_response(response):
+    """Comprime respuestas JSON/texto grandes con brotli o gzip según Accept-Encoding"""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or "Content-Encoding" in response.headers
+        or not (response.mimetype or "").startswith(("application/json", "text/"))
+        or response.mimetype == "text/event-stream"
+    ):
+        return response
+    
+    accept = request.headers.get("Accept-Encoding", "")
+    if brotli is not None and "br" in accept:
+        encoding = "br"
+    elif "gzip" in accept:
+        encoding = "gzip"
+    else:
+        return response
+    
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    
+    if encoding == "br":
+        compressed = brotli.compress(data, quality=5)
+    else:
+        compressed = gzip.compress(data, compresslevel=6)
+    
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    response.headers["Content-Length"] = str(len(compressed))
+    response.vary.add("Accept-Encoding")
+    return response
 
 # ===== Util =====
 def ok(data=None, **kw):
@@ -78,9 +365,84 @@ def err(msg, code=400, **kw):
     payload.update(kw)
     return jsonify(payload), code
 
+def not_modified(etag: str):
+    """Devuelve una respuesta 304 si el cliente ya tiene esta versión (If-None-Match)"""
+    if etag and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    return None
+
+def with_etag(response, etag: str):
+    """Añade un ETag débil a la respuesta"""
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
+
+def ndjson_response(items, limit: int = None):
+    """
+    Transmite un iterador como NDJSON (una entrada por línea)
+    La última línea es {"done": true, "count": n, "next_cursor": ...} (más
+    timed_out/limited si el iterador es una búsqueda en contenido)
+    """
+    def generate():
+        count = 0
+        next_cursor = last_path = None
+        try:
+            for item in items:
+                if limit is not None and count >= limit:
+                    next_cursor = last_path
+                    break
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+                last_path = item.get("path")
+                count += 1
+        finally:
+            if hasattr(items, "close"):
+                items.close()  # Cancela el trabajo pendiente si el cliente se va
+        done = {"done": True, "count": count, "next_cursor": next_cursor}
+        if hasattr(items, "timed_out"):
+            done.update(timed_out=items.timed_out, limited=items.limited)
+        yield json.dumps(done) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+def too_busy(result: dict):
+    """429 con Retry-After para comandos rechazados por el control de admisión"""
+    response, code = err(result["error"], 429, retry_after=result["retry_after"])
+    response.headers["Retry-After"] = str(result["retry_after"])
+    return response, code
+
+def parse_byte_range(header: str):
+    """
+    Parsea una cabecera Range de un solo rango ("bytes=0-99", "bytes=100-", "bytes=-500")
+    
+    Returns:
+        (start, end) con end None si es abierto y start negativo para sufijos,
+        o None si la cabecera no es válida
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if not first:
+            return (-int(last), None) if last else None
+        start = int(first)
+        end = int(last) if last else None
+    except ValueError:
+        return None
+    if end is not None and end < start:
+        return None
+    return start, end
+
+def client_id(user: dict = None) -> str:
+    """Identidad para los límites de concurrencia: email de la sesión o IP"""
+    if user:
+        return user["email"]
+    return request.remote_addr or "anon"
+
 def require_auth():
     tok = request.args.get("token") or (request.get_json(silent=True) or {}).get("token")
-    return SESSIONS.get(tok)
+    return sessions.get(tok)
 
 # ====== Front estático ======
 @app.get("/")
@@ -98,8 +460,14 @@ def app_page():
     return jsonify({"error": "arkaios-integrated.html no encontrado"}), 404
 
 # ====== Health ======
+@app.get("/health/live")
+def health_live():
+    """Liveness: no sondea herramientas ni toca disco"""
+    return jsonify({"ok": True, "status": "alive"})
+
 @app.get("/health")
 def health():
+    installed = tool_probe.installed()
     data = {
         "ok": True,
         "name": "ARKAIOS AI Server",
@@ -113,11 +481,13 @@ def health():
             "builder_mode": True,
         },
         "tools_available": {
-            "node": executor.check_tool_installed("node")["installed"],
-            "npm": executor.check_tool_installed("npm")["installed"],
-            "python": executor.check_tool_installed("python")["installed"],
-            "git": executor.check_tool_installed("git")["installed"],
-        }
+            "node": installed.get("node", False),
+            "npm": installed.get("npm", False),
+            "python": installed.get("python", False),
+            "git": installed.get("git", False),
+        },
+        "tools_probed": tool_probe.is_ready(),
+        "tools_age": round(tool_probe.age(), 1),
     }
     return jsonify(data)
 
@@ -129,7 +499,7 @@ def auth_google():
     name = body.get("name", "Demo User")
     
     tok = uuid.uuid4().hex
-    SESSIONS[tok] = {"email": email, "name": name, "iat": int(time.time())}
+    sessions.set(tok, {"email": email, "name": name, "iat": int(time.time())})
     log_json({"type": "login", "email": email})
     
     logger.info(f"Usuario autenticado: {email}")
@@ -190,7 +560,7 @@ def ai_execute():
     
     # Ejecutar acción
     try:
-        result = _execute_action(action, params)
+        result = _execute_action(action, params, user=client_id(user))
         
         log_json({
             "type": "ai_execute",
@@ -199,14 +569,44 @@ def ai_execute():
             "success": result.get("ok", False),
         })
         
+        if result.get("rejected"):
+            return too_busy(result)
+        
         return ok(result)
     
     except Exception as e:
         logger.error(f"Error ejecutando acción: {e}")
         return err(str(e))
 
-def _execute_action(action: str, params: dict) -> dict:
-    """Ejecuta una acción específica"""
+@app.post("/api/ai/execute/batch")
+def ai_execute_batch():
+    """
+    Ejecuta varias acciones en una sola petición
+    Las acciones sin dependencias corren en paralelo; depends_on fuerza el orden
+    """
+    body = request.get_json(force=True) or {}
+    user = require_auth()
+    
+    actions = body.get("actions")
+    user_email = user["email"] if user else "anon"
+    logger.info(f"Execute batch de {user_email}: {len(actions or [])} acciones")
+    
+    requester = client_id(user)
+    result = batch_runner.run(actions, lambda a, p: _execute_action(a, p, user=requester))
+    if "results" not in result:
+        return err(result["error"])
+    
+    log_json({
+        "type": "ai_execute_batch",
+        "user": user_email,
+        "actions": [r["action"] for r in result["results"]],
+        "success": result["ok"],
+    })
+    
+    return ok(result)
+
+def _execute_action(action: str, params: dict, user: str = None) -> dict:
+    """Ejecuta una acción específica (user: identidad para los límites del executor)"""
     
     actions = {
         "file_create": lambda p: file_manager.create_file(p["path"], p.get("content", "")),
@@ -218,17 +618,20 @@ def _execute_action(action: str, params: dict) -> dict:
         "code_execute": lambda p: executor.execute_command(
             p.get("command", "python"),
             p.get("args", []),
-            cwd=p.get("cwd")
+            cwd=p.get("cwd"),
+            user=user,
         ),
         
         "package_install": lambda p: executor.npm_install(
             [p["package"]] if isinstance(p["package"], str) else p["package"],
-            cwd=p.get("cwd")
+            cwd=p.get("cwd"),
+            user=user,
         ),
         
         "git_execute": lambda p: executor.git_command(
             p["command"].split() if isinstance(p["command"], str) else p["command"],
-            cwd=p.get("cwd")
+            cwd=p.get("cwd"),
+            user=user,
         ),
         
         "project_scaffold": lambda p: builder.create_project(
@@ -247,11 +650,23 @@ def _execute_action(action: str, params: dict) -> dict:
 # ====== FILE MANAGER ENDPOINTS ======
 @app.get("/api/files/list")
 def api_list_files():
-    """Lista archivos del workspace"""
+    """
+    Lista archivos del workspace
+    Paginación con ?limit=&cursor=; ?format=ndjson transmite las entradas según se recorren
+    """
     path = request.args.get("path", ".")
     recursive = request.args.get("recursive", "false").lower() == "true"
+    cursor = request.args.get("cursor") or None
+    limit = request.args.get("limit")
+    limit = int(limit) if limit else None
+    
+    if request.args.get("format") == "ndjson":
+        listing = file_manager.iter_list_files(path, recursive=recursive, cursor=cursor)
+        if not listing["ok"]:
+            return err(listing["error"])
+        return ndjson_response(listing["files"], limit)
     
-    result = file_manager.list_files(path, recursive=recursive)
+    result = file_manager.list_files(path, recursive=recursive, cursor=cursor, limit=limit)
     return ok(result)
 
 @app.post("/api/files/create")
@@ -275,14 +690,68 @@ def api_create_file():
 
 @app.get("/api/files/read")
 def api_read_file():
-    """Lee un archivo"""
+    """
+    Lee un archivo
+    JSON completo (hasta 10MB), ?line=&lines= ventana de líneas, ?offset=&length=
+    ventana de bytes; con Range: bytes=... o ?raw=true se transmite tal cual
+    """
     filepath = request.args.get("path")
     
     if not filepath:
         return err("Ruta del archivo requerida")
     
-    result = file_manager.read_file(filepath)
-    return ok(result) if result["ok"] else err(result["error"])
+    cached = not_modified(file_manager.get_file_etag(filepath))
+    if cached is not None:
+        return cached
+    
+    range_header = request.headers.get("Range")
+    if range_header or request.args.get("raw", "false").lower() == "true":
+        return _stream_file(filepath, range_header)
+    
+    try:
+        line = request.args.get("line")
+        lines = request.args.get("lines")
+        offset = request.args.get("offset")
+        length = request.args.get("length")
+        line = int(line) if line else None
+        lines = int(lines) if lines else None
+        offset = int(offset) if offset else None
+        length = int(length) if length else None
+    except ValueError:
+        return err("Parámetros numéricos inválidos (line, lines, offset, length)")
+    
+    result = file_manager.read_file(filepath, line=line, lines=lines, offset=offset, length=length)
+    if not result["ok"]:
+        return err(result["error"], 416 if "size" in result and (line is not None or offset is not None) else 400)
+    return with_etag(ok(result), result.get("etag"))
+
+def _stream_file(filepath: str, range_header: str = None):
+    """Contenido crudo de un archivo en bloques (206 con Content-Range si se pidió un rango)"""
+    start = end = None
+    if range_header:
+        byte_range = parse_byte_range(range_header)
+        if byte_range is None:
+            return err("Cabecera Range inválida", 416)
+        start, end = byte_range
+    
+    result = file_manager.open_file_stream(filepath, start, end)
+    if not result["ok"]:
+        if "size" in result:
+            return Response(status=416, headers={"Content-Range": f"bytes */{result['size']}"})
+        return err(result["error"])
+    
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(result["end"] - result["start"] + 1),
+    }
+    status = 200
+    if range_header and result["size"] > 0:
+        # Vacío: 200 sin Content-Range ("bytes 0--1/0" no es un rango válido)
+        status = 206
+        headers["Content-Range"] = f"bytes {result['start']}-{result['end']}/{result['size']}"
+    mimetype = mimetypes.guess_type(filepath)[0] or "application/octet-stream"
+    response = Response(stream_with_context(result["chunks"]), status=status, mimetype=mimetype, headers=headers)
+    return with_etag(response, result["etag"])
 
 @app.post("/api/files/edit")
 def api_edit_file():
@@ -322,14 +791,35 @@ def api_delete_file():
 
 @app.get("/api/files/search")
 def api_search_files():
-    """Busca archivos"""
+    """
+    Busca archivos
+    Paginación con ?limit=&cursor=; ?format=ndjson transmite los resultados según aparecen
+    En contenido: ?max_results=&timeout=&context= (líneas de contexto)
+    """
     pattern = request.args.get("pattern", "")
     content = request.args.get("content", "false").lower() == "true"
+    cursor = request.args.get("cursor") or None
+    try:
+        limit = request.args.get("limit")
+        limit = int(limit) if limit else None
+        max_results = request.args.get("max_results")
+        max_results = int(max_results) if max_results else None
+        timeout = min(float(request.args.get("timeout", SEARCH_TIMEOUT)), SEARCH_TIMEOUT)
+        context = int(request.args.get("context", "0"))
+    except ValueError:
+        return err("Parámetros numéricos inválidos (limit, max_results, timeout, context)")
     
     if not pattern:
         return err("Patrón de búsqueda requerido")
     
-    result = file_manager.search_files(pattern, content_search=content)
+    options = {"max_results": max_results, "timeout": timeout, "context": context}
+    if request.args.get("format") == "ndjson":
+        search = file_manager.iter_search_files(pattern, content_search=content, cursor=cursor, **options)
+        if not search["ok"]:
+            return err(search["error"])
+        return ndjson_response(search["results"], limit)
+    
+    result = file_manager.search_files(pattern, content_search=content, cursor=cursor, limit=limit, **options)
     return ok(result) if result["ok"] else err(result["error"])
 
 @app.get("/api/files/tree")
@@ -338,8 +828,21 @@ def api_file_tree():
     directory = request.args.get("path", ".")
     max_depth = int(request.args.get("max_depth", "3"))
     
+    cached = not_modified(file_manager.get_tree_etag(directory, max_depth=max_depth))
+    if cached is not None:
+        return cached
+    
     result = file_manager.get_file_tree(directory, max_depth=max_depth)
-    return ok(result) if result["ok"] else err(result["error"])
+    return with_etag(ok(result), result.get("etag")) if result["ok"] else err(result["error"])
+
+@app.get("/api/files/index")
+def api_file_index():
+    """Estado del índice de metadatos del workspace y del índice de contenido"""
+    if file_manager.index is None:
+        return err("Índice del workspace desactivado (ARK_WORKSPACE_INDEX=false)")
+    content_index = file_manager.content_index
+    return ok(file_manager.index.stats(),
+              content=content_index.stats() if content_index is not None else None)
 
 @app.post("/api/files/mkdir")
 def api_create_directory():
@@ -408,6 +911,18 @@ def api_builder_scaffold():
     
     logger.info(f"Scaffolding proyecto: {project_type} - {name}")
     
+    if body.get("async"):
+        job = jobs.submit(
+            "project_scaffold",
+            _scaffold_job,
+            project_type, name, options,
+            params={"type": project_type, "name": name, "options": options},
+            user=client_id(require_auth()),
+        )
+        if job is None:
+            return err("Cola de trabajos llena, intenta más tarde", 429)
+        return ok(job=job.to_dict()), 202
+    
     result = builder.create_project(project_type, name, options)
     
     if result["ok"]:
@@ -419,10 +934,26 @@ def api_builder_scaffold():
     
     return ok(result) if result["ok"] else err(result["error"], details=result)
 
+def _scaffold_job(project_type: str, name: str, options: dict) -> dict:
+    """Crea un proyecto dentro de un trabajo, reportando cada paso"""
+    from arkaios_jobs import current_job
+    job = current_job()
+    result = builder.create_project(project_type, name, options, progress=job.step)
+    
+    if result["ok"]:
+        log_json({
+            "type": "project_create",
+            "project_type": project_type,
+            "name": name,
+            "job": job.id,
+        })
+    
+    return result
+
 # ====== EXECUTOR ENDPOINTS ======
 @app.post("/api/tools/execute")
 def api_execute_command():
-    """Ejecuta un comando"""
+    """Ejecuta un comando (con "stream": true devuelve la salida como Server-Sent Events)"""
     body = request.get_json(force=True) or {}
     
     command = body.get("command")
@@ -433,7 +964,20 @@ def api_execute_command():
     if not command:
         return err("Comando requerido")
     
-    result = executor.execute_command(command, args, cwd=cwd, timeout=timeout)
+    user = client_id(require_auth())
+    
+    if body.get("stream") or "text/event-stream" in request.headers.get("Accept", ""):
+        return _stream_command(command, args, cwd, timeout, user)
+    
+    if body.get("async"):
+        # Se supervisa en el event loop del motor asíncrono; consultar por id
+        result = async_engine.submit(command, args, cwd=cwd, timeout=timeout, user=user)
+        if not result.get("ok"):
+            return err(result.get("error", "Comando rechazado"))
+        return ok(result), 202
+    
+    result = executor.execute_command(command, args, cwd=cwd, timeout=timeout, user=user,
+                                      cache=bool(body.get("cache")))
     
     log_json({
         "type": "command_execute",
@@ -441,8 +985,42 @@ def api_execute_command():
         "success": result.get("ok", False),
     })
     
+    if result.get("rejected"):
+        return too_busy(result)
+    
     return ok(result)
 
+def _stream_command(command: str, args: list, cwd: str, timeout: int, user: str):
+    """Respuesta SSE: un evento por línea de stdout/stderr y uno final con el código de salida"""
+    events = executor.stream_command(command, args, cwd=cwd, timeout=timeout, user=user)
+    
+    # El primer evento llega tras la validación y la admisión: si es un
+    # rechazo se responde con un código HTTP normal en lugar de abrir el stream
+    first = next(events)
+    if first["event"] == "error" and first.get("rejected"):
+        return too_busy(first)
+    
+    def generate():
+        success = False
+        for event in itertools.chain([first], events):
+            name = event.pop("event")
+            if name in ("exit", "error"):
+                success = event.get("ok", False)
+            yield f"event: {name}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        
+        log_json({
+            "type": "command_execute",
+            "command": command,
+            "success": success,
+            "stream": True,
+        })
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.post("/api/tools/npm")
 def api_npm():
     """Comandos npm"""
@@ -452,13 +1030,37 @@ def api_npm():
     packages = body.get("packages", [])
     cwd = body.get("cwd")
     
-    if action == "install":
-        result = executor.npm_install(packages, cwd=cwd)
-    else:
+    if action != "install":
         return err(f"Acción npm '{action}' no soportada")
     
+    if body.get("async"):
+        job = jobs.submit(
+            "npm_install",
+            _npm_install_job,
+            packages, cwd,
+            params={"packages": packages, "cwd": cwd},
+            user=client_id(require_auth()),
+        )
+        if job is None:
+            return err("Cola de trabajos llena, intenta más tarde", 429)
+        return ok(job=job.to_dict()), 202
+    
+    result = executor.npm_install(packages, cwd=cwd, user=client_id(require_auth()))
+    
+    if result.get("rejected"):
+        return too_busy(result)
+    
     return ok(result)
 
+def _npm_install_job(packages: list, cwd: str) -> dict:
+    """Ejecuta npm install dentro de un trabajo"""
+    from arkaios_jobs import current_job
+    job = current_job()
+    job.step(f"Ejecutando: npm install {' '.join(packages or [])}".strip())
+    result = executor.npm_install(packages, cwd=cwd)
+    job.step("✓ Dependencias instaladas" if result.get("ok") else f"⚠ npm install falló: {result.get('error', '')}")
+    return result
+
 @app.post("/api/tools/git")
 def api_git():
     """Comandos Git"""
@@ -473,20 +1075,223 @@ def api_git():
     # Parsear comando
     parts = git_command.split()
     
-    result = executor.git_command(parts, cwd=cwd)
+    result = executor.git_command(parts, cwd=cwd, user=client_id(require_auth()),
+                                  cache=bool(body.get("cache")))
+    
+    if result.get("rejected"):
+        return too_busy(result)
     
     return ok(result)
 
+# ====== GIT (estructurado) ======
+@app.get("/api/git/status")
+def api_git_status():
+    """Estado del repositorio como JSON (porcelain v2)"""
+    result = git_service.status(request.args.get("cwd"))
+    if not result["ok"]:
+        return err(result["error"])
+    return ok(result)
+
+@app.get("/api/git/log")
+def api_git_log():
+    """Historial de commits como JSON"""
+    try:
+        limit = min(int(request.args.get("limit", 50)), 500)
+        skip = int(request.args.get("skip", 0))
+    except ValueError:
+        return err("Parámetros numéricos inválidos (limit, skip)")
+    
+    result = git_service.log(
+        request.args.get("cwd"),
+        ref=request.args.get("ref", "HEAD"),
+        limit=limit,
+        skip=skip,
+        path=request.args.get("path") or None,
+    )
+    if not result["ok"]:
+        return err(result["error"])
+    return ok(result)
+
+@app.get("/api/git/show")
+def api_git_show():
+    """Contenido de un archivo o directorio en una revisión (?rev=HEAD&path=src)"""
+    result = git_service.show(
+        request.args.get("cwd"),
+        rev=request.args.get("rev", "HEAD"),
+        path=request.args.get("path", ""),
+    )
+    if not result["ok"]:
+        return err(result["error"], 404 if result["error"].startswith("No existe") else 400)
+    return ok(result)
+
 @app.get("/api/tools/check")
 def api_check_tools():
-    """Verifica herramientas instaladas"""
-    tools = ["node", "npm", "python", "git", "firebase"]
-    results = {}
-    
-    for tool in tools:
-        results[tool] = executor.check_tool_installed(tool)
+    """Verifica herramientas instaladas (instantánea en caché, ?refresh=true para re-sondear)"""
+    if request.args.get("refresh", "false").lower() == "true":
+        results = tool_probe.refresh()
+    else:
+        results = tool_probe.snapshot()
     
-    return ok(tools=results)
+    return ok(tools=results, age=round(tool_probe.age(), 1))
+
+@app.get("/api/tools/executions")
+def api_list_executions():
+    """Lista las ejecuciones asíncronas recientes"""
+    limit = int(request.args.get("limit", 50))
+    return ok(executions=async_engine.list_executions(limit=limit), stats=async_engine.stats())
+
+@app.get("/api/tools/executions/<execution_id>")
+def api_get_execution(execution_id):
+    """Estado y resultado de una ejecución asíncrona (?wait=segundos para esperar)"""
+    wait = min(float(request.args.get("wait", 0)), 60.0)
+    execution = async_engine.get(execution_id, wait=wait)
+    if execution is None:
+        return err("Ejecución no encontrada", 404)
+    return ok(execution=execution)
+
+@app.post("/api/tools/executions/<execution_id>/cancel")
+def api_cancel_execution(execution_id):
+    """Cancela una ejecución asíncrona y termina su grupo de procesos"""
+    result = async_engine.cancel(execution_id)
+    if not result["ok"]:
+        return err(result["error"], 404 if "execution" not in result else 409)
+    return ok(result)
+
+@app.get("/api/tools/output/<output_id>")
+def api_tools_output(output_id):
+    """
+    Transmite la salida completa de un comando truncado (?stream=stdout|stderr)
+    Admite Range: bytes=... o ?offset=&length=
+    """
+    stream = request.args.get("stream", "stdout")
+    range_header = request.headers.get("Range")
+    
+    if range_header:
+        byte_range = parse_byte_range(range_header)
+        if byte_range is None:
+            return err("Cabecera Range inválida", 416)
+        start, end = byte_range
+    else:
+        try:
+            start = int(request.args.get("offset", 0))
+            length = request.args.get("length")
+            end = start + int(length) - 1 if length else None
+        except ValueError:
+            return err("Parámetros numéricos inválidos (offset, length)")
+    
+    result = executor.output_store.stream(output_id, stream, start, end)
+    if not result["ok"]:
+        if "size" in result:
+            return Response(status=416, headers={"Content-Range": f"bytes */{result['size']}"})
+        return err(result["error"], 404)
+    
+    headers = {
+        "Accept-Ranges": "bytes",
+        "X-Output-Size": str(result["size"]),
+        "Content-Length": str(result["end"] - result["start"] + 1),
+    }
+    status = 200
+    if range_header and result["size"] > 0:
+        # Vacío: 200 sin Content-Range ("bytes 0--1/0" no es un rango válido)
+        status = 206
+        headers["Content-Range"] = f"bytes {result['start']}-{result['end']}/{result['size']}"
+    # Por bloques: una salida de varios GB no se carga entera en memoria
+    return Response(stream_with_context(result["chunks"]), status=status,
+                    mimetype="text/plain; charset=utf-8", headers=headers)
+
+@app.get("/api/tools/history")
+def api_tools_history():
+    """Consulta el historial de ejecuciones por comando, directorio, resultado y tiempo"""
+    try:
+        since = request.args.get("since")
+        until = request.args.get("until")
+        limit = min(int(request.args.get("limit", 50)), 1000)
+        since = int(since) if since else None
+        until = int(until) if until else None
+    except ValueError:
+        return err("Parámetros numéricos inválidos (since, until, limit)")
+    
+    success = request.args.get("success")
+    if success is not None:
+        success = success.lower() == "true"
+    
+    result = executor.history.query(
+        command=request.args.get("command") or None,
+        cwd=request.args.get("cwd"),
+        success=success,
+        since=since,
+        until=until,
+        limit=limit,
+    )
+    return ok(result)
+
+@app.get("/api/tools/history/stats")
+def api_tools_history_stats():
+    """Duraciones por comando (media, p50, p95, máximo)"""
+    try:
+        since = request.args.get("since")
+        until = request.args.get("until")
+        since = int(since) if since else None
+        until = int(until) if until else None
+    except ValueError:
+        return err("Parámetros numéricos inválidos (since, until)")
+    
+    result = executor.history.duration_stats(
+        command=request.args.get("command") or None,
+        since=since,
+        until=until,
+    )
+    return ok(result)
+
+# ====== JOBS ======
+@app.get("/api/jobs")
+def api_list_jobs():
+    """Lista los trabajos recientes"""
+    limit = int(request.args.get("limit", 50))
+    return ok(jobs=jobs.list_jobs(limit=limit))
+
+@app.get("/api/jobs/<job_id>")
+def api_get_job(job_id):
+    """Estado, pasos y resultado de un trabajo"""
+    job = jobs.get(job_id)
+    if job is None:
+        return err("Trabajo no encontrado", 404)
+    return ok(job=job.to_dict())
+
+@app.get("/api/jobs/<job_id>/stream")
+def api_stream_job(job_id):
+    """Transmite los cambios de estado de un trabajo como Server-Sent Events"""
+    job = jobs.get(job_id)
+    if job is None:
+        return err("Trabajo no encontrado", 404)
+    
+    from arkaios_jobs import FINISHED_STATES
+    
+    def generate():
+        version = -1
+        while True:
+            if job.version != version:
+                version = job.version
+                snapshot = job.to_dict()
+                yield f"event: job\ndata: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+                if snapshot["status"] in FINISHED_STATES:
+                    return
+            elif not jobs.wait_for_change(job, version):
+                yield ": keepalive\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/api/jobs/<job_id>/cancel")
+def api_cancel_job(job_id):
+    """Cancela un trabajo en cola o en ejecución"""
+    result = jobs.cancel(job_id)
+    if not result["ok"]:
+        return err(result["error"], 404 if "job" not in result else 409)
+    return ok(result)
 
 # ====== CONTEXT & HISTORY ======
 @app.get("/api/context")
@@ -502,6 +1307,38 @@ def api_get_history():
     history = ai_brain.get_history(limit=limit)
     return ok(history=history)
 
+# ====== LOGS ======
+@app.get("/api/logs")
+def api_logs():
+    """Consulta el log estructurado por rango de tiempo, tipo y usuario"""
+    try:
+        since = request.args.get("since")
+        until = request.args.get("until")
+        cursor = request.args.get("cursor")
+        limit = min(int(request.args.get("limit", 100)), 1000)
+        since = int(since) if since else None
+        until = int(until) if until else None
+    except ValueError:
+        return err("Parámetros numéricos inválidos (since, until, limit)")
+
+    result = log_index.query(
+        since=since,
+        until=until,
+        event_type=request.args.get("type") or None,
+        user=request.args.get("user") or None,
+        limit=limit,
+        cursor=cursor or None,
+    )
+    if not result["ok"]:
+        return err(result["error"])
+    return ok(result)
+
+# ====== METRICS ======
+@app.get("/metrics")
+def prometheus_metrics():
+    """Métricas en formato de texto Prometheus"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 # ====== INFO ======
 @app.get("/api/info")
 def api_info():
@@ -527,6 +1364,12 @@ if __name__ == "__main__":
     logger.info(f"🧠 AI Brain: Activo")
     logger.info(f"🏗️  Builder Mode: {len(builder.project_templates)} templates disponibles")
     
+    # En el servidor de desarrollo se sondean las herramientas y se indexa
+    # el workspace desde el arranque (las fábricas arrancan sus hilos)
+    audit_log._get()
+    tool_probe._get()
+    file_manager._get()
+    
     app.run(
         host="0.0.0.0",
         port=port,